@@ -21,10 +21,42 @@ def handle_connection_error():
     return jsonify({"error": ERROR_CONNECTION}), 503
 
 
+def conditional_json(payload):
+    """
+    JSON con ETag (hash del cuerpo) para el navegador: si repite la consulta con
+    If-None-Match y nada cambió, recibe 304 sin cuerpo
+    """
+    response = jsonify(payload)
+    response.add_etag()
+    response.headers["Cache-Control"] = "no-cache"
+    return response.make_conditional(request)
+
+
 @api_bp.route("/links", methods=["GET"])
 def get_links():
-    """Obtiene todos los links"""
+    """
+    Obtiene los links; con ?limit, ?cursor o algún filtro (?enabled, ?createdAfter,
+    ?sort) devuelve solo una página
+    """
     try:
+        limit = request.args.get("limit", type=int)
+        cursor = request.args.get("cursor")
+
+        filters = {}
+        if "enabled" in request.args:
+            enabled = request.args["enabled"].lower()
+            if enabled not in ("true", "false"):
+                return jsonify({"error": "enabled debe ser true o false"}), 400
+            filters["enabled"] = enabled == "true"
+        if request.args.get("createdAfter"):
+            filters["created_after"] = request.args["createdAfter"]
+        if request.args.get("sort"):
+            filters["sort"] = request.args["sort"]
+
+        if limit or cursor or filters:
+            page = link_service.get_links_page(limit=limit, cursor=cursor, **filters)
+            return conditional_json(page)
+
         links = link_service.get_all_links()
         return jsonify({"items": links}), 200
     except requests.RequestException:
@@ -34,6 +66,27 @@ def get_links():
         return jsonify({"error": ERROR_SERVER}), 500
 
 
+@api_bp.route("/links/search", methods=["GET"])
+def search_links():
+    """Busca links por título y slug (paginado con ?limit y ?cursor)"""
+    query = request.args.get("q", "").strip()
+    if not query:
+        return jsonify({"error": "Se requiere el parámetro q"}), 400
+
+    try:
+        results = link_service.search_links(
+            query,
+            limit=request.args.get("limit", type=int),
+            cursor=request.args.get("cursor"),
+        )
+        return jsonify(results), 200
+    except requests.RequestException:
+        return handle_connection_error()
+    except Exception as e:
+        print(f"[API] Error al buscar links: {e}")
+        return jsonify({"error": ERROR_SERVER}), 500
+
+
 @api_bp.route("/links", methods=["POST"])
 def create_link():
     """Crea un nuevo link"""
@@ -70,7 +123,7 @@ def get_link(link_id):
         if not link:
             return jsonify({"error": ERROR_LINK_NOT_FOUND}), 404
 
-        return jsonify(link), 200
+        return conditional_json(link)
 
     except requests.RequestException:
         return handle_connection_error()
@@ -99,14 +152,20 @@ def delete_link(link_id):
 
 @api_bp.route("/links/<link_id>/metrics", methods=["GET"])
 def get_link_metrics(link_id):
-    """Obtiene las métricas de un link"""
+    """Obtiene las métricas de un link (o su serie de tiempo con from/to/granularity)"""
+    # fields: desgloses de los totales (byVariant, byDevice, byCountry); sin él, solo clics
+    metrics_params = {
+        key: request.args[key]
+        for key in ("from", "to", "granularity", "fields")
+        if request.args.get(key)
+    }
     try:
-        metrics = link_service.get_link_metrics(link_id)
+        metrics = link_service.get_link_metrics(link_id, params=metrics_params or None)
 
         if not metrics:
             return jsonify({"error": ERROR_LINK_NOT_FOUND}), 404
 
-        return jsonify(metrics), 200
+        return conditional_json(metrics)
 
     except requests.RequestException:
         return handle_connection_error()
@@ -115,6 +174,26 @@ def get_link_metrics(link_id):
         return jsonify({"error": ERROR_SERVER}), 500
 
 
+@api_bp.route("/slugs/<slug>/available", methods=["GET"])
+def check_slug_available(slug):
+    """Indica si un slug está libre (se consulta mientras se escribe en el formulario)"""
+    try:
+        available = link_service.check_slug_available(slug)
+
+        if available is None:
+            return jsonify({"error": ERROR_SERVER}), 502
+
+        return jsonify({"slug": slug, "available": available}), 200
+
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except requests.RequestException:
+        return handle_connection_error()
+    except Exception as e:
+        print(f"[API] Error al consultar el slug {slug}: {e}")
+        return jsonify({"error": ERROR_SERVER}), 500
+
+
 @api_bp.route("/health", methods=["GET"])
 def health():
     """Health check del frontend y MS Admin"""
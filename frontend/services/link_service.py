@@ -2,7 +2,9 @@
 import os
 import requests
 import re
-from typing import Optional, List, Dict
+import threading
+from collections import OrderedDict
+from typing import Any, Optional, List, Dict, Tuple
 from dotenv import load_dotenv
 
 
@@ -11,6 +13,11 @@ class LinkService:
     consumiendo MS Admin API
     """
 
+    # Tamaño de página usado por get_all_links al recorrer GET /links
+    ALL_LINKS_PAGE_SIZE = 500
+    # Respuestas GET guardadas con su ETag para pedirlas de nuevo con If-None-Match (LRU)
+    VALIDATOR_CACHE_SIZE = 256
+
     def __init__(self):
         """Inicializa el servicio con la URL del MS Admin"""
         load_dotenv()
@@ -20,6 +27,10 @@ class LinkService:
         # Asegurar que la URL no termine con /
         self.admin_api_url = self.admin_api_url.rstrip("/")
 
+        # (endpoint, params) -> (etag, json). Flask atiende en varios hilos: se usa un lock
+        self._validators: "OrderedDict[Tuple, Tuple[str, Any]]" = OrderedDict()
+        self._validators_lock = threading.Lock()
+
     def _sanitize_id(self, link_id: str) -> str:
         """
         Valida que el ID sea seguro antes de construir la URL.
@@ -57,26 +68,182 @@ class LinkService:
             print(f"[LinkService] Error al conectar con MS Admin: {e}")
             raise
 
-    def get_all_links(self) -> List[Dict]:
+    def _get_json(
+        self, endpoint: str, params: Optional[Dict] = None
+    ) -> Tuple[int, Optional[Any]]:
         """
-        Obtiene todos los links desde MS Admin
+        GET condicional a MS Admin: si ya se tiene una respuesta del mismo endpoint y
+        parámetros, se envía su ETag en If-None-Match y un 304 reutiliza ese JSON sin
+        descargarlo ni parsearlo de nuevo.
+
+        Args:
+            endpoint: Endpoint relativo (ej: /links/lk_1/metrics)
+            params: Query params de la petición
 
         Returns:
-            List[Dict]: Lista de links
+            (status_code, json): el JSON solo si la respuesta es 200 o 304 (como 200)
+
+        Raises:
+            requests.RequestException: Si hay error de conexión
+        """
+        key = (endpoint, tuple(sorted((params or {}).items())))
+        with self._validators_lock:
+            cached = self._validators.get(key)
+
+        kwargs = {}
+        if params:
+            kwargs["params"] = params
+        if cached:
+            kwargs["headers"] = {"If-None-Match": cached[0]}
+        response = self._make_request("GET", endpoint, **kwargs)
+
+        if response.status_code == 304 and cached:
+            with self._validators_lock:
+                if key in self._validators:
+                    self._validators.move_to_end(key)
+            return 200, cached[1]
+
+        if response.status_code != 200:
+            with self._validators_lock:
+                self._validators.pop(key, None)
+            return response.status_code, None
+
+        data = response.json()
+        etag = response.headers.get("ETag")
+        if etag:
+            with self._validators_lock:
+                self._validators[key] = (etag, data)
+                self._validators.move_to_end(key)
+                while len(self._validators) > self.VALIDATOR_CACHE_SIZE:
+                    self._validators.popitem(last=False)
+        return 200, data
+
+    def get_links_page(
+        self,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+        enabled: Optional[bool] = None,
+        created_after: Optional[str] = None,
+        sort: Optional[str] = None,
+    ) -> Dict:
+        """
+        Obtiene una página de links desde MS Admin
+
+        Args:
+            limit: Cantidad máxima de links (MS Admin aplica su propio tope)
+            cursor: Cursor opaco devuelto como nextCursor por la página anterior
+            enabled: Solo links habilitados (True) o deshabilitados (False)
+            created_after: Solo links creados desde esta fecha (ISO 8601)
+            sort: "newest" (por defecto) o "clicks"
+
+        Returns:
+            Dict: {"items": [...], "nextCursor": str | None}
+
+        Raises:
+            requests.RequestException: Si hay error de conexión
+        """
+        params = {}
+        if limit:
+            params["limit"] = limit
+        if cursor:
+            params["cursor"] = cursor
+        if enabled is not None:
+            params["enabled"] = "true" if enabled else "false"
+        if created_after:
+            params["createdAfter"] = created_after
+        if sort:
+            params["sort"] = sort
+
+        try:
+            status_code, data = self._get_json("/links", params=params)
+
+            if status_code == 200:
+                return {
+                    "items": data.get("items", []),
+                    "nextCursor": data.get("nextCursor"),
+                }
+            else:
+                print(f"[LinkService] Error al obtener links: {status_code}")
+                return {"items": [], "nextCursor": None}
+
+        except requests.RequestException:
+            raise
+        except Exception as e:
+            print(f"[LinkService] Error inesperado al obtener links: {e}")
+            return {"items": [], "nextCursor": None}
+
+    def search_links(
+        self, query: str, limit: Optional[int] = None, cursor: Optional[str] = None
+    ) -> Dict:
+        """
+        Busca links por título y slug en MS Admin (GET /links/search)
+
+        Args:
+            query: Texto a buscar (cada palabra se toma como prefijo)
+            limit: Cantidad máxima de resultados por página
+            cursor: Cursor opaco devuelto como nextCursor por la página anterior
+
+        Returns:
+            Dict: {"items": [...], "total": int, "nextCursor": str | None}
 
         Raises:
             requests.RequestException: Si hay error de conexión
-            ValueError: Si la respuesta es inválida
         """
+        params = {"q": query}
+        if limit:
+            params["limit"] = limit
+        if cursor:
+            params["cursor"] = cursor
+
         try:
-            response = self._make_request("GET", "/links")
+            response = self._make_request("GET", "/links/search", params=params)
 
             if response.status_code == 200:
                 data = response.json()
-                return data.get("items", [])
+                return {
+                    "items": data.get("items", []),
+                    "total": data.get("total", 0),
+                    "nextCursor": data.get("nextCursor"),
+                }
             else:
-                print(f"[LinkService] Error al obtener links: {response.status_code}")
-                return []
+                print(f"[LinkService] Error al buscar links: {response.status_code}")
+                return {"items": [], "total": 0, "nextCursor": None}
+
+        except requests.RequestException:
+            raise
+        except Exception as e:
+            print(f"[LinkService] Error inesperado al buscar links: {e}")
+            return {"items": [], "total": 0, "nextCursor": None}
+
+    def get_all_links(self) -> List[Dict]:
+        """
+        Obtiene todos los links desde MS Admin recorriendo las páginas
+
+        Returns:
+            List[Dict]: Lista de links
+
+        Raises:
+            requests.RequestException: Si hay error de conexión
+            ValueError: Si la respuesta es inválida
+        """
+        items: List[Dict] = []
+        cursor = None
+
+        try:
+            while True:
+                params = {"limit": self.ALL_LINKS_PAGE_SIZE}
+                if cursor:
+                    params["cursor"] = cursor
+                status_code, data = self._get_json("/links", params=params)
+
+                if status_code != 200:
+                    print(f"[LinkService] Error al obtener links: {status_code}")
+                    return []
+
+                items.extend(data.get("items", []))
+                cursor = data.get("nextCursor")
+                if not cursor:
+                    return items
 
         except requests.RequestException:
             raise
@@ -99,15 +266,15 @@ class LinkService:
         """
         try:
             safe_id = self._sanitize_id(link_id)
-            response = self._make_request("GET", f"/links/{safe_id}")
+            status_code, data = self._get_json(f"/links/{safe_id}")
 
-            if response.status_code == 200:
-                return response.json()
-            elif response.status_code == 404:
+            if status_code == 200:
+                return data
+            elif status_code == 404:
                 return None
             else:
                 print(
-                    f"[LinkService] Error al obtener link {link_id}: {response.status_code}"
+                    f"[LinkService] Error al obtener link {link_id}: {status_code}"
                 )
                 return None
 
@@ -191,6 +358,61 @@ class LinkService:
             print(f"[LinkService] Error inesperado al crear link: {e}")
             raise ValueError("Error al crear el link")
 
+    def create_links_batch(self, links: List[Dict]) -> Dict:
+        """
+        Crea varios links en MS Admin con una sola petición (POST /links:batch)
+
+        Args:
+            links: Lista de dicts con title, slug, destinationUrl y variants
+
+        Returns:
+            Dict con "items" (un resultado por link: created / conflict /
+            invalid / error) y "summary" (conteo por estado)
+
+        Raises:
+            ValueError: Si la lista está vacía o MS Admin rechaza la petición
+            requests.RequestException: Si hay error de conexión
+        """
+        if not links:
+            raise ValueError("Se requiere al menos un link")
+
+        payload = {
+            "items": [
+                {
+                    "slug": (link.get("slug") or "").strip() or None,
+                    "title": (link.get("title") or "").strip(),
+                    "destinationUrl": (link.get("destinationUrl") or "").strip(),
+                    "variants": link.get("variants") or [],
+                }
+                for link in links
+            ]
+        }
+
+        try:
+            response = self._make_request(
+                "POST",
+                "/links:batch",
+                json=payload,
+                headers={"Content-Type": "application/json"},
+            )
+
+            if response.status_code == 200:
+                return response.json()
+            elif response.status_code in (400, 422):
+                error_data = response.json()
+                raise ValueError(error_data.get("detail", "Error de validación"))
+            else:
+                print(f"[LinkService] Error en creación masiva: {response.status_code}")
+                raise ValueError(f"Error del servidor: {response.status_code}")
+
+        except requests.RequestException:
+            raise
+        except ValueError:
+            raise
+        except Exception as e:
+            print(f"[LinkService] Error inesperado en creación masiva: {e}")
+            raise ValueError("Error al crear los links")
+
     def delete_link(self, link_id: str) -> bool:
         """
         Elimina un link en MS Admin
@@ -224,12 +446,15 @@ class LinkService:
             print(f"[LinkService] Error inesperado al eliminar link: {e}")
             return False
 
-    def get_link_metrics(self, link_id: str) -> Optional[Dict]:
+    def get_link_metrics(
+        self, link_id: str, params: Optional[Dict] = None
+    ) -> Optional[Dict]:
         """
         Obtiene las métricas de un link desde MS Admin
 
         Args:
             link_id: ID del link
+            params: from / to / granularity para pedir la serie de tiempo
 
         Returns:
             Dict con las métricas o None si el link no existe
@@ -239,15 +464,17 @@ class LinkService:
         """
         try:
             safe_id = self._sanitize_id(link_id)
-            response = self._make_request("GET", f"/links/{safe_id}/metrics")
+            # detail.js consulta las métricas periódicamente: sin clics nuevos MS Admin
+            # responde 304 y se reutiliza el JSON guardado
+            status_code, data = self._get_json(f"/links/{safe_id}/metrics", params=params)
 
-            if response.status_code == 200:
-                return response.json()
-            elif response.status_code == 404:
+            if status_code == 200:
+                return data
+            elif status_code == 404:
                 return None
             else:
                 print(
-                    f"[LinkService] Error al obtener métricas de {link_id}: {response.status_code}"
+                    f"[LinkService] Error al obtener métricas de {link_id}: {status_code}"
                 )
                 return None
 
@@ -257,6 +484,41 @@ class LinkService:
             print(f"[LinkService] Error inesperado al obtener métricas: {e}")
             return None
 
+    def check_slug_available(self, slug: str) -> Optional[bool]:
+        """
+        Consulta en MS Admin si un slug está libre
+
+        Args:
+            slug: Slug a comprobar
+
+        Returns:
+            bool: True si está libre, False si ya existe; None si no se pudo saber
+
+        Raises:
+            ValueError: Si el slug tiene un formato inválido
+            requests.RequestException: Si hay error de conexión
+        """
+        if not slug or not re.match(r"^[a-z0-9-]+$", slug):
+            raise ValueError(
+                "El slug solo puede contener letras minúsculas, números y guiones"
+            )
+
+        try:
+            response = self._make_request("GET", f"/slugs/{slug}/available")
+
+            if response.status_code == 200:
+                return response.json().get("available") is True
+            print(
+                f"[LinkService] Error al consultar el slug {slug}: {response.status_code}"
+            )
+            return None
+
+        except requests.RequestException:
+            raise
+        except Exception as e:
+            print(f"[LinkService] Error inesperado al consultar el slug: {e}")
+            return None
+
     def health_check(self) -> bool:
         """
         Verifica si MS Admin está disponible
@@ -2,6 +2,8 @@
 
 const linkId = document.getElementById('linkIdData').value;
 const BASE_DOMAIN = globalThis.BASE_DOMAIN || 'linkly.space';
+// Desgloses que muestra el detalle; sin "fields" el backend solo devuelve el total de clics
+const CAMPOS_METRICAS = 'byVariant,byDevice,byCountry';
 
 document.addEventListener('DOMContentLoaded', async () => {
     await cargarDatos();
@@ -12,7 +14,7 @@ async function cargarDatos() {
         // Cargar información del link y métricas en paralelo
         const [linkResponse, metricsResponse] = await Promise.all([
             fetch(`/links/${linkId}`),
-            fetch(`/links/${linkId}/metrics`)
+            fetch(`/links/${linkId}/metrics?fields=${CAMPOS_METRICAS}`)
         ]);
 
         if (!linkResponse.ok) {
@@ -49,7 +51,7 @@ async function refrescarMetricas() {
     }
     
     try {
-        const metricsResponse = await fetch(`/links/${linkId}/metrics`);
+        const metricsResponse = await fetch(`/links/${linkId}/metrics?fields=${CAMPOS_METRICAS}`);
         
         let metricsData = null;
         if (metricsResponse.ok) {
@@ -117,11 +119,18 @@ function actualizarSeccionMetricas(metrics) {
                     <div class="metric-value">${totals.clicks.toLocaleString()}</div>
                     <div class="metric-label">Clics Totales</div>
                 </div>
+                ${totals.uniques != null ? `
+                <div class="metric-card">
+                    <div class="metric-value">≈ ${totals.uniques.toLocaleString()}</div>
+                    <div class="metric-label">Visitantes Únicos</div>
+                </div>` : ''}
             </div>
 
             ${totals.byVariant ? generarBreakdown('Por Variante', totals.byVariant, totals.clicks) : ''}
             ${totals.byDevice ? generarBreakdown('Por Dispositivo', totals.byDevice, totals.clicks) : ''}
             ${totals.byCountry ? generarBreakdown('Por País', totals.byCountry, totals.clicks) : ''}
+            ${totals.topReferrers?.length ? generarBreakdown('Principales Referrers', aMapa(totals.topReferrers), totals.clicks) : ''}
+            ${totals.topUserAgents?.length ? generarBreakdown('Principales User Agents', aMapa(totals.topUserAgents), totals.clicks) : ''}
         `;
     } else {
         metricsHTML = `
@@ -200,10 +209,105 @@ function mostrarContenido(link, metrics) {
         <div class="card" id="metricsSection">
             <div class="loading">Cargando métricas...</div>
         </div>
+
+        <div class="card" id="seriesSection">
+            <h2>📅 Clics en el Tiempo</h2>
+            <div class="metrics-actions">
+                <select id="seriesRange" class="series-range" onchange="cargarSerie(this.value)">
+                    <option value="48h">Últimas 48 horas (por hora)</option>
+                    <option value="7d">Últimos 7 días (por hora)</option>
+                    <option value="30d" selected>Últimos 30 días</option>
+                    <option value="90d">Últimos 90 días</option>
+                </select>
+            </div>
+            <div id="seriesChart" class="series-chart">
+                <div class="loading">Cargando serie...</div>
+            </div>
+        </div>
     `;
     
     // Actualizar la sección de métricas
     actualizarSeccionMetricas(metrics);
+    cargarSerie('30d');
+}
+
+// Rangos del selector: horas hacia atrás y granularidad de los buckets
+const RANGOS_SERIE = {
+    '48h': { horas: 48, granularity: 'hour' },
+    '7d': { horas: 7 * 24, granularity: 'hour' },
+    '30d': { horas: 30 * 24, granularity: 'day' },
+    '90d': { horas: 90 * 24, granularity: 'day' }
+};
+
+async function cargarSerie(rango) {
+    const chart = document.getElementById('seriesChart');
+    if (!chart) return;
+
+    const { horas, granularity } = RANGOS_SERIE[rango] || RANGOS_SERIE['30d'];
+    const hasta = new Date();
+    // Se resta un bucket: el rango incluye el bucket actual
+    const desde = new Date(hasta.getTime() - (horas - (granularity === 'hour' ? 1 : 24)) * 3600 * 1000);
+    const params = new URLSearchParams({
+        from: desde.toISOString(),
+        to: hasta.toISOString(),
+        granularity
+    });
+
+    try {
+        const response = await fetch(`/links/${linkId}/metrics?${params}`);
+        if (!response.ok) {
+            throw new Error(`Error ${response.status}`);
+        }
+        const data = await response.json();
+        chart.innerHTML = generarGraficoSerie(data);
+    } catch (error) {
+        console.error('Error al cargar la serie de tiempo:', error);
+        chart.innerHTML = '<div class="error-message">No se pudo cargar la serie de tiempo</div>';
+    }
+}
+
+function generarGraficoSerie(data) {
+    const timestamps = data?.series?.timestamps || [];
+    const clicks = data?.series?.clicks || [];
+    if (clicks.length === 0 || clicks.every(valor => valor === 0)) {
+        return '<div class="empty-metrics">Sin clics en este rango.</div>';
+    }
+
+    // Barras en un SVG escalado: una unidad de ancho por bucket, 100 de alto
+    const maximo = Math.max(...clicks);
+    const porHora = data.granularity === 'hour';
+    const barras = clicks.map((valor, i) => {
+        const alto = (valor / maximo) * 100;
+        const etiqueta = `${formatearBucket(timestamps[i], porHora)}: ${valor.toLocaleString()} clics`;
+        return `<rect x="${i + 0.1}" y="${100 - alto}" width="0.8" height="${alto}">`
+            + `<title>${escapeHtml(etiqueta)}</title></rect>`;
+    }).join('');
+
+    return `
+        <div class="series-summary">
+            ${data.totals.clicks.toLocaleString()} clics · máximo ${maximo.toLocaleString()} por ${porHora ? 'hora' : 'día'}
+        </div>
+        <svg class="series-svg" viewBox="0 0 ${clicks.length} 100" preserveAspectRatio="none" role="img">
+            ${barras}
+        </svg>
+        <div class="series-axis">
+            <span>${formatearBucket(timestamps[0], porHora)}</span>
+            <span>${formatearBucket(timestamps.at(-1), porHora)}</span>
+        </div>
+    `;
+}
+
+function formatearBucket(fechaISO, conHora) {
+    const opciones = { month: 'short', day: 'numeric' };
+    if (conHora) {
+        opciones.hour = '2-digit';
+    }
+    return new Date(fechaISO).toLocaleString('es-ES', opciones);
+}
+
+// [{ value, clicks }] (heavy hitters, ya ordenados) -> { value: clicks }
+function aMapa(items) {
+    return Object.fromEntries(items.map(item => [item.value, item.clicks]));
 }
 
 function generarBreakdown(titulo, data, total) {
@@ -1,7 +1,43 @@
 // static/js/index.js
 
+// Tamaño de página de GET /links y cursor de la siguiente página (null = no hay más)
+const LINKS_PAGE_SIZE = 50;
+let linksCargados = [];
+let siguienteCursor = null;
+// Texto de búsqueda activo: con texto, la lista viene de /links/search
+let busquedaActual = '';
+// Vista del listado (#vistaLinks): filtros y orden que resuelve GET /links
+let vistaActual = '';
+const DIAS_RECIENTES = 7;
+
+// Espera tras la última tecla antes de consultar si el slug está libre
+const SLUG_CHECK_DELAY_MS = 300;
+let slugCheckTimer = null;
+
 // Cargar links al iniciar
-document.addEventListener('DOMContentLoaded', cargarLinks);
+document.addEventListener('DOMContentLoaded', () => cargarLinks());
+
+// Buscar links mientras se escribe (misma espera que la verificación del slug)
+let busquedaTimer = null;
+document.getElementById('buscarLinks').addEventListener('input', (e) => {
+    clearTimeout(busquedaTimer);
+    busquedaTimer = setTimeout(() => {
+        busquedaActual = e.target.value.trim();
+        cargarLinks();
+    }, SLUG_CHECK_DELAY_MS);
+});
+
+// Cambiar la vista recarga desde la primera página
+document.getElementById('vistaLinks').addEventListener('change', (e) => {
+    vistaActual = e.target.value;
+    cargarLinks();
+});
+
+// Comprobar la disponibilidad del slug mientras se escribe
+document.getElementById('slug').addEventListener('input', (e) => {
+    clearTimeout(slugCheckTimer);
+    slugCheckTimer = setTimeout(() => verificarSlug(e.target.value.trim()), SLUG_CHECK_DELAY_MS);
+});
 
 // Manejar submit del formulario
 document.getElementById('linkForm').addEventListener('submit', async (e) => {
@@ -9,6 +45,17 @@ document.getElementById('linkForm').addEventListener('submit', async (e) => {
     await crearLink();
 });
 
+function aplicarVista(params, vista) {
+    if (vista === 'habilitados') {
+        params.set('enabled', 'true');
+    } else if (vista === 'recientes') {
+        const desde = new Date(Date.now() - DIAS_RECIENTES * 24 * 60 * 60 * 1000);
+        params.set('createdAfter', desde.toISOString());
+    } else if (vista === 'clics') {
+        params.set('sort', 'clicks');
+    }
+}
+
 function showMessage(message, type = 'error') {
     const container = document.getElementById('messageContainer');
     const className = type === 'success' ? 'success-message' : 'error-message';
@@ -20,18 +67,37 @@ function showMessage(message, type = 'error') {
     }, 5000);
 }
 
-async function cargarLinks() {
+async function cargarLinks(cursor = null) {
     try {
-        const response = await fetch('/links');
+        const params = new URLSearchParams({ limit: LINKS_PAGE_SIZE });
+        if (cursor) {
+            params.set('cursor', cursor);
+        }
+        const busqueda = busquedaActual;
+        const vista = vistaActual;
+        if (busqueda) {
+            params.set('q', busqueda);
+        } else {
+            aplicarVista(params, vista);
+        }
+        const response = await fetch(busqueda ? `/links/search?${params}` : `/links?${params}`);
         
         if (!response.ok) {
             throw new Error('Error al cargar los links');
         }
         
         const data = await response.json();
+        // Se descarta la respuesta si la búsqueda o la vista cambiaron mientras tanto
+        if (busqueda !== busquedaActual || vista !== vistaActual) {
+            return;
+        }
         const links = data.items || [];
+
+        // Sin cursor es una recarga completa: se empieza desde la primera página
+        linksCargados = cursor ? linksCargados.concat(links) : links;
+        siguienteCursor = data.nextCursor || null;
         
-        mostrarLinks(links);
+        mostrarLinks(linksCargados);
     } catch (error) {
         console.error('Error:', error);
         document.getElementById('linksTableContainer').innerHTML = 
@@ -43,7 +109,9 @@ function mostrarLinks(links) {
     const container = document.getElementById('linksTableContainer');
     
     if (links.length === 0) {
-        container.innerHTML = '<div class="mensaje-vacio">No hay links todavía. ¡Crea tu primer link!</div>';
+        container.innerHTML = busquedaActual || vistaActual
+            ? '<div class="mensaje-vacio">Ningún link coincide con la búsqueda.</div>'
+            : '<div class="mensaje-vacio">No hay links todavía. ¡Crea tu primer link!</div>';
         return;
     }
 
@@ -83,7 +151,46 @@ function mostrarLinks(links) {
         </table>
     `;
     
-    container.innerHTML = tableHTML;
+    container.innerHTML = tableHTML + (siguienteCursor
+        ? '<div class="load-more"><button class="btn-cargar-mas" onclick="cargarMasLinks(this)">Cargar más</button></div>'
+        : '');
+}
+
+async function cargarMasLinks(button) {
+    if (!siguienteCursor) return;
+    button.disabled = true;
+    button.textContent = 'Cargando...';
+    await cargarLinks(siguienteCursor);
+}
+
+function mostrarEstadoSlug(texto, clase = '') {
+    const status = document.getElementById('slugStatus');
+    status.textContent = texto;
+    status.className = `slug-status ${clase}`.trim();
+}
+
+async function verificarSlug(slug) {
+    if (!slug || !/^[a-z0-9-]+$/.test(slug)) {
+        mostrarEstadoSlug('');
+        return;
+    }
+
+    try {
+        const response = await fetch(`/slugs/${encodeURIComponent(slug)}/available`);
+        // Se descarta la respuesta si el campo cambió mientras tanto
+        if (!response.ok || document.getElementById('slug').value.trim() !== slug) {
+            return;
+        }
+        const data = await response.json();
+        if (data.available) {
+            mostrarEstadoSlug('✓ Slug disponible', 'disponible');
+        } else {
+            mostrarEstadoSlug('✗ Este slug ya está en uso', 'ocupado');
+        }
+    } catch (error) {
+        // Es solo una ayuda: al crear se vuelve a validar
+        console.error('Error al verificar el slug:', error);
+    }
 }
 
 function escapeHtml(text) {
@@ -151,6 +258,7 @@ function limpiarFormulario() {
     document.getElementById('slug').value = '';
     document.getElementById('destinationUrl').value = '';
     document.getElementById('variants').value = '';
+    mostrarEstadoSlug('');
 }
 
 function verDetalle(linkId) {
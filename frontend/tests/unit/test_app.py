@@ -81,6 +81,43 @@ def test_api_links_get_success(client, mock_link_service):
     assert len(data['items']) == 2
 
 
+def test_api_links_get_page(client, mock_link_service):
+    """Verifica que ?limit/?cursor devuelven una sola página con nextCursor."""
+    mock_link_service.get_links_page.return_value = {
+        'items': [{'linkId': 'lk_1', 'slug': 'test1'}],
+        'nextCursor': 'abc'
+    }
+
+    response = client.get('/links?limit=1&cursor=xyz')
+    data = response.get_json()
+
+    assert response.status_code == 200
+    assert data['nextCursor'] == 'abc'
+    mock_link_service.get_links_page.assert_called_once_with(limit=1, cursor='xyz')
+    mock_link_service.get_all_links.assert_not_called()
+
+
+def test_api_links_get_filters(client, mock_link_service):
+    """Verifica que los filtros y el orden se reenvían a MS Admin como una página."""
+    mock_link_service.get_links_page.return_value = {'items': [], 'nextCursor': None}
+
+    response = client.get('/links?enabled=true&createdAfter=2025-01-01&sort=clicks')
+
+    assert response.status_code == 200
+    mock_link_service.get_links_page.assert_called_once_with(
+        limit=None, cursor=None, enabled=True, created_after='2025-01-01', sort='clicks'
+    )
+    mock_link_service.get_all_links.assert_not_called()
+
+
+def test_api_links_get_invalid_enabled(client, mock_link_service):
+    """Verifica que un enabled que no es booleano devuelve 400."""
+    response = client.get('/links?enabled=talvez')
+
+    assert response.status_code == 400
+    mock_link_service.get_links_page.assert_not_called()
+
+
 def test_api_links_get_connection_error(client, mock_link_service):
     """Verifica manejo de errores de conexión en GET /links."""
     mock_link_service.get_all_links.side_effect = requests.RequestException()
@@ -265,6 +302,20 @@ def test_api_metrics_success(client, mock_link_service):
     assert data['totals']['clicks'] == 100
 
 
+def test_api_metrics_forwards_series_params(client, mock_link_service):
+    """Verifica que from/to/granularity se reenvían a MS Admin."""
+    mock_link_service.get_link_metrics.return_value = {
+        'series': {'timestamps': [], 'clicks': []}
+    }
+
+    response = client.get('/links/lk_1/metrics?from=2025-10-01&granularity=day&otro=x')
+
+    assert response.status_code == 200
+    mock_link_service.get_link_metrics.assert_called_once_with(
+        'lk_1', params={'from': '2025-10-01', 'granularity': 'day'}
+    )
+
+
 def test_api_metrics_not_found(client, mock_link_service):
     """Verifica respuesta cuando no existen métricas."""
     mock_link_service.get_link_metrics.return_value = None
@@ -288,6 +339,54 @@ def test_api_metrics_unexpected_error(client, mock_link_service):
     response = client.get('/links/lk_1/metrics')
     assert response.status_code == 500
 
+
+def test_api_links_search(client, mock_link_service):
+    """Verifica que la búsqueda se reenvía a MS Admin con su paginación."""
+    mock_link_service.search_links.return_value = {
+        'items': [{'linkId': 'lk_1', 'slug': 'promo'}], 'total': 1, 'nextCursor': None
+    }
+
+    response = client.get('/links/search?q=pro&limit=10')
+
+    assert response.status_code == 200
+    assert response.get_json()['total'] == 1
+    mock_link_service.search_links.assert_called_once_with('pro', limit=10, cursor=None)
+
+
+def test_api_links_search_requires_query(client, mock_link_service):
+    """Verifica que la búsqueda sin q responda 400."""
+    response = client.get('/links/search?q=%20')
+
+    assert response.status_code == 400
+    mock_link_service.search_links.assert_not_called()
+
+
+def test_api_slug_available(client, mock_link_service):
+    """Verifica la consulta de disponibilidad de un slug."""
+    mock_link_service.check_slug_available.return_value = False
+
+    response = client.get('/slugs/promo/available')
+
+    assert response.status_code == 200
+    assert response.get_json() == {'slug': 'promo', 'available': False}
+    mock_link_service.check_slug_available.assert_called_once_with('promo')
+
+
+def test_api_slug_available_invalid_slug(client, mock_link_service):
+    """Verifica que un slug con formato inválido responda 400."""
+    mock_link_service.check_slug_available.side_effect = ValueError("Slug inválido")
+
+    response = client.get('/slugs/Promo/available')
+    assert response.status_code == 400
+
+
+def test_api_slug_available_connection_error(client, mock_link_service):
+    """Verifica manejo de errores de conexión al consultar un slug."""
+    mock_link_service.check_slug_available.side_effect = requests.RequestException()
+
+    response = client.get('/slugs/promo/available')
+    assert response.status_code == 503
+
 # ============================================================================
 # TESTS DEL LINK SERVICE
 # ============================================================================
@@ -393,6 +492,53 @@ def test_link_service_create_link_backend_500_error():
             service.create_link('Title', 'slug', 'https://example.com', [])
 
 
+def test_link_service_create_links_batch_success():
+    """Verifica la creación masiva y el payload enviado a /links:batch."""
+    from services.link_service import LinkService
+    service = LinkService()
+
+    mock_response = Mock(status_code=200)
+    mock_response.json.return_value = {
+        'items': [{'index': 0, 'status': 'created'}, {'index': 1, 'status': 'conflict'}],
+        'summary': {'created': 1, 'conflict': 1, 'invalid': 0, 'error': 0}
+    }
+
+    links = [
+        {'title': ' Uno ', 'slug': 'uno', 'destinationUrl': 'https://a.com'},
+        {'title': 'Dos', 'slug': 'uno', 'destinationUrl': 'https://b.com', 'variants': ['ig']},
+    ]
+    with patch('requests.request', return_value=mock_response) as mock_request:
+        result = service.create_links_batch(links)
+
+    assert result['summary']['created'] == 1
+    assert mock_request.call_args.kwargs['url'].endswith('/links:batch')
+    sent = mock_request.call_args.kwargs['json']['items']
+    assert sent[0]['title'] == 'Uno'
+    assert sent[1]['variants'] == ['ig']
+
+
+def test_link_service_create_links_batch_empty():
+    """Verifica que una lista vacía se rechace localmente."""
+    from services.link_service import LinkService
+    service = LinkService()
+
+    with pytest.raises(ValueError, match='al menos un link'):
+        service.create_links_batch([])
+
+
+def test_link_service_create_links_batch_rejected():
+    """Verifica que un 400 de MS Admin se traduzca en ValueError."""
+    from services.link_service import LinkService
+    service = LinkService()
+
+    mock_response = Mock(status_code=400)
+    mock_response.json.return_value = {'detail': 'Máximo 500 items por batch'}
+
+    with patch('requests.request', return_value=mock_response):
+        with pytest.raises(ValueError, match='Máximo 500'):
+            service.create_links_batch([{'title': 'x', 'slug': 'x', 'destinationUrl': 'https://a.com'}])
+
+
 def test_link_service_get_all_links_success():
     """Verifica obtención exitosa de links desde el servicio."""
     from services.link_service import LinkService
@@ -407,6 +553,52 @@ def test_link_service_get_all_links_success():
         assert len(result) == 1
 
 
+def test_link_service_get_all_links_follows_cursor():
+    """Verifica que get_all_links recorre todas las páginas usando nextCursor."""
+    from services.link_service import LinkService
+    service = LinkService()
+
+    first = Mock(status_code=200)
+    first.json.return_value = {'items': [{'linkId': 'lk_1'}], 'nextCursor': 'c1'}
+    second = Mock(status_code=200)
+    second.json.return_value = {'items': [{'linkId': 'lk_2'}], 'nextCursor': None}
+
+    with patch('requests.request', side_effect=[first, second]) as mock_request:
+        result = service.get_all_links()
+
+    assert [i['linkId'] for i in result] == ['lk_1', 'lk_2']
+    assert mock_request.call_args_list[1].kwargs['params']['cursor'] == 'c1'
+
+
+def test_link_service_get_links_page_filters():
+    """Verifica que los filtros viajan como query params de GET /links."""
+    from services.link_service import LinkService
+    service = LinkService()
+
+    mock_response = Mock(status_code=200)
+    mock_response.json.return_value = {'items': [], 'nextCursor': None}
+
+    with patch('requests.request', return_value=mock_response) as mock_request:
+        service.get_links_page(limit=10, enabled=False, created_after='2025-01-01', sort='clicks')
+
+    assert mock_request.call_args.kwargs['params'] == {
+        'limit': 10, 'enabled': 'false', 'createdAfter': '2025-01-01', 'sort': 'clicks'
+    }
+
+
+def test_link_service_get_links_page_error_status():
+    """Verifica que una página con error devuelve una página vacía."""
+    from services.link_service import LinkService
+    service = LinkService()
+
+    mock_response = Mock(status_code=500)
+
+    with patch('requests.request', return_value=mock_response):
+        result = service.get_links_page(limit=10)
+
+    assert result == {'items': [], 'nextCursor': None}
+
+
 def test_link_service_get_all_links_empty():
     """Verifica respuesta vacía del servicio."""
     from services.link_service import LinkService
@@ -486,6 +678,22 @@ def test_link_service_get_metrics_not_found():
         assert result is None
 
 
+def test_link_service_get_metrics_series_params():
+    """Verifica que los parámetros de la serie llegan como query string."""
+    from services.link_service import LinkService
+    service = LinkService()
+
+    mock_response = Mock()
+    mock_response.status_code = 200
+    mock_response.json.return_value = {'series': {'clicks': [1, 2]}}
+
+    with patch('requests.request', return_value=mock_response) as mock_request:
+        result = service.get_link_metrics('lk_1', {'granularity': 'hour'})
+
+    assert result['series']['clicks'] == [1, 2]
+    assert mock_request.call_args.kwargs['params'] == {'granularity': 'hour'}
+
+
 def test_link_service_health_check_healthy():
     """Verifica health check exitoso."""
     from services.link_service import LinkService
@@ -633,3 +841,93 @@ def test_api_create_link_invalid_json(client):
     assert response.status_code == 400
     data = response.get_json()
     assert 'error' in data
+
+
+def test_api_metrics_forwards_fields(client, mock_link_service):
+    """Verifica que los desgloses pedidos en fields se reenvían a MS Admin."""
+    mock_link_service.get_link_metrics.return_value = {'totals': {'clicks': 1}}
+
+    response = client.get('/links/lk_1/metrics?fields=byCountry')
+
+    assert response.status_code == 200
+    mock_link_service.get_link_metrics.assert_called_once_with('lk_1', params={'fields': 'byCountry'})
+
+
+def test_link_service_check_slug_available():
+    """Verifica que el servicio consulte /slugs/{slug}/available en MS Admin."""
+    from services.link_service import LinkService
+    service = LinkService()
+
+    mock_response = Mock(status_code=200)
+    mock_response.json.return_value = {'slug': 'promo', 'available': True}
+
+    with patch('requests.request', return_value=mock_response) as mock_request:
+        assert service.check_slug_available('promo') is True
+    assert mock_request.call_args.kwargs['url'].endswith('/slugs/promo/available')
+
+    with pytest.raises(ValueError):
+        service.check_slug_available('con espacios')
+
+
+def test_link_service_metrics_revalidates_with_etag():
+    """Verifica que una segunda consulta envía If-None-Match y un 304 reutiliza el JSON."""
+    from services.link_service import LinkService
+    service = LinkService()
+
+    first = Mock(status_code=200, headers={'ETag': '"v1"'})
+    first.json.return_value = {'totals': {'clicks': 5}}
+    not_modified = Mock(status_code=304, headers={'ETag': '"v1"'})
+
+    with patch('requests.request', side_effect=[first, not_modified]) as mock_request:
+        assert service.get_link_metrics('lk_1') == {'totals': {'clicks': 5}}
+        assert service.get_link_metrics('lk_1') == {'totals': {'clicks': 5}}
+
+    assert 'headers' not in mock_request.call_args_list[0].kwargs
+    assert mock_request.call_args_list[1].kwargs['headers'] == {'If-None-Match': '"v1"'}
+    not_modified.json.assert_not_called()
+
+
+def test_link_service_validators_keyed_by_params():
+    """Verifica que los validadores no se mezclan entre parámetros distintos."""
+    from services.link_service import LinkService
+    service = LinkService()
+
+    response = Mock(status_code=200, headers={'ETag': '"v1"'})
+    response.json.return_value = {'totals': {'clicks': 5}}
+
+    with patch('requests.request', return_value=response) as mock_request:
+        service.get_link_metrics('lk_1')
+        service.get_link_metrics('lk_1', params={'granularity': 'hour'})
+
+    assert 'headers' not in mock_request.call_args.kwargs
+
+
+def test_link_service_drops_validator_on_404():
+    """Verifica que un 404 descarta la respuesta guardada."""
+    from services.link_service import LinkService
+    service = LinkService()
+
+    found = Mock(status_code=200, headers={'ETag': '"v1"'})
+    found.json.return_value = {'linkId': 'lk_1'}
+    missing = Mock(status_code=404, headers={})
+
+    with patch('requests.request', side_effect=[found, missing, missing]) as mock_request:
+        assert service.get_link_by_id('lk_1') == {'linkId': 'lk_1'}
+        assert service.get_link_by_id('lk_1') is None
+        assert service.get_link_by_id('lk_1') is None
+
+    assert 'headers' not in mock_request.call_args_list[2].kwargs
+
+
+def test_api_link_metrics_not_modified(client, mock_link_service):
+    """Verifica que el navegador recibe 304 si repite la consulta con el mismo ETag."""
+    mock_link_service.get_link_metrics.return_value = {'totals': {'clicks': 5}}
+
+    first = client.get('/links/lk_1/metrics')
+    etag = first.headers['ETag']
+    again = client.get('/links/lk_1/metrics', headers={'If-None-Match': etag})
+
+    assert first.status_code == 200
+    assert first.headers['Cache-Control'] == 'no-cache'
+    assert again.status_code == 304
+    assert again.data == b''
@@ -19,7 +19,8 @@ resource "google_project_service" "apis" {
   for_each = toset([
     "run.googleapis.com",       # Para Cloud Run
     "firestore.googleapis.com", # Para Firestore
-    "iam.googleapis.com"        # Para Cuentas de Servicio y permisos
+    "iam.googleapis.com",       # Para Cuentas de Servicio y permisos
+    "cloudscheduler.googleapis.com" # Para el job periódico de reconciliación
   ])
   service            = each.key
   disable_on_destroy = false
@@ -40,6 +41,67 @@ resource "google_firestore_database" "database" {
   ]
 }
 
+# 2b. Sin índices de un solo campo para los sketches: HyperLogLog ("hll", hasta 1024
+# registros) y resúmenes de heavy hitters; nunca se consultan por valor
+resource "google_firestore_field" "sketch_no_index" {
+  for_each = {
+    "metrics/hll"           = { collection = "metrics", field = "hll" }
+    "metrics_buckets/hll"   = { collection = "metrics_buckets", field = "hll" }
+    "metrics/topReferrers"  = { collection = "metrics", field = "topReferrers" }
+    "metrics/topUserAgents" = { collection = "metrics", field = "topUserAgents" }
+  }
+
+  project    = var.gcp_project_id
+  database   = google_firestore_database.database.name
+  collection = each.value.collection
+  field      = each.value.field
+
+  index_config {}
+}
+
+# 2c. Latidos del espejo de links de ms-admin: un documento por instancia, que se
+# borra solo al vencer expireAt
+resource "google_firestore_field" "link_mirror_heartbeats_ttl" {
+  project    = var.gcp_project_id
+  database   = google_firestore_database.database.name
+  collection = "link_mirror_heartbeats"
+  field      = "expireAt"
+
+  ttl_config {}
+}
+
+# Índices compuestos de GET /links (filtro enabled combinado con cada orden;
+# sort=newest ordena por createdAt). Sin filtro alcanzan los índices de un solo
+# campo que Firestore crea solo.
+resource "google_firestore_index" "links_list" {
+  for_each = {
+    "enabled-createdAt" = ["createdAt"]
+    "enabled-clicks"    = ["totalClicks"]
+  }
+
+  project    = var.gcp_project_id
+  database   = google_firestore_database.database.name
+  collection = "links"
+
+  fields {
+    field_path = "enabled"
+    order      = "ASCENDING"
+  }
+
+  dynamic "fields" {
+    for_each = each.value
+    content {
+      field_path = fields.value
+      order      = "DESCENDING"
+    }
+  }
+
+  fields {
+    field_path = "__name__"
+    order      = "DESCENDING"
+  }
+}
+
 # 3. Cuentas de Servicio (SA)
 # SA para ms-admin
 resource "google_service_account" "ms_admin_sa" {
@@ -102,6 +164,14 @@ resource "google_cloud_run_v2_service" "ms_admin" {
         name  = "METRICS_COLLECTION"
         value = "metrics"
       }
+      env {
+        name  = "METRICS_ROLLUP_COLLECTION"
+        value = "metrics_rollups"
+      }
+      env {
+        name  = "METRICS_BUCKETS_COLLECTION"
+        value = "metrics_buckets"
+      }
     }
   }
   
@@ -136,6 +206,14 @@ resource "google_cloud_run_v2_service" "ms_redirect" {
         name  = "METRICS_COLLECTION"
         value = "metrics"
       }
+      env {
+        name  = "METRICS_ROLLUP_COLLECTION"
+        value = "metrics_rollups"
+      }
+      env {
+        name  = "METRICS_BUCKETS_COLLECTION"
+        value = "metrics_buckets"
+      }
     }
   }
   depends_on = [ google_project_service.apis["run.googleapis.com"] ]
@@ -181,6 +259,74 @@ resource "google_cloud_run_v2_service" "frontend" {
 }
 
 
+# ----- Job de reconciliación de rollups -----
+# Misma imagen que ms-admin: reconstruye los rollups y corrige totalClicks de cada
+# link (orden por clics de GET /links). La ingesta ya suma totalClicks, así que el
+# job solo corrige desvíos y rellena los links anteriores al campo; entre corridas
+# el orden puede ir hasta un intervalo (var.reconcile_rollups_schedule) atrasado.
+resource "google_cloud_run_v2_job" "reconcile_rollups" {
+  provider = google
+  name     = "reconcile-rollups"
+  location = var.gcp_region
+
+  template {
+    template {
+      service_account = google_service_account.ms_admin_sa.email
+      containers {
+        image   = "docker.io/${var.docker_hub_user}/linkly-ms-admin:latest"
+        command = ["python", "-m", "app.jobs.reconcile_rollups"]
+        env {
+          name  = "LINKS_COLLECTION"
+          value = "links"
+        }
+        env {
+          name  = "METRICS_COLLECTION"
+          value = "metrics"
+        }
+        env {
+          name  = "METRICS_ROLLUP_COLLECTION"
+          value = "metrics_rollups"
+        }
+        env {
+          name  = "METRICS_BUCKETS_COLLECTION"
+          value = "metrics_buckets"
+        }
+      }
+    }
+  }
+  depends_on = [ google_project_service.apis["run.googleapis.com"] ]
+}
+
+# SA con la que Cloud Scheduler lanza el job
+resource "google_service_account" "scheduler_sa" {
+  account_id   = "scheduler-sa"
+  display_name = "Service Account for Cloud Scheduler"
+}
+
+resource "google_cloud_run_v2_job_iam_member" "scheduler_invoker" {
+  provider = google
+  name     = google_cloud_run_v2_job.reconcile_rollups.name
+  location = var.gcp_region
+  project  = var.gcp_project_id
+  role     = "roles/run.invoker"
+  member   = "serviceAccount:${google_service_account.scheduler_sa.email}"
+}
+
+resource "google_cloud_scheduler_job" "reconcile_rollups" {
+  provider = google
+  name     = "reconcile-rollups"
+  region   = var.gcp_region
+  schedule = var.reconcile_rollups_schedule
+
+  http_target {
+    http_method = "POST"
+    uri         = "https://run.googleapis.com/v2/projects/${var.gcp_project_id}/locations/${var.gcp_region}/jobs/${google_cloud_run_v2_job.reconcile_rollups.name}:run"
+    oauth_token {
+      service_account_email = google_service_account.scheduler_sa.email
+    }
+  }
+  depends_on = [ google_project_service.apis["cloudscheduler.googleapis.com"] ]
+}
 
 # Permitir que CUALQUIERA (allUsers) invoque los servicios públicos
 resource "google_cloud_run_service_iam_member" "public_invokers" {
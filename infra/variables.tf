@@ -12,4 +12,10 @@ variable "gcp_region" {
 variable "docker_hub_user" {
   description = "Tu nombre de usuario de Docker Hub."
   type        = string
-}
\ No newline at end of file
+}
+
+variable "reconcile_rollups_schedule" {
+  description = "Frecuencia (cron) del job de reconciliación de rollups y totalClicks."
+  type        = string
+  default     = "*/30 * * * *"
+}
@@ -18,8 +18,116 @@ class Settings(BaseSettings):
     LINKS_COLLECTION: str = "links"
     SLUGS_COLLECTION: str = "slugs"
     METRICS_COLLECTION: str = "metrics"
+    # Un documento por slug con los totales (clicks, byVariant, byDevice, byCountry),
+    # mantenido por ms-redirect junto a los documentos slug#variant.
+    METRICS_ROLLUP_COLLECTION: str = "metrics_rollups"
+    # Buckets por hora y por día (ID slug#h#YYYYMMDDHH#variant / slug#d#YYYYMMDD#variant)
+    METRICS_BUCKETS_COLLECTION: str = "metrics_buckets"
     # ------------------------------------------
 
+    # --- MOTOR DE ALMACENAMIENTO ---
+    # "firestore" (por defecto), "sqlite" (despliegues de un solo nodo / benchmarks)
+    # o "memory" (pruebas). Ver app/db/dynamo.get_storage().
+    STORAGE_BACKEND: str = "firestore"
+    # Ruta del archivo SQLite (se abre en modo WAL). Solo aplica con STORAGE_BACKEND=sqlite.
+    SQLITE_PATH: str = "linkly.db"
+    # ------------------------------
+
+    # --- CACHÉ DE LINKS (get_link_by_id) ---
+    # Entradas máximas (LRU) y antigüedad máxima en segundos. 0 en cualquiera la desactiva.
+    LINK_CACHE_MAX_ENTRIES: int = 1024
+    LINK_CACHE_TTL_SECONDS: float = 30.0
+    # linkId -> slug (el slug de un link no cambia: TTL largo). Permite pedir las
+    # métricas del slug en paralelo con la lectura del link.
+    LINK_SLUG_CACHE_MAX_ENTRIES: int = 10000
+    LINK_SLUG_CACHE_TTL_SECONDS: float = 3600.0
+    # ---------------------------------------
+
+    # --- PAGINACIÓN DE GET /links ---
+    LIST_LINKS_DEFAULT_LIMIT: int = 50
+    LIST_LINKS_MAX_LIMIT: int = 500
+    # --------------------------------
+
+    # --- CREACIÓN MASIVA (POST /links:batch) ---
+    BATCH_CREATE_MAX_ITEMS: int = 500
+    # -------------------------------------------
+
+    # --- MÉTRICAS DE VARIOS LINKS (GET /metrics) ---
+    METRICS_BATCH_MAX_ITEMS: int = 100
+    # -----------------------------------------------
+
+    # --- SERIES DE TIEMPO (GET /links/{id}/metrics?from=&to=&granularity=) ---
+    # Rango por defecto si no se indica "from" y máximo de puntos por serie
+    METRICS_SERIES_DEFAULT_DAYS: int = 30
+    METRICS_SERIES_MAX_POINTS: int = 24 * 93
+    # -------------------------------------------------------------------------
+
+    # --- INGESTA DE CLICS (POST /events/clicks) ---
+    CLICK_EVENTS_MAX_ITEMS: int = 5000
+    # Write-behind: con CLICK_BUFFER_ENABLED los clics se acumulan en memoria y se
+    # escriben cada CLICK_BUFFER_FLUSH_INTERVAL_SECONDS o al llegar a CLICK_BUFFER_MAX_KEYS
+    # contadores distintos. Con la cola de lotes llena, la ingesta responde 503.
+    CLICK_BUFFER_ENABLED: bool = False
+    CLICK_BUFFER_FLUSH_INTERVAL_SECONDS: float = 1.0
+    CLICK_BUFFER_MAX_KEYS: int = 5000
+    CLICK_BUFFER_MAX_QUEUED_FLUSHES: int = 4
+    CLICK_BUFFER_PUT_TIMEOUT_SECONDS: float = 2.0
+    CLICK_BUFFER_DRAIN_TIMEOUT_SECONDS: float = 20.0
+    # ----------------------------------------------
+
+    # --- HEAVY HITTERS (topReferrers / topUserAgents) ---
+    # Valores guardados por resumen Space-Saving en cada documento slug#variant (mismo
+    # valor que METRICS_TOPK_CAPACITY en ms-redirect) y valores devueltos por métrica.
+    METRICS_TOPK_CAPACITY: int = 50
+    METRICS_TOPK_RESULTS: int = 10
+    # ----------------------------------------------------
+
+    # --- DISPONIBILIDAD DE SLUGS (GET /slugs/{slug}/available) ---
+    # Filtro de Bloom con todos los slugs, cargado en segundo plano al arrancar y
+    # actualizado al crear. Solo evita lecturas con el motor en memoria: con varias
+    # instancias no ve los slugs creados en otras y cada consulta se confirma en el motor.
+    # Se dimensiona para SLUG_FILTER_CAPACITY slugs con SLUG_FILTER_ERROR_RATE de falsos
+    # positivos (cada positivo cuesta una lectura de confirmación). False lo desactiva.
+    SLUG_FILTER_ENABLED: bool = True
+    SLUG_FILTER_CAPACITY: int = 1_000_000
+    SLUG_FILTER_ERROR_RATE: float = 0.01
+    # -------------------------------------------------------------
+
+    # --- BÚSQUEDA DE LINKS (GET /links/search) ---
+    # Índice en proceso cargado al arrancar desde la colección de links y actualizado
+    # al crear y borrar. False lo desactiva (la búsqueda responde 503).
+    SEARCH_INDEX_ENABLED: bool = True
+    # ---------------------------------------------
+
+    # --- GENERACIÓN DE SLUGS (links creados sin slug) ---
+    # Slugs titulo, titulo-2... leídos como máximo por consulta de rango; si el título
+    # tiene más, el slug nuevo lleva un sufijo aleatorio corto.
+    SLUG_GENERATION_SCAN_LIMIT: int = 1000
+    # ----------------------------------------------------
+
+    # --- ESPEJO DE LINKS EN MEMORIA (on_snapshot de Firestore) ---
+    # Un listener mantiene en memoria las colecciones de links y slugs; las lecturas de
+    # links, listados y slugs salen del espejo mientras esté al día y, si no, del motor.
+    # Solo aplica con STORAGE_BACKEND=firestore.
+    LINK_MIRROR_ENABLED: bool = False
+    # Retraso máximo (segundos entre la escritura y su llegada al espejo) para usarlo;
+    # también el máximo sin recibir nada del listener antes de darlo por colgado
+    LINK_MIRROR_MAX_LAG_SECONDS: float = 5.0
+    # Cada tantos segundos la instancia escribe su documento de latido, que llega por el
+    # mismo listener: sin cambios en los links el espejo sigue al día. Cada latido es una
+    # escritura; debe ser menor que LINK_MIRROR_MAX_LAG_SECONDS.
+    LINK_MIRROR_HEARTBEAT_SECONDS: float = 2.0
+    # Un documento por instancia, con expireAt para una política TTL de Firestore
+    LINK_MIRROR_HEARTBEAT_COLLECTION: str = "link_mirror_heartbeats"
+    # -------------------------------------------------------------
+
+    # --- SINGLE-FLIGHT (get_link_by_id, get_link_metrics, list_links) ---
+    # Las llamadas idénticas que llegan mientras otra está en curso esperan su resultado
+    # en vez de repetir la lectura (p. ej. muchas consultas a las métricas de un link
+    # en tendencia). False lo desactiva.
+    SINGLE_FLIGHT_ENABLED: bool = True
+    # --------------------------------------------------------------------
+
     # Puedes añadir aquí otras configuraciones que necesites leer del entorno
     # Por ejemplo, si necesitaras el ID del proyecto en el código:
     # GCP_PROJECT_ID: str = "default-project-id"
@@ -0,0 +1,42 @@
+import hashlib
+import json
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+# --- GET condicionales (ETag / If-None-Match) ---
+#
+# El ETag es fuerte y sale del hash del cuerpo JSON ya serializado, así que es el
+# mismo para cualquier motor de almacenamiento y cambia solo si cambia la respuesta.
+# Un cliente que repite la consulta con If-None-Match recibe 304 sin cuerpo (el
+# frontend guarda los validadores en LinkService).
+
+
+def etag_for(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def _matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match usa comparación débil: se ignora el prefijo W/
+    candidates = (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+    return etag in candidates
+
+
+def conditional_json(request: Request, payload) -> Response:
+    """
+    Respuesta JSON con ETag; 304 sin cuerpo si coincide con If-None-Match.
+    Serializa igual que la JSONResponse por defecto de FastAPI.
+    """
+    body = json.dumps(
+        jsonable_encoder(payload), ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
+    etag = etag_for(body)
+    # no-cache: se puede guardar, pero hay que revalidar siempre (los datos cambian con cada clic)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -7,12 +7,18 @@ from google.cloud.firestore_v1.client import Client # Mantener por si acaso, aun
 from google.cloud.firestore_v1.async_client import AsyncClient
 # ----------------------------------------------
 
+from app.core.config import settings
+from app.db.storage import StorageBackend
+
 logger = logging.getLogger(__name__)
 
 # --- CAMBIO: Variable para cliente asíncrono ---
 _async_db: AsyncClient = None
 # ---------------------------------------------
 
+# Motor de almacenamiento activo (ver get_storage)
+_storage: StorageBackend = None
+
 def initialize_firebase():
     """Inicializa la app Firebase Admin si no existe."""
     # --- CAMBIO: Forma correcta de verificar si ya está inicializado ---
@@ -60,6 +66,36 @@ def get_db() -> AsyncClient:
     return _async_db
 # -----------------------------------------
 
+def get_storage() -> StorageBackend:
+    """
+    Obtiene el motor de almacenamiento singleton según settings.STORAGE_BACKEND
+    ("firestore", "sqlite" o "memory").
+    """
+    global _storage
+    if _storage is None:
+        backend = settings.STORAGE_BACKEND.lower()
+        if backend == "firestore":
+            from app.db.firestore_backend import FirestoreBackend
+            # El cliente síncrono de Firebase Admin solo se usa para el espejo de links (on_snapshot)
+            _storage = FirestoreBackend(get_db(), listen_db=firestore.client)
+        elif backend == "sqlite":
+            from app.db.sqlite_backend import SQLiteBackend
+            _storage = SQLiteBackend(settings.SQLITE_PATH)
+        elif backend == "memory":
+            from app.db.storage import MemoryBackend
+            _storage = MemoryBackend()
+        else:
+            raise RuntimeError(f"STORAGE_BACKEND desconocido: {settings.STORAGE_BACKEND}")
+        logger.info(f"🔹 Motor de almacenamiento: {_storage.name}")
+    return _storage
+
+
+def set_storage(storage: StorageBackend | None):
+    """Reemplaza el motor activo (pruebas). None fuerza a recrearlo en el próximo get_storage()."""
+    global _storage
+    _storage = storage
+
+
 def check_firestore_connection():
     """Verifica si se puede obtener una conexión a Firestore."""
     try:
@@ -0,0 +1,492 @@
+import asyncio
+import logging
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, Callable
+
+from google.api_core import gapic_v1
+from google.api_core.exceptions import AlreadyExists, NotFound
+from google.cloud import firestore
+from google.cloud.firestore_v1.bulk_batch import BulkWriteBatch
+from google.rpc import code_pb2
+from google.cloud.firestore_v1 import AsyncTransaction
+from google.cloud.firestore_v1.async_client import AsyncClient
+from google.cloud.firestore_v1.base_query import FieldFilter
+from google.cloud.firestore_v1.client import Client
+from google.cloud.firestore_v1.watch import ChangeType
+
+from app.core.config import settings
+from app.db.storage import (
+    LINK_TOTALS_KIND, ROLLUP_SEEDED_FIELD, SKETCH_FIELDS, StorageBackend, bucket_range, merge_rollup_shards, metric_range, rollup_range,
+    trimmed_summaries,
+)
+from app.services.hll import HLL_FIELD
+from app.services.topk import TOPK_FIELDS
+
+logger = logging.getLogger(__name__)
+
+
+# Documentos por página al recorrer colecciones completas. Paginar con start_after
+# mantiene la memoria acotada y evita que un único stream largo exceda su deadline.
+_STREAM_PAGE_SIZE = 500
+
+
+async def _stream_paged(query) -> AsyncIterator:
+    """Recorre una consulta ordenada página a página, reanudando tras el último snapshot."""
+    last = None
+    while True:
+        page = query.limit(_STREAM_PAGE_SIZE)
+        if last is not None:
+            page = page.start_after(last)
+        count = 0
+        async for doc in page.stream():
+            count += 1
+            last = doc
+            yield doc
+        if count < _STREAM_PAGE_SIZE:
+            return
+
+
+# Máximo de escrituras por commit / BatchWrite en Firestore
+_MAX_BATCH_WRITES = 500
+
+
+class _AsyncBulkWriteBatch(BulkWriteBatch):
+    """
+    BulkWriteBatch para el cliente asíncrono: usa la RPC BatchWrite, que NO es atómica
+    y devuelve un estado por escritura (p. ej. ALREADY_EXISTS en un create()).
+    """
+
+    async def commit(self, retry=gapic_v1.method.DEFAULT, timeout=None):
+        request, kwargs = self._prep_commit(retry, timeout)
+        response = await self._client._firestore_api.batch_write(
+            request=request, metadata=self._client._rpc_metadata, **kwargs
+        )
+        self._write_pbs = []
+        return response
+
+
+# Vida del documento de latido de una instancia (campo expireAt, política TTL)
+_HEARTBEAT_TTL = timedelta(days=1)
+
+
+class _CollectionWatches:
+    """Listeners on_snapshot de varias colecciones (resultado de watch_links)."""
+
+    def __init__(self, watches: list, heartbeat_ref=None):
+        self._watches = watches
+        self._heartbeat_ref = heartbeat_ref
+
+    @property
+    def is_active(self) -> bool:
+        # El cliente reintenta solo los errores transitorios; si uno se cierra, el espejo deja de estar al día
+        return all(watch.is_active for watch in self._watches)
+
+    def heartbeat(self) -> None:
+        """Escribe el latido de esta instancia; llega al espejo por su propio listener."""
+        if self._heartbeat_ref is not None:
+            self._heartbeat_ref.set({
+                "at": firestore.SERVER_TIMESTAMP,
+                "expireAt": datetime.now(timezone.utc) + _HEARTBEAT_TTL,
+            })
+
+    def stop(self) -> None:
+        for watch in self._watches:
+            watch.unsubscribe()
+
+
+class FirestoreBackend(StorageBackend):
+    """Motor sobre Cloud Firestore (cliente asíncrono)."""
+
+    name = "firestore"
+
+    def __init__(self, db: AsyncClient, listen_db: Callable[[], Client] | None = None):
+        self.db = db
+        # El cliente asíncrono no admite on_snapshot: watch_links usa uno síncrono
+        self._listen_db = listen_db
+        self.links = db.collection(settings.LINKS_COLLECTION)
+        self.slugs = db.collection(settings.SLUGS_COLLECTION)
+        self.metrics = db.collection(settings.METRICS_COLLECTION)
+        self.rollups = db.collection(settings.METRICS_ROLLUP_COLLECTION)
+        self.buckets = db.collection(settings.METRICS_BUCKETS_COLLECTION)
+
+    async def get_link(self, link_id: str) -> dict | None:
+        doc = await self.links.document(link_id).get()
+        if not doc.exists:
+            return None
+        data = doc.to_dict()
+        data["linkId"] = doc.id  # Asegurarse que el ID esté presente
+        return data
+
+    async def create_link(self, link_doc: dict) -> None:
+        link_ref = self.links.document(link_doc["linkId"])
+        slug_ref = self.slugs.document(link_doc["slug"])
+
+        # 1) Reservar el slug con create(): falla con AlreadyExists si ya existe,
+        #    sin leerlo antes ni abrir una transacción que pueda abortar por contención.
+        try:
+            reserved = await slug_ref.create({"linkId": link_doc["linkId"]})
+        except AlreadyExists:
+            logger.warning(f"Colisión de slug detectada al reservar: {link_doc['slug']}")
+            raise AlreadyExists("El slug ya existe")
+
+        # 2) Escribir el link en un batch junto con una precondición sobre la reserva:
+        #    si alguien liberó o reemplazó el slug entretanto, no se escribe nada.
+        only_our_reservation = self.db.write_option(last_update_time=reserved.update_time)
+        batch = self.db.batch()
+        batch.set(link_ref, link_doc)
+        batch.update(slug_ref, {"linkId": link_doc["linkId"]}, option=only_our_reservation)
+        try:
+            await batch.commit()
+        except Exception as e:
+            # 3) Compensación: liberar el slug reservado (solo si sigue siendo nuestra reserva)
+            logger.error(f"Error escribiendo link {link_doc['linkId']}, liberando slug {link_doc['slug']}: {e}")
+            try:
+                await slug_ref.delete(option=only_our_reservation)
+            except Exception as cleanup_error:
+                logger.error(
+                    f"No se pudo liberar el slug {link_doc['slug']} tras el error: {cleanup_error}",
+                    exc_info=True,
+                )
+            raise
+
+    async def create_links(self, link_docs: list[dict]) -> list[str]:
+        statuses = ["error"] * len(link_docs)
+        reserved = []  # índices cuyo slug se reservó
+        in_doubt = []  # índices de un BatchWrite que falló entero: su reserva pudo aplicarse
+
+        try:
+            # 1) Reservar slugs con create() (precondición "no existe") en BatchWrite no atómicos
+            for start in range(0, len(link_docs), _MAX_BATCH_WRITES):
+                chunk = range(start, min(start + _MAX_BATCH_WRITES, len(link_docs)))
+                bulk = _AsyncBulkWriteBatch(self.db)
+                for i in chunk:
+                    bulk.create(self.slugs.document(link_docs[i]["slug"]), {"linkId": link_docs[i]["linkId"]})
+                try:
+                    response = await bulk.commit()
+                except Exception:
+                    in_doubt.extend(chunk)
+                    raise
+                for i, status in zip(chunk, response.status):
+                    if status.code == code_pb2.OK:
+                        reserved.append(i)
+                    elif status.code == code_pb2.ALREADY_EXISTS:
+                        statuses[i] = "conflict"
+                    else:
+                        logger.error(f"Error reservando slug {link_docs[i]['slug']}: {status.message}")
+
+            # 2) Escribir los links reservados en batches atómicos; si uno falla sus slugs se liberan
+            for start in range(0, len(reserved), _MAX_BATCH_WRITES):
+                chunk = reserved[start:start + _MAX_BATCH_WRITES]
+                batch = self.db.batch()
+                for i in chunk:
+                    batch.set(self.links.document(link_docs[i]["linkId"]), link_docs[i])
+                try:
+                    await batch.commit()
+                except Exception as e:
+                    logger.error(f"Error escribiendo batch de links, liberando {len(chunk)} slugs: {e}", exc_info=True)
+                    continue
+                for i in chunk:
+                    statuses[i] = "created"
+        except Exception as e:
+            logger.error(f"Error reservando slugs del lote, se liberan los reservados: {e}", exc_info=True)
+
+        # Toda reserva sin su link (fallo en cualquier fase) se libera; esos items quedan en "error"
+        orphans = [i for i in reserved + in_doubt if statuses[i] != "created"]
+        await self._release_slugs([link_docs[i] for i in orphans])
+        return statuses
+
+    async def _release_slugs(self, link_docs: list[dict]) -> None:
+        """
+        Libera las reservas de slug de links que no llegaron a escribirse. Cada slug se
+        borra solo si sigue apuntando al linkId del link (precondición sobre su
+        update_time); los fallos se registran y no se propagan.
+        """
+        async def release(link_doc: dict) -> None:
+            slug_ref = self.slugs.document(link_doc["slug"])
+            try:
+                snapshot = await slug_ref.get()
+                if snapshot.exists and (snapshot.to_dict() or {}).get("linkId") == link_doc["linkId"]:
+                    await slug_ref.delete(option=self.db.write_option(last_update_time=snapshot.update_time))
+            except Exception as e:
+                logger.error(f"No se pudo liberar el slug {link_doc['slug']} del link {link_doc['linkId']}: {e}")
+
+        await asyncio.gather(*(release(link_doc) for link_doc in link_docs))
+
+    async def delete_link(self, link_id: str) -> dict:
+        link_ref = self.links.document(link_id)
+        deleted = {}
+
+        @firestore.async_transactional
+        async def _run_delete_transaction(transaction: AsyncTransaction):
+            # Leer el link DENTRO de la transacción para obtener el slug
+            link_doc = await link_ref.get(transaction=transaction)
+            if not link_doc.exists:
+                raise NotFound("Link no encontrado")
+            deleted.update(link_doc.to_dict())
+            transaction.delete(link_ref)
+            slug = deleted.get("slug")
+            if slug:
+                transaction.delete(self.slugs.document(slug))
+            else:
+                logger.warning(f"Link {link_id} no tenía slug asociado, no se borró slug.")
+
+        await _run_delete_transaction(self.db.transaction())
+        return deleted
+
+    async def list_links(
+        self,
+        limit: int | None = None,
+        start_after: str | None = None,
+        *,
+        enabled: bool | None = None,
+        created_after: str | None = None,
+        order_by: str | None = None,
+        start_after_value=None,
+    ) -> list[dict]:
+        # Sin filtros alcanzan los índices automáticos; con enabled se usan los índices
+        # compuestos de infra/main.tf (google_firestore_index.links_list)
+        query = self.links
+        if enabled is not None:
+            query = query.where(filter=FieldFilter("enabled", "==", enabled))
+        if created_after is not None:
+            query = query.where(filter=FieldFilter("createdAt", ">=", created_after))
+        if order_by is not None:
+            query = query.order_by(order_by, direction=firestore.Query.DESCENDING)
+        query = query.order_by("__name__", direction=firestore.Query.DESCENDING)
+        if start_after is not None:
+            cursor = {"__name__": start_after}
+            if order_by is not None:
+                cursor = {order_by: start_after_value, **cursor}
+            query = query.start_after(cursor)
+        if limit is not None:
+            query = query.limit(limit)
+        items = []
+        async for doc in query.stream():
+            data = doc.to_dict()
+            data["linkId"] = doc.id
+            items.append(data)
+        return items
+
+    async def set_total_clicks(self, link_id: str, total_clicks: int) -> None:
+        try:
+            await self.links.document(link_id).update({"totalClicks": total_clicks})
+        except NotFound:
+            pass  # Borrado mientras se recalculaba
+
+    async def stream_links_by_slug(self) -> AsyncIterator[dict]:
+        async for doc in _stream_paged(self.links.order_by("slug")):
+            data = doc.to_dict()
+            data["linkId"] = doc.id
+            yield data
+
+    async def stream_slugs(self) -> AsyncIterator[str]:
+        # select([]) solo trae los IDs: el documento del slug no hace falta
+        async for doc in _stream_paged(self.slugs.select([]).order_by("__name__")):
+            yield doc.id
+
+    def watch_links(self, on_change: Callable[[str, list[tuple[str, dict | None]], datetime], None]):
+        if self._listen_db is None:
+            return None
+        client = self._listen_db()
+
+        def listener(collection: str):
+            def callback(_docs, changes, read_time):
+                on_change(collection, [
+                    (change.document.id, None if change.type == ChangeType.REMOVED else change.document.to_dict())
+                    for change in changes
+                ], read_time)
+            return callback
+
+        def on_heartbeat(_docs, _changes, read_time):
+            on_change("heartbeat", [], read_time)
+
+        heartbeat_ref = client.collection(settings.LINK_MIRROR_HEARTBEAT_COLLECTION).document(uuid.uuid4().hex)
+        return _CollectionWatches([
+            client.collection(settings.LINKS_COLLECTION).on_snapshot(listener("links")),
+            client.collection(settings.SLUGS_COLLECTION).on_snapshot(listener("slugs")),
+            heartbeat_ref.on_snapshot(on_heartbeat),
+        ], heartbeat_ref)
+
+    async def stream_metric_docs(self) -> AsyncIterator[dict]:
+        async for doc in _stream_paged(self.metrics.order_by("__name__")):
+            yield {**doc.to_dict(), "doc_id": doc.id}
+
+    def _rollup_shards_query(self, slug: str):
+        start, end = rollup_range(slug)
+        return (
+            self.rollups
+            .where(filter=FieldFilter("__name__", ">=", self.rollups.document(start)))
+            .where(filter=FieldFilter("__name__", "<", self.rollups.document(end)))
+        )
+
+    async def get_rollup(self, slug: str) -> dict | None:
+        return merge_rollup_shards([doc.to_dict() async for doc in self._rollup_shards_query(slug).stream()])
+
+    @staticmethod
+    async def _aggregate(query) -> dict:
+        """Ejecuta una consulta de agregación y devuelve {alias: valor}."""
+        results = await query.get()
+        return {result.alias: result.value for result in results[0]} if results else {}
+
+    async def _click_total(self, slug: str) -> int:
+        # Agregaciones en el servidor: se transfiere un número, no los documentos con sus mapas.
+        # La marca de sembrado está solo en el documento base (ver rebuild_rollup).
+        base, rollup = await asyncio.gather(
+            self.rollups.document(slug).get(field_paths=[ROLLUP_SEEDED_FIELD]),
+            self._aggregate(self._rollup_shards_query(slug).sum("clicks", alias="clicks")),
+        )
+        if (base.to_dict() or {}).get(ROLLUP_SEEDED_FIELD):
+            return int(rollup.get("clicks") or 0)
+        metrics = await self._aggregate(self._metric_docs_query(slug).sum("clicks", alias="clicks"))
+        return int(metrics.get("clicks") or 0)
+
+    async def get_click_totals(self, slugs: list[str]) -> dict[str, int]:
+        totals = await asyncio.gather(*(self._click_total(slug) for slug in slugs))
+        return dict(zip(slugs, totals))
+
+    async def rebuild_rollup(self, slug: str, aggregate: Callable[[list[dict]], dict]) -> tuple[dict | None, dict]:
+        rollup_ref = self.rollups.document(slug)
+        result = {}
+
+        # La consulta de variantes y la escritura del rollup van en la misma transacción:
+        # si ms-redirect incrementa algo entretanto, la transacción se reintenta.
+        @firestore.async_transactional
+        async def _run_rebuild_transaction(transaction: AsyncTransaction):
+            shards = [doc async for doc in self._rollup_shards_query(slug).stream(transaction=transaction)]
+            items = []
+            async for doc in self._metric_docs_query(slug).stream(transaction=transaction):
+                items.append({**doc.to_dict(), "doc_id": doc.id})
+            result["previous"] = merge_rollup_shards([doc.to_dict() for doc in shards])
+            result["rollup"] = aggregate(items)
+            for doc in shards:
+                if doc.id != slug:
+                    transaction.delete(doc.reference)
+            transaction.set(rollup_ref, {**result["rollup"], ROLLUP_SEEDED_FIELD: True})
+
+        await _run_rebuild_transaction(self.db.transaction())
+        return result["previous"], result["rollup"]
+
+    @staticmethod
+    def _increment_transforms(delta: dict, transform=firestore.Increment) -> dict:
+        """
+        Convierte un delta {"clicks": 2, "byCountry": {"CO": 2}} en transformaciones
+        Increment. Los registros del sketch HLL_FIELD usan Maximum: sin leer el documento.
+        """
+        return {
+            key: FirestoreBackend._increment_transforms(
+                value, firestore.Maximum if key == HLL_FIELD else transform
+            ) if isinstance(value, dict) else transform(value)
+            for key, value in delta.items()
+        }
+
+    async def apply_increments(self, increments: dict[tuple[str, str], dict]) -> int:
+        collections = {"metrics": self.metrics, "rollups": self.rollups, "buckets": self.buckets}
+        items = [item for item in increments.items() if item[0][0] != LINK_TOTALS_KIND]
+        totals = [(doc_id, delta) for (kind, doc_id), delta in increments.items() if kind == LINK_TOTALS_KIND]
+        # set(merge=True) con Increment: una escritura por documento, sin leerlo ni abrir transacción
+        for start in range(0, len(items), _MAX_BATCH_WRITES):
+            batch = self.db.batch()
+            for (kind, doc_id), delta in items[start:start + _MAX_BATCH_WRITES]:
+                batch.set(collections[kind].document(doc_id), self._increment_transforms(delta), merge=True)
+            await batch.commit()
+
+        # Los links no se crean: update por separado, ignorando los borrados mientras tanto
+        async def add_total(link_id: str, delta: dict) -> None:
+            try:
+                await self.links.document(link_id).update(self._increment_transforms(delta))
+            except NotFound:
+                pass
+
+        await asyncio.gather(*(add_total(link_id, delta) for link_id, delta in totals))
+        return len(items) + len(totals)
+
+    async def get_metric_sketches(self, slugs: list[str]) -> dict[str, list[dict]]:
+        async def sketches(slug: str) -> list[dict]:
+            # Proyección: solo se transfieren los sketches, no los mapas de conteos
+            query = self._metric_docs_query(slug).select(list(SKETCH_FIELDS))
+            return [doc.to_dict() or {} async for doc in query.stream()]
+
+        return dict(zip(slugs, await asyncio.gather(*(sketches(slug) for slug in slugs))))
+
+    async def trim_heavy_hitters(self, slug: str, capacity: int) -> int:
+        trimmed = []
+
+        # Fuera de la ruta de ingesta (la llama reconcile_rollups): lectura y recorte en una transacción
+        @firestore.async_transactional
+        async def _run_trim_transaction(transaction: AsyncTransaction):
+            trimmed.clear()
+            query = self._metric_docs_query(slug).select(list(TOPK_FIELDS.values()))
+            async for doc in query.stream(transaction=transaction):
+                summaries = trimmed_summaries(doc.to_dict() or {}, capacity)
+                if summaries:
+                    # update() sustituye cada resumen entero (set con merge conservaría los recortados)
+                    transaction.update(doc.reference, summaries)
+                    trimmed.append(doc.id)
+
+        await _run_trim_transaction(self.db.transaction())
+        return len(trimmed)
+
+    async def get_bucket_docs(self, slug: str, granularity: str, first_key: str, last_key: str) -> list[dict]:
+        start, end = bucket_range(slug, granularity, first_key, last_key)
+        query = (
+            self.buckets
+            .where(filter=FieldFilter("__name__", ">=", self.buckets.document(start)))
+            .where(filter=FieldFilter("__name__", "<", self.buckets.document(end)))
+            .order_by("__name__")
+        )
+        items = []
+        async for doc in _stream_paged(query):
+            items.append({**doc.to_dict(), "doc_id": doc.id})
+        return items
+
+    async def get_links(self, link_ids: list[str]) -> dict[str, dict]:
+        # Una sola RPC BatchGetDocuments para todos los links
+        found = {}
+        async for doc in self.db.get_all([self.links.document(link_id) for link_id in link_ids]):
+            if doc.exists:
+                data = doc.to_dict()
+                data["linkId"] = doc.id
+                found[doc.id] = data
+        return found
+
+    async def get_slugs(self, slugs: list[str]) -> dict[str, str]:
+        found = {}
+        refs = [self.slugs.document(slug) for slug in slugs]
+        async for doc in self.db.get_all(refs, field_paths=["linkId"]):
+            if doc.exists:
+                found[doc.id] = doc.get("linkId")
+        return found
+
+    async def get_slug(self, slug: str) -> str | None:
+        doc = await self.slugs.document(slug).get(field_paths=["linkId"])
+        return doc.get("linkId") if doc.exists else None
+
+    async def list_slugs_in_range(self, start: str, end: str, limit: int) -> list[str]:
+        query = (
+            self.slugs
+            .where(filter=FieldFilter("__name__", ">=", self.slugs.document(start)))
+            .where(filter=FieldFilter("__name__", "<", self.slugs.document(end)))
+            .select([])
+            .limit(limit)
+        )
+        return [doc.id async for doc in query.stream()]
+
+    def _metric_docs_query(self, slug: str):
+        start, end = metric_range(slug)
+        return (
+            self.metrics
+            .where(filter=FieldFilter("__name__", ">=", self.metrics.document(start)))
+            .where(filter=FieldFilter("__name__", "<", self.metrics.document(end)))
+        )
+
+    async def get_metric_docs(self, slug: str) -> list[dict]:
+        items = []
+        async for doc in self._metric_docs_query(slug).stream():
+            data = doc.to_dict()
+            data["doc_id"] = doc.id  # Guardamos el ID para extraer variante
+            items.append(data)
+        return items
+
+    async def close(self) -> None:
+        self.db.close()
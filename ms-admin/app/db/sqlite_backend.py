@@ -0,0 +1,343 @@
+import json
+import logging
+import sqlite3
+from typing import AsyncIterator, Callable
+
+from google.api_core.exceptions import AlreadyExists, NotFound
+
+from app.db.storage import (
+    LINK_ORDER_FIELDS, LINK_TOTALS_KIND, ROLLUP_SEEDED_FIELD, SKETCH_FIELDS, StorageBackend, add_counts, bucket_range, merge_rollup_shards, metric_range, rollup_range,
+    trimmed_summaries,
+)
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS links (
+    link_id TEXT PRIMARY KEY,
+    data    TEXT NOT NULL
+);
+-- Respaldan los órdenes de list_links (como los índices de links en Firestore)
+CREATE INDEX IF NOT EXISTS links_by_created_at ON links (json_extract(data, '$.createdAt'), link_id);
+CREATE INDEX IF NOT EXISTS links_by_total_clicks ON links (json_extract(data, '$.totalClicks'), link_id);
+CREATE TABLE IF NOT EXISTS slugs (
+    slug    TEXT PRIMARY KEY,
+    link_id TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS metrics (
+    doc_id  TEXT PRIMARY KEY,
+    data    TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS metrics_buckets (
+    doc_id  TEXT PRIMARY KEY,
+    data    TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS metrics_rollups (
+    doc_id  TEXT PRIMARY KEY,
+    data    TEXT NOT NULL
+);
+"""
+
+
+# Tabla de cada tipo de contador (ver StorageBackend.apply_increments)
+_COUNTER_TABLES = {"metrics": "metrics", "rollups": "metrics_rollups", "buckets": "metrics_buckets"}
+
+# Filas leídas por bloque al recorrer tablas completas (exportaciones)
+_STREAM_CHUNK = 500
+
+
+class SQLiteBackend(StorageBackend):
+    """
+    Motor embebido sobre SQLite en modo WAL para despliegues de un solo nodo.
+
+    Cada colección de Firestore es una tabla con el ID del documento como clave
+    primaria y el documento serializado en JSON. Las consultas son locales y
+    suficientemente cortas como para ejecutarse directamente en el event loop.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: str):
+        self.path = path
+        # isolation_level=None: autocommit, las transacciones se abren explícitamente.
+        self.conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(_SCHEMA)
+        logger.info(f"✅ SQLite abierto en {path} (WAL)")
+
+    @staticmethod
+    def _load(link_id: str, raw: str) -> dict:
+        data = json.loads(raw)
+        data["linkId"] = link_id
+        return data
+
+    async def get_link(self, link_id: str) -> dict | None:
+        row = self.conn.execute("SELECT data FROM links WHERE link_id = ?", (link_id,)).fetchone()
+        return self._load(link_id, row[0]) if row else None
+
+    async def create_link(self, link_doc: dict) -> None:
+        try:
+            with self.conn:
+                self.conn.execute("BEGIN IMMEDIATE")
+                self.conn.execute(
+                    "INSERT INTO slugs (slug, link_id) VALUES (?, ?)",
+                    (link_doc["slug"], link_doc["linkId"]),
+                )
+                self.conn.execute(
+                    "INSERT INTO links (link_id, data) VALUES (?, ?)",
+                    (link_doc["linkId"], json.dumps(link_doc)),
+                )
+        except sqlite3.IntegrityError as e:
+            raise AlreadyExists("El slug ya existe") from e
+
+    async def create_links(self, link_docs: list[dict]) -> list[str]:
+        statuses = []
+        with self.conn:
+            self.conn.execute("BEGIN IMMEDIATE")
+            for link_doc in link_docs:
+                reserved = self.conn.execute(
+                    "INSERT OR IGNORE INTO slugs (slug, link_id) VALUES (?, ?)",
+                    (link_doc["slug"], link_doc["linkId"]),
+                ).rowcount
+                if not reserved:
+                    statuses.append("conflict")
+                    continue
+                self.conn.execute(
+                    "INSERT INTO links (link_id, data) VALUES (?, ?)",
+                    (link_doc["linkId"], json.dumps(link_doc)),
+                )
+                statuses.append("created")
+        return statuses
+
+    async def delete_link(self, link_id: str) -> dict:
+        with self.conn:
+            self.conn.execute("BEGIN IMMEDIATE")
+            row = self.conn.execute("SELECT data FROM links WHERE link_id = ?", (link_id,)).fetchone()
+            if row is None:
+                raise NotFound("Link no encontrado")
+            deleted = json.loads(row[0])
+            self.conn.execute("DELETE FROM links WHERE link_id = ?", (link_id,))
+            if deleted.get("slug"):
+                self.conn.execute("DELETE FROM slugs WHERE slug = ?", (deleted["slug"],))
+        return deleted
+
+    async def list_links(
+        self,
+        limit: int | None = None,
+        start_after: str | None = None,
+        *,
+        enabled: bool | None = None,
+        created_after: str | None = None,
+        order_by: str | None = None,
+        start_after_value=None,
+    ) -> list[dict]:
+        where, params = [], []
+        if enabled is not None:
+            where.append("json_extract(data, '$.enabled') = ?")
+            params.append(int(enabled))
+        if created_after is not None:
+            where.append("json_extract(data, '$.createdAt') >= ?")
+            params.append(created_after)
+        if order_by is not None:
+            if order_by not in LINK_ORDER_FIELDS:
+                raise ValueError(f"Orden no soportado: {order_by}")
+            field = f"json_extract(data, '$.{order_by}')"
+            where.append(f"{field} IS NOT NULL")
+            if start_after is not None:
+                where.append(f"({field} < ? OR ({field} = ? AND link_id < ?))")
+                params += [start_after_value, start_after_value, start_after]
+            order = f"{field} DESC, link_id DESC"
+        else:
+            if start_after is not None:
+                where.append("link_id < ?")
+                params.append(start_after)
+            order = "link_id DESC"
+
+        sql = "SELECT link_id, data FROM links"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        rows = self.conn.execute(
+            f"{sql} ORDER BY {order} LIMIT ?", (*params, -1 if limit is None else limit)
+        ).fetchall()
+        return [self._load(link_id, raw) for link_id, raw in rows]
+
+    async def set_total_clicks(self, link_id: str, total_clicks: int) -> None:
+        with self.conn:
+            self.conn.execute(
+                "UPDATE links SET data = json_set(data, '$.totalClicks', ?) WHERE link_id = ?", (total_clicks, link_id)
+            )
+
+    async def stream_links_by_slug(self) -> AsyncIterator[dict]:
+        cursor = self.conn.execute(
+            "SELECT l.link_id, l.data FROM slugs s JOIN links l ON l.link_id = s.link_id ORDER BY s.slug"
+        )
+        while rows := cursor.fetchmany(_STREAM_CHUNK):
+            for link_id, raw in rows:
+                yield self._load(link_id, raw)
+
+    async def stream_slugs(self) -> AsyncIterator[str]:
+        cursor = self.conn.execute("SELECT slug FROM slugs ORDER BY slug")
+        while rows := cursor.fetchmany(_STREAM_CHUNK):
+            for (slug,) in rows:
+                yield slug
+
+    async def stream_metric_docs(self) -> AsyncIterator[dict]:
+        cursor = self.conn.execute("SELECT doc_id, data FROM metrics ORDER BY doc_id")
+        while rows := cursor.fetchmany(_STREAM_CHUNK):
+            for doc_id, raw in rows:
+                yield {**json.loads(raw), "doc_id": doc_id}
+
+    async def get_rollup(self, slug: str) -> dict | None:
+        rows = self.conn.execute(
+            "SELECT data FROM metrics_rollups WHERE doc_id >= ? AND doc_id < ?", rollup_range(slug)
+        ).fetchall()
+        return merge_rollup_shards([json.loads(raw) for (raw,) in rows])
+
+    async def get_rollups(self, slugs: list[str]) -> dict[str, dict]:
+        if not slugs:
+            return {}
+        ranges = [rollup_range(slug) for slug in slugs]
+        where = " OR ".join("(doc_id >= ? AND doc_id < ?)" for _ in ranges)
+        params = [bound for r in ranges for bound in r]
+        shards: dict[str, list[dict]] = {}
+        for doc_id, raw in self.conn.execute(f"SELECT doc_id, data FROM metrics_rollups WHERE {where}", params):
+            shards.setdefault(doc_id.split("#", 1)[0], []).append(json.loads(raw))
+        merged = {slug: merge_rollup_shards(shards[slug]) for slug in slugs if slug in shards}
+        return {slug: rollup for slug, rollup in merged.items() if rollup is not None}
+
+    async def get_click_totals(self, slugs: list[str]) -> dict[str, int]:
+        totals = {}
+        for slug in slugs:
+            # SUM en SQLite sobre el campo clicks: no se deserializan los desgloses en Python
+            seeded, clicks = self.conn.execute(
+                f"SELECT MAX(json_extract(data, '$.{ROLLUP_SEEDED_FIELD}')), SUM(json_extract(data, '$.clicks'))"
+                " FROM metrics_rollups WHERE doc_id >= ? AND doc_id < ?",
+                rollup_range(slug),
+            ).fetchone()
+            if not seeded:
+                (clicks,) = self.conn.execute(
+                    "SELECT SUM(json_extract(data, '$.clicks')) FROM metrics WHERE doc_id >= ? AND doc_id < ?",
+                    metric_range(slug),
+                ).fetchone()
+            totals[slug] = int(clicks or 0)
+        return totals
+
+    async def get_metric_sketches(self, slugs: list[str]) -> dict[str, list[dict]]:
+        # Solo los campos de sketches, sin deserializar los conteos
+        columns = ", ".join(f"json_extract(data, '$.{field}')" for field in SKETCH_FIELDS)
+        sketches = {}
+        for slug in slugs:
+            rows = self.conn.execute(
+                f"SELECT {columns} FROM metrics WHERE doc_id >= ? AND doc_id < ?", metric_range(slug)
+            ).fetchall()
+            sketches[slug] = [
+                {field: json.loads(raw) for field, raw in zip(SKETCH_FIELDS, row) if raw} for row in rows
+            ]
+        return sketches
+
+    async def trim_heavy_hitters(self, slug: str, capacity: int) -> int:
+        trimmed = 0
+        with self.conn:
+            self.conn.execute("BEGIN IMMEDIATE")
+            rows = self.conn.execute(
+                "SELECT doc_id, data FROM metrics WHERE doc_id >= ? AND doc_id < ?", metric_range(slug)
+            ).fetchall()
+            for doc_id, raw in rows:
+                data = json.loads(raw)
+                summaries = trimmed_summaries(data, capacity)
+                if summaries:
+                    self.conn.execute(
+                        "UPDATE metrics SET data = ? WHERE doc_id = ?", (json.dumps({**data, **summaries}), doc_id)
+                    )
+                    trimmed += 1
+        return trimmed
+
+    async def rebuild_rollup(self, slug: str, aggregate: Callable[[list[dict]], dict]) -> tuple[dict | None, dict]:
+        with self.conn:
+            self.conn.execute("BEGIN IMMEDIATE")
+            previous = await self.get_rollup(slug)
+            rollup = aggregate(await self.get_metric_docs(slug))
+            self.conn.execute("DELETE FROM metrics_rollups WHERE doc_id >= ? AND doc_id < ?", rollup_range(slug))
+            self.conn.execute(
+                "INSERT INTO metrics_rollups (doc_id, data) VALUES (?, ?)",
+                (slug, json.dumps({**rollup, ROLLUP_SEEDED_FIELD: True})),
+            )
+        return previous, rollup
+
+    async def apply_increments(self, increments: dict[tuple[str, str], dict]) -> int:
+        # Local y en una sola transacción: leer y reescribir el JSON no compite con nadie
+        with self.conn:
+            self.conn.execute("BEGIN IMMEDIATE")
+            for (kind, doc_id), delta in increments.items():
+                if kind == LINK_TOTALS_KIND:
+                    self.conn.execute(
+                        "UPDATE links SET data = json_set(data, '$.totalClicks', "
+                        "coalesce(json_extract(data, '$.totalClicks'), 0) + ?) WHERE link_id = ?",
+                        (delta.get("totalClicks", 0), doc_id),
+                    )
+                    continue
+                table = _COUNTER_TABLES[kind]
+                row = self.conn.execute(f"SELECT data FROM {table} WHERE doc_id = ?", (doc_id,)).fetchone()
+                data = json.loads(row[0]) if row else {}
+                add_counts(data, delta)
+                self.conn.execute(
+                    f"INSERT OR REPLACE INTO {table} (doc_id, data) VALUES (?, ?)", (doc_id, json.dumps(data))
+                )
+        return len(increments)
+
+    async def get_bucket_docs(self, slug: str, granularity: str, first_key: str, last_key: str) -> list[dict]:
+        start, end = bucket_range(slug, granularity, first_key, last_key)
+        rows = self.conn.execute(
+            "SELECT doc_id, data FROM metrics_buckets WHERE doc_id >= ? AND doc_id < ? ORDER BY doc_id",
+            (start, end),
+        ).fetchall()
+        return [{**json.loads(raw), "doc_id": doc_id} for doc_id, raw in rows]
+
+    async def get_links(self, link_ids: list[str]) -> dict[str, dict]:
+        if not link_ids:
+            return {}
+        marks = ",".join("?" * len(link_ids))
+        rows = self.conn.execute(f"SELECT link_id, data FROM links WHERE link_id IN ({marks})", link_ids).fetchall()
+        return {link_id: self._load(link_id, raw) for link_id, raw in rows}
+
+    async def get_slugs(self, slugs: list[str]) -> dict[str, str]:
+        if not slugs:
+            return {}
+        marks = ",".join("?" * len(slugs))
+        return dict(self.conn.execute(f"SELECT slug, link_id FROM slugs WHERE slug IN ({marks})", slugs).fetchall())
+
+    async def get_metric_docs_for_slugs(self, slugs: list[str]) -> dict[str, list[dict]]:
+        result = {slug: [] for slug in slugs}
+        if not slugs:
+            return result
+        # Una sola consulta: un rango de la clave primaria por slug (SQLite los resuelve con el índice)
+        ranges = [metric_range(slug) for slug in slugs]
+        where = " OR ".join("(doc_id >= ? AND doc_id < ?)" for _ in ranges)
+        params = [bound for r in ranges for bound in r]
+        for doc_id, raw in self.conn.execute(f"SELECT doc_id, data FROM metrics WHERE {where}", params):
+            slug = doc_id.split("#", 1)[0]
+            if slug in result:
+                result[slug].append({**json.loads(raw), "doc_id": doc_id})
+        return result
+
+    async def get_slug(self, slug: str) -> str | None:
+        row = self.conn.execute("SELECT link_id FROM slugs WHERE slug = ?", (slug,)).fetchone()
+        return row[0] if row else None
+
+    async def list_slugs_in_range(self, start: str, end: str, limit: int) -> list[str]:
+        rows = self.conn.execute(
+            "SELECT slug FROM slugs WHERE slug >= ? AND slug < ? ORDER BY slug LIMIT ?", (start, end, limit)
+        ).fetchall()
+        return [slug for (slug,) in rows]
+
+    async def get_metric_docs(self, slug: str) -> list[dict]:
+        start, end = metric_range(slug)
+        rows = self.conn.execute(
+            "SELECT doc_id, data FROM metrics WHERE doc_id >= ? AND doc_id < ? ORDER BY doc_id",
+            (start, end),
+        ).fetchall()
+        return [{**json.loads(raw), "doc_id": doc_id} for doc_id, raw in rows]
+
+    async def close(self) -> None:
+        self.conn.close()
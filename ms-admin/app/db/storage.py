@@ -0,0 +1,475 @@
+import asyncio
+import bisect
+import copy
+import logging
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import AsyncIterator, Callable
+
+from google.api_core.exceptions import AlreadyExists, NotFound
+
+from app.services.hll import HLL_FIELD, merge_hll
+from app.services.topk import TOPK_FIELDS, merge_summaries
+
+logger = logging.getLogger(__name__)
+
+
+def metric_range(slug: str) -> tuple[str, str]:
+    """
+    Rango [inicio, fin) de IDs de documentos de métricas de un slug: slug#variant y,
+    en links con contadores repartidos, sus shards slug#variant#sN.
+    """
+    return f"{slug}#", f"{slug}#~"
+
+
+def rollup_range(slug: str) -> tuple[str, str]:
+    """Rango [inicio, fin) de IDs de los shards del rollup de un slug: slug, slug#s1, slug#s2..."""
+    return slug, f"{slug}#~"
+
+
+# Colecciones de contadores que admiten incrementos (ver StorageBackend.apply_increments)
+COUNTER_KINDS = ("metrics", "rollups", "buckets")
+# Tipo de apply_increments que suma al total desnormalizado de un link (doc_id = linkId)
+LINK_TOTALS_KIND = "links"
+# Documentos de contadores que apply_increments escribe de forma atómica en una llamada
+MAX_ATOMIC_INCREMENTS = 500
+
+
+def add_counts(dst: dict, src: dict) -> None:
+    """
+    Suma en dst los conteos de src (números y mapas anidados de números). El sketch
+    HyperLogLog (campo HLL_FIELD) no se suma: se combina con máximo por registro.
+    """
+    for key, value in src.items():
+        if key == HLL_FIELD:
+            merge_hll(dst.setdefault(key, {}), value)
+        elif isinstance(value, dict):
+            add_counts(dst.setdefault(key, {}), value)
+        elif isinstance(value, (int, float)):
+            dst[key] = dst.get(key, 0) + value
+
+
+# Campos de los documentos de métricas con sketches que se combinan al leer:
+# el HyperLogLog de visitantes y los resúmenes Space-Saving de referrers/user agents
+SKETCH_FIELDS = (HLL_FIELD, *TOPK_FIELDS.values())
+
+
+def trimmed_summaries(doc: dict, capacity: int) -> dict:
+    """Resúmenes Space-Saving del documento con más de `capacity` valores, ya recortados."""
+    return {
+        field: merge_summaries([doc[field]], capacity)
+        for field in TOPK_FIELDS.values()
+        if len(doc.get(field) or {}) > capacity
+    }
+
+
+# Marca del documento base del rollup que pone rebuild_rollup: solo desde entonces el
+# rollup incluye la historia anterior a los incrementos (ver merge_rollup_shards)
+ROLLUP_SEEDED_FIELD = "seeded"
+
+
+def merge_rollup_shards(shards: list[dict]) -> dict | None:
+    """
+    Suma los shards de un rollup (clicks y mapas de conteos) en un solo documento.
+
+    None si no hay shards o ninguno está sembrado (ROLLUP_SEEDED_FIELD): el primer clic
+    tras desplegar los rollups crea uno con solo los clics nuevos, así que hasta que
+    rebuild_rollup lo siembre (job de reconciliación) se lee de los documentos slug#variant.
+    """
+    if not any(shard.get(ROLLUP_SEEDED_FIELD) for shard in shards):
+        return None
+    merged: dict = {}
+    for shard in shards:
+        add_counts(merged, {key: value for key, value in shard.items() if key != ROLLUP_SEEDED_FIELD})
+    return merged
+
+
+# Campos por los que se puede ordenar list_links (descendente, desempatando por linkId)
+LINK_ORDER_FIELDS = ("createdAt", "totalClicks")
+
+
+def select_links(
+    links,
+    limit: int | None = None,
+    start_after: str | None = None,
+    *,
+    enabled: bool | None = None,
+    created_after: str | None = None,
+    order_by: str | None = None,
+    start_after_value=None,
+) -> list[dict]:
+    """
+    list_links sobre links ya en memoria (con 'linkId'), recorriéndolos todos: lo usan
+    MemoryBackend y el espejo de links (app/services/link_mirror.py).
+    """
+    if enabled is not None:
+        links = [link for link in links if link.get("enabled") == enabled]
+    if created_after is not None:
+        links = [link for link in links if link.get("createdAt", "") >= created_after]
+    if order_by is not None:
+        links = [link for link in links if link.get(order_by) is not None]
+
+    def key(link):
+        return (link[order_by], link["linkId"]) if order_by else (link["linkId"],)
+
+    links = sorted(links, key=key, reverse=True)
+    if start_after is not None:
+        after = (start_after_value, start_after) if order_by else (start_after,)
+        links = [link for link in links if key(link) < after]
+    return links[:limit] if limit is not None else links
+
+
+def slug_family_range(base: str) -> tuple[str, str]:
+    """
+    Rango [inicio, fin) de los slugs generados a partir de base: el propio base y
+    base-<sufijo> (base-2, base-3...). No incluye otros slugs que solo empiezan igual
+    (base2, basex...).
+    """
+    return base, f"{base}-\uf8ff"
+
+
+def bucket_range(slug: str, granularity: str, first_key: str, last_key: str) -> tuple[str, str]:
+    """
+    Rango [inicio, fin) de IDs de buckets (slug#granularidad#clave#variant) entre dos
+    claves de tiempo, ambas incluidas. granularidad: "h" (YYYYMMDDHH) o "d" (YYYYMMDD).
+    """
+    return f"{slug}#{granularity}#{first_key}#", f"{slug}#{granularity}#{last_key}#~"
+
+
+class StorageBackend(ABC):
+    """
+    Contrato de almacenamiento usado por app/services/link_service.py.
+
+    Los documentos se manejan como diccionarios con la misma forma que en Firestore
+    (colecciones links, slugs y metrics). Los errores de dominio se señalan con las
+    excepciones de google.api_core (AlreadyExists / NotFound) para que los servicios
+    los traduzcan a HTTP igual sin importar el motor.
+    """
+
+    name = "base"
+    # True si todas las escrituras pasan por este proceso (ver check_slug_available)
+    single_process = False
+
+    @abstractmethod
+    async def get_link(self, link_id: str) -> dict | None:
+        """Devuelve el documento del link (con 'linkId') o None si no existe."""
+
+    @abstractmethod
+    async def create_link(self, link_doc: dict) -> None:
+        """Guarda el link y reserva su slug. Lanza AlreadyExists si el slug está tomado."""
+
+    @abstractmethod
+    async def create_links(self, link_docs: list[dict]) -> list[str]:
+        """
+        Crea varios links reservando cada slug solo si no existe.
+
+        Devuelve un estado por documento, en el mismo orden: "created", "conflict"
+        (slug tomado) o "error" (fallo al escribir; su slug queda liberado).
+        """
+
+    @abstractmethod
+    async def delete_link(self, link_id: str) -> dict:
+        """Borra el link y su slug. Devuelve el documento borrado o lanza NotFound."""
+
+    @abstractmethod
+    async def list_links(
+        self,
+        limit: int | None = None,
+        start_after: str | None = None,
+        *,
+        enabled: bool | None = None,
+        created_after: str | None = None,
+        order_by: str | None = None,
+        start_after_value=None,
+    ) -> list[dict]:
+        """
+        Lista links por linkId descendente; opcionalmente solo los anteriores a
+        (excluido) start_after. list_links de link_service siempre pasa order_by.
+
+        Filtros: enabled (igualdad) y created_after (createdAt >= ISO 8601 en UTC).
+        order_by (uno de LINK_ORDER_FIELDS) ordena por ese campo descendente y luego
+        por linkId; los links sin el campo no aparecen (como en Firestore) y la
+        página siguiente empieza después de (start_after_value, start_after).
+        Con created_after, order_by debe ser "createdAt" o None.
+        """
+
+    @abstractmethod
+    async def set_total_clicks(self, link_id: str, total_clicks: int) -> None:
+        """Guarda el total de clics desnormalizado (totalClicks) de un link; no hace nada si no existe."""
+
+    @abstractmethod
+    def stream_links_by_slug(self) -> AsyncIterator[dict]:
+        """Recorre todos los links ordenados por slug sin cargarlos todos en memoria."""
+
+    @abstractmethod
+    def stream_slugs(self) -> AsyncIterator[str]:
+        """Recorre todos los slugs reservados (solo el slug, sin leer los links)."""
+
+    @abstractmethod
+    def stream_metric_docs(self) -> AsyncIterator[dict]:
+        """Recorre toda la colección de métricas ordenada por ID (slug#variant), con 'doc_id'."""
+
+    @abstractmethod
+    async def get_slug(self, slug: str) -> str | None:
+        """Devuelve el linkId asociado al slug o None."""
+
+    @abstractmethod
+    async def list_slugs_in_range(self, start: str, end: str, limit: int) -> list[str]:
+        """Slugs reservados en [start, end) ordenados, como máximo limit (ver slug_family_range)."""
+
+    @abstractmethod
+    async def get_metric_docs(self, slug: str) -> list[dict]:
+        """Documentos de métricas del slug (IDs slug#variant), cada uno con 'doc_id'."""
+
+    @abstractmethod
+    async def get_rollup(self, slug: str) -> dict | None:
+        """Totales (rollup) del slug, sumando sus shards, o None si aún no existe."""
+
+    @abstractmethod
+    async def rebuild_rollup(self, slug: str, aggregate: Callable[[list[dict]], dict]) -> tuple[dict | None, dict]:
+        """
+        Recalcula el rollup del slug a partir de sus documentos slug#variant y lo
+        sobrescribe de forma atómica respecto de esas lecturas: el total queda en el
+        documento base (ID = slug), marcado con ROLLUP_SEEDED_FIELD, y se borran los
+        demás shards.
+        Devuelve (rollup_anterior, rollup_nuevo).
+        """
+
+    @abstractmethod
+    async def get_bucket_docs(self, slug: str, granularity: str, first_key: str, last_key: str) -> list[dict]:
+        """Buckets de tiempo del slug en el rango (ver bucket_range), ordenados por ID y con 'doc_id'."""
+
+    @abstractmethod
+    async def apply_increments(self, increments: dict[tuple[str, str], dict]) -> int:
+        """
+        Suma deltas a documentos de contadores sin leerlos.
+
+        increments: {(tipo, doc_id): delta}, con tipo en COUNTER_KINDS y delta con la
+        forma del documento ({"clicks": 3, "byCountry": {"CO": 2, "US": 1}, ...}).
+        Los registros del sketch HLL_FIELD se actualizan con máximo, no se suman.
+        Los documentos que no existen se crean. Con tipo LINK_TOTALS_KIND el delta
+        ({"totalClicks": n}) se suma al link, que no se crea si ya no existe.
+        Hasta MAX_ATOMIC_INCREMENTS documentos de contadores y a lo sumo un link se
+        escriben de forma atómica: todos o ninguno.
+        Devuelve el número de documentos escritos.
+        """
+
+    @abstractmethod
+    async def trim_heavy_hitters(self, slug: str, capacity: int) -> int:
+        """
+        Recorta a `capacity` valores los resúmenes Space-Saving de los documentos
+        slug#variant (los incrementos de la ingesta solo agregan valores) de forma
+        atómica respecto de su lectura. Devuelve el número de documentos reescritos.
+        """
+
+    async def get_rollups(self, slugs: list[str]) -> dict[str, dict]:
+        """Rollups de varios slugs. {slug: rollup} solo con los que existen."""
+        rollups = await asyncio.gather(*(self.get_rollup(slug) for slug in slugs))
+        return {slug: rollup for slug, rollup in zip(slugs, rollups) if rollup is not None}
+
+    async def get_click_totals(self, slugs: list[str]) -> dict[str, int]:
+        """
+        Solo el total de clics de cada slug (0 si no tiene métricas), sin los desgloses.
+
+        Se toma del rollup del slug o, si aún no tiene o no está sembrado, de sus
+        documentos slug#variant.
+        Los motores con agregaciones en el servidor la sobrescriben para no transferir
+        los documentos completos.
+        """
+        totals = {slug: rollup.get("clicks", 0) for slug, rollup in (await self.get_rollups(slugs)).items()}
+        without_rollup = [slug for slug in slugs if slug not in totals]
+        if without_rollup:
+            for slug, docs in (await self.get_metric_docs_for_slugs(without_rollup)).items():
+                totals[slug] = sum(doc.get("clicks", 0) for doc in docs)
+        return {slug: totals.get(slug, 0) for slug in slugs}
+
+    async def get_metric_sketches(self, slugs: list[str]) -> dict[str, list[dict]]:
+        """
+        Sketches de los documentos slug#variant de cada slug (variantes y shards): solo
+        los campos SKETCH_FIELDS de cada documento. {slug: [docs]}, [] si no tiene.
+        """
+        docs_by_slug = await self.get_metric_docs_for_slugs(slugs)
+        return {
+            slug: [{f: doc[f] for f in SKETCH_FIELDS if f in doc} for doc in docs_by_slug.get(slug, [])]
+            for slug in slugs
+        }
+
+    async def get_links(self, link_ids: list[str]) -> dict[str, dict]:
+        """Lee varios links de una vez. Devuelve {linkId: doc} solo con los que existen."""
+        docs = await asyncio.gather(*(self.get_link(link_id) for link_id in link_ids))
+        return {link_id: doc for link_id, doc in zip(link_ids, docs) if doc is not None}
+
+    async def get_slugs(self, slugs: list[str]) -> dict[str, str]:
+        """Resuelve varios slugs de una vez. Devuelve {slug: linkId} solo con los que existen."""
+        link_ids = await asyncio.gather(*(self.get_slug(slug) for slug in slugs))
+        return {slug: link_id for slug, link_id in zip(slugs, link_ids) if link_id is not None}
+
+    async def get_metric_docs_for_slugs(self, slugs: list[str]) -> dict[str, list[dict]]:
+        """Documentos de métricas de varios slugs, consultados en paralelo. {slug: [docs]}."""
+        results = await asyncio.gather(*(self.get_metric_docs(slug) for slug in slugs))
+        return dict(zip(slugs, results))
+
+    def watch_links(self, on_change: Callable[[str, list[tuple[str, dict | None]], datetime], None]):
+        """
+        Escucha en segundo plano las colecciones de links y slugs (espejo en memoria,
+        ver app/services/link_mirror.py). on_change(colección, cambios, read_time) se
+        llama desde otro hilo con colección "links" o "slugs" y cambios
+        [(doc_id, datos o None si se borró)]: la primera vez con todo el contenido.
+        Con colección "heartbeat" y sin cambios, cada vez que llega un latido.
+
+        Devuelve un objeto con is_active, stop() y heartbeat() (escribe un latido;
+        bloquea, se llama desde un hilo), o None si el motor no admite escuchar
+        cambios (los motores locales no lo necesitan).
+        """
+        return None
+
+    async def close(self) -> None:
+        """Libera recursos del motor (conexiones, archivos)."""
+        return None
+
+
+class MemoryBackend(StorageBackend):
+    """Motor en memoria para pruebas. Devuelve copias para no filtrar referencias internas."""
+
+    name = "memory"
+    single_process = True
+
+    def __init__(self):
+        self.links: dict[str, dict] = {}
+        self.slugs: dict[str, dict] = {}
+        self.metrics: dict[str, dict] = {}
+        self.rollups: dict[str, dict] = {}
+        self.buckets: dict[str, dict] = {}
+
+    async def get_link(self, link_id: str) -> dict | None:
+        doc = self.links.get(link_id)
+        if doc is None:
+            return None
+        data = copy.deepcopy(doc)
+        data["linkId"] = link_id
+        return data
+
+    async def create_link(self, link_doc: dict) -> None:
+        slug = link_doc["slug"]
+        if slug in self.slugs:
+            raise AlreadyExists("El slug ya existe")
+        self.slugs[slug] = {"linkId": link_doc["linkId"]}
+        self.links[link_doc["linkId"]] = copy.deepcopy(link_doc)
+
+    async def create_links(self, link_docs: list[dict]) -> list[str]:
+        statuses = []
+        for link_doc in link_docs:
+            try:
+                await self.create_link(link_doc)
+                statuses.append("created")
+            except AlreadyExists:
+                statuses.append("conflict")
+        return statuses
+
+    async def delete_link(self, link_id: str) -> dict:
+        doc = self.links.pop(link_id, None)
+        if doc is None:
+            raise NotFound("Link no encontrado")
+        slug = doc.get("slug")
+        if slug:
+            self.slugs.pop(slug, None)
+        return doc
+
+    async def list_links(
+        self,
+        limit: int | None = None,
+        start_after: str | None = None,
+        *,
+        enabled: bool | None = None,
+        created_after: str | None = None,
+        order_by: str | None = None,
+        start_after_value=None,
+    ) -> list[dict]:
+        if enabled is None and created_after is None and order_by is None:
+            ids = sorted(self.links)
+            if start_after is not None:
+                ids = ids[:bisect.bisect_left(ids, start_after)]
+            ids.reverse()
+            if limit is not None:
+                ids = ids[:limit]
+            return [await self.get_link(link_id) for link_id in ids]
+
+        return select_links(
+            [await self.get_link(link_id) for link_id in self.links], limit, start_after,
+            enabled=enabled, created_after=created_after, order_by=order_by, start_after_value=start_after_value,
+        )
+
+    async def set_total_clicks(self, link_id: str, total_clicks: int) -> None:
+        if link_id in self.links:
+            self.links[link_id]["totalClicks"] = total_clicks
+
+    async def stream_links_by_slug(self) -> AsyncIterator[dict]:
+        for slug in sorted(self.slugs):
+            link = await self.get_link(self.slugs[slug]["linkId"])
+            if link is not None:
+                yield link
+
+    async def stream_slugs(self) -> AsyncIterator[str]:
+        for slug in sorted(self.slugs):
+            yield slug
+
+    async def stream_metric_docs(self) -> AsyncIterator[dict]:
+        for doc_id in sorted(self.metrics):
+            yield {**copy.deepcopy(self.metrics[doc_id]), "doc_id": doc_id}
+
+    def _rollup_shard_ids(self, slug: str) -> list[str]:
+        start, end = rollup_range(slug)
+        return [doc_id for doc_id in self.rollups if start <= doc_id < end]
+
+    async def get_rollup(self, slug: str) -> dict | None:
+        return merge_rollup_shards([copy.deepcopy(self.rollups[i]) for i in self._rollup_shard_ids(slug)])
+
+    async def rebuild_rollup(self, slug: str, aggregate: Callable[[list[dict]], dict]) -> tuple[dict | None, dict]:
+        previous = await self.get_rollup(slug)
+        for doc_id in self._rollup_shard_ids(slug):
+            del self.rollups[doc_id]
+        rollup = aggregate(await self.get_metric_docs(slug))
+        self.rollups[slug] = {**copy.deepcopy(rollup), ROLLUP_SEEDED_FIELD: True}
+        return previous, rollup
+
+    async def apply_increments(self, increments: dict[tuple[str, str], dict]) -> int:
+        for (kind, doc_id), delta in increments.items():
+            if kind == LINK_TOTALS_KIND:
+                if doc_id in self.links:
+                    add_counts(self.links[doc_id], delta)
+                continue
+            add_counts(getattr(self, kind).setdefault(doc_id, {}), delta)
+        return len(increments)
+
+    async def trim_heavy_hitters(self, slug: str, capacity: int) -> int:
+        start, end = metric_range(slug)
+        trimmed = 0
+        for doc_id, doc in self.metrics.items():
+            summaries = trimmed_summaries(doc, capacity) if start <= doc_id < end else {}
+            if summaries:
+                doc.update(summaries)
+                trimmed += 1
+        return trimmed
+
+    async def get_bucket_docs(self, slug: str, granularity: str, first_key: str, last_key: str) -> list[dict]:
+        start, end = bucket_range(slug, granularity, first_key, last_key)
+        return [
+            {**copy.deepcopy(data), "doc_id": doc_id}
+            for doc_id, data in sorted(self.buckets.items())
+            if start <= doc_id < end
+        ]
+
+    async def get_slug(self, slug: str) -> str | None:
+        doc = self.slugs.get(slug)
+        return doc.get("linkId") if doc else None
+
+    async def list_slugs_in_range(self, start: str, end: str, limit: int) -> list[str]:
+        return [slug for slug in sorted(self.slugs) if start <= slug < end][:limit]
+
+    async def get_metric_docs(self, slug: str) -> list[dict]:
+        start, end = metric_range(slug)
+        return [
+            {**copy.deepcopy(data), "doc_id": doc_id}
+            for doc_id, data in sorted(self.metrics.items())
+            if start <= doc_id < end
+        ]
@@ -0,0 +1,27 @@
+"""
+Job de reconciliación de rollups de métricas.
+
+    python -m app.jobs.reconcile_rollups            # todos los links
+    python -m app.jobs.reconcile_rollups promo otro # solo esos slugs
+
+Pensado para correr periódicamente (p. ej. como Cloud Run Job con la misma imagen).
+"""
+import asyncio
+import json
+import logging
+import sys
+
+from app.db.dynamo import get_storage
+from app.services.rollup_service import reconcile_rollups
+
+
+async def main(slugs: list[str] | None = None) -> dict:
+    try:
+        return await reconcile_rollups(slugs)
+    finally:
+        await get_storage().close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    print(json.dumps(asyncio.run(main(sys.argv[1:] or None))))
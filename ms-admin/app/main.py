@@ -1,8 +1,33 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
-from app.routes import health, links
+from app.core.config import settings
+from app.routes import events, health, links, metrics, slugs
+from app.services.click_service import click_buffer
+from app.services.link_service import (
+    rebuild_search_index, start_link_mirror, start_slug_filter, stop_link_mirror, stop_slug_filter,
+)
 from fastapi.middleware.cors import CORSMiddleware
 
-app = FastAPI(title="MS Admin (FastAPI) - Linkly", version="1.0")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if settings.SLUG_FILTER_ENABLED:
+        start_slug_filter()
+    if settings.SEARCH_INDEX_ENABLED:
+        await rebuild_search_index()
+    if settings.LINK_MIRROR_ENABLED:
+        await start_link_mirror()
+    if settings.CLICK_BUFFER_ENABLED:
+        await click_buffer.start()
+    yield
+    stop_link_mirror()
+    await stop_slug_filter()
+    # Escribe los clics acumulados antes de terminar
+    await click_buffer.stop(timeout=settings.CLICK_BUFFER_DRAIN_TIMEOUT_SECONDS)
+
+
+app = FastAPI(title="MS Admin (FastAPI) - Linkly", version="1.0", lifespan=lifespan)
 
 
 origins = ["*"]
@@ -17,3 +42,6 @@ app.add_middleware(
 
 app.include_router(health.router)
 app.include_router(links.router)
+app.include_router(metrics.router)
+app.include_router(events.router)
+app.include_router(slugs.router)
@@ -0,0 +1,47 @@
+# app/models/event_schemas.py
+from datetime import datetime
+from pydantic import BaseModel, field_validator
+from typing import List, Optional
+import re
+
+
+class ClickEvent(BaseModel):
+    slug: str
+    variant: Optional[str] = "default"
+    country: Optional[str] = None
+    device: Optional[str] = None
+    timestamp: Optional[datetime] = None  # por defecto, el momento de la ingesta
+    # Identificador opaco del visitante (p. ej. un hash); alimenta el conteo de únicos
+    visitorId: Optional[str] = None
+    # Alimentan topReferrers / topUserAgents (se normalizan y recortan al ingerir)
+    referrer: Optional[str] = None
+    userAgent: Optional[str] = None
+
+    @field_validator("slug")
+    @classmethod
+    def validate_slug(cls, v):
+        pattern = r"^[a-z0-9-]{3,48}$"
+        if not re.match(pattern, v):
+            raise ValueError("slug must match ^[a-z0-9-]{3,48}$")
+        return v
+
+    @field_validator("variant")
+    @classmethod
+    def validate_variant(cls, v):
+        if not v:
+            return "default"
+        if not re.match(r"^[a-z0-9_-]{1,32}$", v):
+            raise ValueError(f"invalid variant '{v}'")
+        return v
+
+    @field_validator("country", "device", "visitorId")
+    @classmethod
+    def validate_dimension(cls, v):
+        # country/device se usan como claves de mapas en los documentos de métricas
+        if v is not None and len(v) > 64:
+            raise ValueError("must be at most 64 characters")
+        return v
+
+
+class ClickBatch(BaseModel):
+    events: List[ClickEvent]
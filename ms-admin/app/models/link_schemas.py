@@ -44,6 +44,11 @@ class LinkCreate(BaseModel):
         return clean
 
 
+class LinkBatchCreate(BaseModel):
+    # Cada item se valida por separado como LinkCreate para reportar errores por item
+    items: List[dict]
+
+
 class LinkOut(BaseModel):
     linkId: str
     slug: str
@@ -0,0 +1,12 @@
+from fastapi import APIRouter
+
+from app.models.event_schemas import ClickBatch
+from app.services.click_service import ingest_clicks
+
+router = APIRouter(prefix="/events", tags=["Events"])
+
+
+@router.post("/clicks")
+async def ingest_clicks_endpoint(payload: ClickBatch):
+    # Un Increment por documento de contador distinto del lote, no uno por clic
+    return await ingest_clicks(payload.events)
@@ -1,8 +1,30 @@
 from fastapi import APIRouter
 
+from app.services.click_service import click_buffer
+from app.services import link_service
+from app.services.link_service import link_cache
+from app.services.single_flight import single_flight
+
 router = APIRouter()
 
 
 @router.get("/health")
 def health():
     return {"ok": True}
+
+
+@router.get("/health/stats")
+def stats():
+    """Contadores internos en proceso (para dimensionar cachés y buffers)."""
+    slug_filter, search_index = link_service.slug_filter, link_service.search_index
+    link_mirror = link_service.link_mirror
+    return {
+        "linkCache": link_cache.stats(),
+        "clickBuffer": click_buffer.stats(),
+        "slugFilter": slug_filter.stats() if slug_filter is not None else None,
+        "searchIndex": search_index.stats() if search_index is not None else None,
+        # Tamaño y retraso del espejo de links (None si LINK_MIRROR_ENABLED=False)
+        "linkMirror": link_mirror.stats() if link_mirror is not None else None,
+        # coalesced: llamadas que esperaron una lectura idéntica en curso en vez de repetirla
+        "singleFlight": single_flight.stats(),
+    }
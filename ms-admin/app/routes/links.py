@@ -1,14 +1,21 @@
-from fastapi import APIRouter, status, Response, HTTPException
-from app.models.link_schemas import LinkCreate, LinkOut # Asumiendo que estos modelos siguen bien
+from fastapi import APIRouter, status, Request, Response, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from app.core.config import settings
+from app.core.http_cache import conditional_json
+from app.models.link_schemas import LinkBatchCreate, LinkCreate, LinkOut # Asumiendo que estos modelos siguen bien
 # --- CAMBIO EN IMPORTACIÓN ---
 # Se quita get_item y se añade get_link_by_id
 from app.services.link_service import (
     create_link,
+    create_links_batch,
     list_links,
     delete_link,
     get_link_by_id, # <-- El nombre nuevo
-    get_link_metrics # <-- Importamos la función de métricas correcta
+    get_link_metrics, # <-- Importamos la función de métricas correcta
+    get_link_timeseries,
+    search_links,
 )
+from app.services.export_service import export_csv, export_ndjson
 # -----------------------------
 
 router = APIRouter(prefix="/links", tags=["Links"])
@@ -21,21 +28,65 @@ async def create_link_endpoint(payload: LinkCreate):
     return await create_link(payload)
 
 
+@router.post(":batch")
+async def create_links_batch_endpoint(payload: LinkBatchCreate):
+    # Resultado por item: created / conflict / invalid / error
+    return await create_links_batch(payload.items)
+
+
 # --- CAMBIO: Usar async def ---
 @router.get("")
-async def list_links_endpoint():
-    # --- CAMBIO: Usar await ---
-    items = await list_links()
-    return {"items": items}
+async def list_links_endpoint(
+    request: Request,
+    limit: int | None = Query(None, ge=1, le=settings.LIST_LINKS_MAX_LIMIT),
+    cursor: str | None = None,
+    enabled: bool | None = None,
+    created_after: str | None = Query(None, alias="createdAfter"),
+    sort: str = Query("newest", pattern="^(newest|clicks)$"),
+):
+    # Devuelve {"items": [...], "nextCursor": ...}; pasar nextCursor como cursor para la siguiente página
+    # (con los mismos filtros y orden). Con If-None-Match responde 304 si la página no cambió.
+    page = await list_links(limit=limit, cursor=cursor, enabled=enabled, created_after=created_after, sort=sort)
+    return conditional_json(request, page)
+
+
+# Como /export, debe declararse antes de /{link_id}
+@router.get("/search")
+async def search_links_endpoint(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int | None = Query(None, ge=1, le=settings.LIST_LINKS_MAX_LIMIT),
+    cursor: str | None = None,
+):
+    # Búsqueda en el índice en proceso: {"items", "total", "nextCursor"}
+    return await search_links(q, limit=limit, cursor=cursor)
+
+
+# Debe declararse antes de /{link_id} para que "export" no se tome como un linkId
+@router.get("/export")
+async def export_links_endpoint(format: str = Query("ndjson", pattern="^(ndjson|csv)$")):
+    # Streaming: la respuesta se genera mientras se leen links y métricas
+    if format == "csv":
+        return StreamingResponse(
+            export_csv(),
+            media_type="text/csv; charset=utf-8",
+            headers={"Content-Disposition": 'attachment; filename="links-export.csv"'},
+        )
+    return StreamingResponse(
+        export_ndjson(),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="links-export.ndjson"'},
+    )
 
 
 # --- CAMBIO: Usar async def ---
 @router.get("/{link_id}", response_model=LinkOut) # Definir un response_model es buena práctica
-async def get_link_endpoint(link_id: str):
+async def get_link_endpoint(link_id: str, request: Request):
     # --- CAMBIO: Usar await y la función correcta ---
     # La función get_link_by_id ya maneja el 404 con HTTPException
     link = await get_link_by_id(link_id)
-    return link
+    # Se filtra con LinkOut a mano: al devolver la respuesta directamente (ETag/304)
+    # FastAPI no aplica el response_model
+    return conditional_json(request, LinkOut.model_validate(link).model_dump(mode="json"))
 
 
 # --- CAMBIO: Usar async def ---
@@ -50,8 +101,21 @@ async def delete_link_endpoint(link_id: str):
 
 # --- CAMBIO: Usar async def ---
 @router.get("/{link_id}/metrics")
-async def get_metrics_endpoint(link_id: str):
+async def get_metrics_endpoint(
+    link_id: str,
+    request: Request,
+    from_: str | None = Query(None, alias="from"),
+    to: str | None = None,
+    granularity: str | None = Query(None, pattern="^(hour|day)$"),
+    fields: str | None = None,
+):
+    # Con from/to/granularity devuelve la serie de tiempo (buckets por hora o por día)
+    # El detalle del frontend consulta esto periódicamente: con If-None-Match, 304 si no cambió
+    if from_ or to or granularity:
+        series = await get_link_timeseries(link_id, from_=from_, to=to, granularity=granularity or "day")
+        return conditional_json(request, series)
     # --- CAMBIO: Usar await ---
-    # La función get_link_metrics ya maneja errores con HTTPException
-    metrics = await get_link_metrics(link_id)
-    return metrics
+    # La función get_link_metrics ya maneja errores con HTTPException.
+    # Solo clics por defecto; fields=byVariant,byDevice,byCountry agrega los desgloses.
+    metrics = await get_link_metrics(link_id, fields=fields)
+    return conditional_json(request, metrics)
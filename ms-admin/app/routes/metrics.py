@@ -0,0 +1,18 @@
+from fastapi import APIRouter
+
+from app.services.link_service import get_metrics_for_links
+
+router = APIRouter(prefix="/metrics", tags=["Metrics"])
+
+
+def _split(values: str | None) -> list[str]:
+    """Convierte "a,b, c" en ["a", "b", "c"]."""
+    return [v.strip() for v in (values or "").split(",") if v.strip()]
+
+
+@router.get("")
+async def get_metrics_batch_endpoint(
+    linkIds: str | None = None, slugs: str | None = None, fields: str | None = None
+):
+    # GET /metrics?linkIds=lk_1,lk_2  o  GET /metrics?slugs=promo,evento  (&fields=byCountry,...)
+    return await get_metrics_for_links(link_ids=_split(linkIds), slugs=_split(slugs), fields=fields)
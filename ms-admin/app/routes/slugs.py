@@ -0,0 +1,17 @@
+from fastapi import APIRouter
+
+from app.services.link_service import check_slug_available, get_slug_metrics
+
+router = APIRouter(prefix="/slugs", tags=["Slugs"])
+
+
+@router.get("/{slug}/metrics")
+async def get_slug_metrics_endpoint(slug: str, fields: str | None = None):
+    # Resolver el slug y leer sus métricas corren en paralelo
+    return await get_slug_metrics(slug, fields=fields)
+
+
+@router.get("/{slug}/available")
+async def check_slug_available_endpoint(slug: str):
+    # Pensado para consultarse mientras se escribe: casi siempre lo responde el filtro
+    return await check_slug_available(slug)
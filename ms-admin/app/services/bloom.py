@@ -0,0 +1,37 @@
+import hashlib
+import math
+
+
+class BloomFilter:
+    """
+    Filtro de Bloom en proceso: pertenencia aproximada sin falsos negativos.
+
+    Se dimensiona para `capacity` elementos con una tasa de falsos positivos
+    `error_rate`. Las k posiciones de cada elemento salen de un solo hash
+    (doble hashing de Kirsch-Mitzenmacher). No admite borrar: un elemento quitado
+    del origen sigue dando positivo hasta que se reconstruya el filtro.
+    """
+
+    def __init__(self, capacity: int, error_rate: float):
+        capacity = max(capacity, 1)
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "big")
+        h2 = int.from_bytes(digest[8:], "big") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hash_count))
+
+    def add(self, item: str) -> None:
+        for pos in self._positions(item):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(self._bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+    def stats(self) -> dict:
+        return {"items": self.count, "bits": self.size, "hashes": self.hash_count}
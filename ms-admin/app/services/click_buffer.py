@@ -0,0 +1,190 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Hashable
+
+logger = logging.getLogger(__name__)
+
+
+class BufferFullError(Exception):
+    """El buffer alcanzó su tamaño máximo y la cola de flushes sigue llena."""
+
+
+class AuxKey(tuple):
+    """
+    Clave de un conteo auxiliar (p. ej. un referrer): se suma como las demás, pero
+    no cuenta como clics en las estadísticas del buffer.
+    """
+
+    __slots__ = ()
+
+
+class MaxKey(AuxKey):
+    """Clave auxiliar cuyo valor se combina con máximo en vez de sumarse (p. ej. un registro HyperLogLog)."""
+
+    __slots__ = ()
+
+
+class ClickBuffer:
+    """
+    Agregador write-behind de contadores de clics.
+
+    Acumula en memoria deltas por clave (p. ej. slug, variante, país, dispositivo,
+    hora) y los entrega a `flush` en lotes: cada `interval_seconds` o cuando el lote
+    llega a `max_keys` claves distintas. Así las escrituras crecen con los contadores
+    distintos por intervalo y no con el volumen de clics.
+
+    Los lotes pasan por una cola acotada hacia un único worker. Si la cola está llena,
+    add() espera hasta `put_timeout` y luego lanza BufferFullError (backpressure para
+    el productor). Un flush fallido se reintenta y, si sigue fallando, sus deltas
+    vuelven al lote pendiente. `flush` quita del lote lo que ya escribió: los
+    reintentos y lo devuelto a pendientes llevan solo lo que falta. stop() entrega lo pendiente y espera a que la cola se
+    vacíe. No es thread-safe: está pensado para el event loop de FastAPI.
+    """
+
+    def __init__(
+        self,
+        flush: Callable[[dict[Hashable, int]], Awaitable[None]],
+        max_keys: int,
+        interval_seconds: float,
+        max_queued_flushes: int,
+        put_timeout: float,
+        flush_attempts: int = 3,
+    ):
+        self._flush = flush
+        self.max_keys = max_keys
+        self.interval_seconds = interval_seconds
+        self.max_queued_flushes = max_queued_flushes
+        self.put_timeout = put_timeout
+        self.flush_attempts = flush_attempts
+        self._pending: dict[Hashable, int] = {}
+        self._queue: asyncio.Queue | None = None
+        self._tasks: list[asyncio.Task] = []
+        self.clicks_buffered = 0
+        self.flushes = 0
+        self.flushed_keys = 0
+        self.failed_flushes = 0
+        self.rejected_adds = 0
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queued_flushes)
+        self._tasks = [asyncio.create_task(self._ticker()), asyncio.create_task(self._worker())]
+        logger.info(
+            f"Buffer de clics iniciado (cada {self.interval_seconds}s o {self.max_keys} claves, "
+            f"cola de {self.max_queued_flushes} lotes)"
+        )
+
+    async def add(self, counts: dict[Hashable, int]) -> None:
+        """Suma deltas al lote pendiente. Lanza BufferFullError si no hay espacio."""
+        if not self.running:
+            raise RuntimeError("El buffer de clics no está iniciado")
+        if len(self._pending) >= self.max_keys:
+            try:
+                await self._hand_off(timeout=self.put_timeout)
+            except BufferFullError:
+                self.rejected_adds += 1
+                raise
+        self._merge(counts)
+        self.clicks_buffered += _clicks(counts)
+
+    async def stop(self, timeout: float | None = None) -> None:
+        """Entrega lo pendiente, espera a que se escriban los lotes en cola y detiene las tareas."""
+        if not self.running:
+            return
+        ticker, worker = self._tasks
+        ticker.cancel()
+        try:
+            await asyncio.wait_for(self._drain(), timeout)
+        except asyncio.TimeoutError:
+            logger.error("Tiempo agotado al vaciar el buffer de clics")
+        worker.cancel()
+        await asyncio.gather(ticker, worker, return_exceptions=True)
+        self._tasks = []
+        lost = _clicks(self._pending)
+        if lost:
+            logger.error(f"Buffer de clics detenido con {lost} clics sin escribir")
+        logger.info("Buffer de clics detenido.")
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "pendingKeys": len(self._pending),
+            "queuedFlushes": self._queue.qsize() if self._queue else 0,
+            "clicksBuffered": self.clicks_buffered,
+            "flushes": self.flushes,
+            "flushedKeys": self.flushed_keys,
+            "failedFlushes": self.failed_flushes,
+            "rejectedAdds": self.rejected_adds,
+        }
+
+    def _merge(self, counts: dict[Hashable, int]) -> None:
+        for key, delta in counts.items():
+            if isinstance(key, MaxKey):
+                self._pending[key] = max(self._pending.get(key, 0), delta)
+            else:
+                self._pending[key] = self._pending.get(key, 0) + delta
+
+    async def _hand_off(self, timeout: float | None = None) -> None:
+        """
+        Mueve el lote pendiente a la cola; si no entra a tiempo lo devuelve y lanza
+        BufferFullError. Si se cancela mientras espera (p. ej. stop() cancela el ticker)
+        también lo devuelve a pendientes antes de propagar la cancelación.
+        """
+        batch, self._pending = self._pending, {}
+        try:
+            await asyncio.wait_for(self._queue.put(batch), timeout)
+        except asyncio.TimeoutError:
+            self._merge(batch)
+            raise BufferFullError("Buffer de clics lleno")
+        except BaseException:
+            self._merge(batch)
+            raise
+
+    async def _drain(self) -> None:
+        # Un lote que falla vuelve a pendientes: se reintenta mientras quede tiempo
+        while True:
+            if self._pending:
+                await self._hand_off()
+            await self._queue.join()
+            if not self._pending:
+                return
+            await asyncio.sleep(self.interval_seconds)
+
+    async def _ticker(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            if self._pending:
+                await self._hand_off()
+
+    async def _worker(self) -> None:
+        while True:
+            batch = await self._queue.get()
+            try:
+                await self._write(batch)
+            finally:
+                self._queue.task_done()
+
+    async def _write(self, batch: dict[Hashable, int]) -> None:
+        keys = len(batch)
+        for attempt in range(1, self.flush_attempts + 1):
+            try:
+                await self._flush(batch)
+                self.flushes += 1
+                self.flushed_keys += keys
+                return
+            except Exception as e:
+                logger.warning(f"Flush de {len(batch)} contadores falló (intento {attempt}): {e}")
+                if attempt < self.flush_attempts:
+                    await asyncio.sleep(0.1 * 2 ** attempt)
+        self.failed_flushes += 1
+        logger.error(f"Flush de {len(batch)} contadores falló {self.flush_attempts} veces; sus deltas vuelven a pendientes")
+        self._merge(batch)
+
+
+def _clicks(counts: dict[Hashable, int]) -> int:
+    return sum(delta for key, delta in counts.items() if not isinstance(key, AuxKey))
@@ -0,0 +1,224 @@
+import asyncio
+import logging
+from datetime import datetime, timezone
+
+from fastapi import HTTPException
+
+from app.core.config import settings
+from app.db.dynamo import get_storage
+from app.db.storage import LINK_TOTALS_KIND, MAX_ATOMIC_INCREMENTS, add_counts
+from app.models.event_schemas import ClickEvent
+from app.services.click_buffer import AuxKey, BufferFullError, ClickBuffer, MaxKey
+from app.services.hll import HLL_FIELD, hll_register
+from app.services.topk import TOPK_FIELDS, merge_summaries, normalize_referrer, normalize_user_agent
+
+logger = logging.getLogger(__name__)
+
+# Clave de un contador de clics: (slug, variante, país, dispositivo, hora YYYYMMDDHH).
+# Los registros HyperLogLog de visitantes usan MaxKey((slug, variante, hora, índice)) -> rango,
+# los conteos de referrers / user agents AuxKey((slug, variante, campo, valor)) -> n
+# y el total de cada link TotalKey((linkId,)) -> n.
+ClickKey = tuple[str, str, str, str, str]
+
+
+class TotalKey(AuxKey):
+    """Clave del total de clics de un link (campo desnormalizado totalClicks): (linkId,)."""
+
+    __slots__ = ()
+
+
+def count_clicks(events: list[ClickEvent], link_ids: dict[str, str] | None = None) -> dict[ClickKey | AuxKey, int]:
+    """
+    Cuenta los clics de un lote por (slug, variante, país, dispositivo, hora UTC), los
+    referrers y user agents por variante y, para los eventos con visitorId, el
+    registro HyperLogLog que actualiza cada uno. Con link_ids ({slug: linkId})
+    también cuenta el total de clics de cada link.
+    """
+    counts: dict[ClickKey | AuxKey, int] = {}
+    now = datetime.now(timezone.utc)
+    for event in events:
+        moment = event.timestamp or now
+        moment = moment.replace(tzinfo=timezone.utc) if moment.tzinfo is None else moment.astimezone(timezone.utc)
+        key = (
+            event.slug, event.variant or "default",
+            (event.country or "UN").upper(), event.device or "unknown", f"{moment:%Y%m%d%H}",
+        )
+        counts[key] = counts.get(key, 0) + 1
+        if link_ids and event.slug in link_ids:
+            total = TotalKey((link_ids[event.slug],))
+            counts[total] = counts.get(total, 0) + 1
+        if event.visitorId:
+            index, rank = hll_register(event.visitorId)
+            register = MaxKey((key[0], key[1], key[4], index))
+            counts[register] = max(counts.get(register, 0), rank)
+        for field, value in (
+            (TOPK_FIELDS["referrer"], normalize_referrer(event.referrer)),
+            (TOPK_FIELDS["userAgent"], normalize_user_agent(event.userAgent)),
+        ):
+            tally = AuxKey((key[0], key[1], field, value))
+            counts[tally] = counts.get(tally, 0) + 1
+    return counts
+
+
+def counter_increments(counts: dict[ClickKey | AuxKey, int]) -> dict[tuple[str, str], dict]:
+    """
+    Convierte conteos por clave en deltas por documento de contador.
+
+    Cada clave suma en su documento slug#variant, en el rollup del slug y en sus
+    buckets de hora y día (los mismos documentos que escribe ms-redirect, shard 0).
+    Los registros HyperLogLog van al documento slug#variant y a sus buckets, no al
+    rollup: los únicos de un link se obtienen uniendo los sketches de sus variantes.
+    Los referrers / user agents suman en los resúmenes del documento slug#variant,
+    recortados aquí a METRICS_TOPK_CAPACITY valores por lote (ver app/services/topk.py).
+    Los totales de link suman en el campo totalClicks del link (orden por clics).
+    Devuelve {(tipo, doc_id): delta}: un delta por documento distinto.
+    """
+    increments: dict[tuple[str, str], dict] = {}
+    for key, n in counts.items():
+        if isinstance(key, TotalKey):
+            add_counts(increments.setdefault((LINK_TOTALS_KIND, key[0]), {}), {"totalClicks": n})
+            continue
+        if isinstance(key, MaxKey):
+            slug, variant, hour, index = key
+            for doc in _variant_docs(slug, variant, hour):
+                add_counts(increments.setdefault(doc, {}), {HLL_FIELD: {index: n}})
+            continue
+        if isinstance(key, AuxKey):
+            slug, variant, field, value = key
+            add_counts(increments.setdefault(("metrics", f"{slug}#{variant}"), {}), {field: {value: n}})
+            continue
+        slug, variant, country, device, hour = key
+        counters = {"clicks": n, "byCountry": {country: n}, "byDevice": {device: n}}
+        for doc in _variant_docs(slug, variant, hour):
+            add_counts(increments.setdefault(doc, {}), counters)
+        add_counts(increments.setdefault(("rollups", slug), {}), {**counters, "byVariant": {variant: n}})
+    for (kind, _), delta in increments.items():
+        for field in TOPK_FIELDS.values():
+            if kind == "metrics" and field in delta:
+                delta[field] = merge_summaries([delta[field]], settings.METRICS_TOPK_CAPACITY)
+    return increments
+
+
+def _variant_docs(slug: str, variant: str, hour: str) -> tuple[tuple[str, str], ...]:
+    """Documentos de una variante que suman un clic de esa hora: slug#variant y sus buckets."""
+    return (
+        ("metrics", f"{slug}#{variant}"),
+        ("buckets", f"{slug}#h#{hour}#{variant}"),
+        ("buckets", f"{slug}#d#{hour[:8]}#{variant}"),
+    )
+
+
+def _max_docs(key: ClickKey | AuxKey) -> int:
+    """Documentos que suma como máximo una clave en counter_increments."""
+    if isinstance(key, MaxKey):
+        return 3
+    if isinstance(key, AuxKey):
+        return 1
+    return 4
+
+
+def _atomic_groups(keys: list[ClickKey | AuxKey]):
+    """Agrupa claves (por slug y variante) sin pasar de MAX_ATOMIC_INCREMENTS documentos por grupo."""
+    group, docs = [], 0
+    for key in sorted(keys, key=lambda key: key[:2]):
+        if group and docs + _max_docs(key) > MAX_ATOMIC_INCREMENTS:
+            yield group
+            group, docs = [], 0
+        group.append(key)
+        docs += _max_docs(key)
+    if group:
+        yield group
+
+
+async def _write_counts(storage, counts: dict[ClickKey | AuxKey, int]) -> int:
+    """
+    Escribe los conteos con incrementos sin lectura ni transacción. Devuelve escrituras.
+
+    Cada grupo de claves es una llamada atómica a apply_increments y cada total de
+    link otra; lo escrito se quita de counts. Si algo falla, counts queda solo con lo
+    pendiente: reintentarlo (o devolverlo al buffer) no suma dos veces lo ya escrito.
+    """
+    writes = 0
+    for group in _atomic_groups([key for key in counts if not isinstance(key, TotalKey)]):
+        writes += await storage.apply_increments(counter_increments({key: counts[key] for key in group}))
+        for key in group:
+            del counts[key]
+
+    async def write_total(key: TotalKey) -> int:
+        written = await storage.apply_increments(counter_increments({key: counts[key]}))
+        del counts[key]
+        return written
+
+    results = await asyncio.gather(
+        *(write_total(key) for key in [key for key in counts if isinstance(key, TotalKey)]),
+        return_exceptions=True,
+    )
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+    return writes + sum(results)
+
+
+def click_increments(events: list[ClickEvent]) -> dict[tuple[str, str], dict]:
+    """Pre-agrega un lote de clics en un delta por documento de contador distinto."""
+    return counter_increments(count_clicks(events))
+
+
+async def _flush_counts(counts: dict[ClickKey | AuxKey, int]) -> None:
+    await _write_counts(get_storage(), counts)
+
+
+# Write-behind de la ingesta; solo corre si settings.CLICK_BUFFER_ENABLED (ver app.main)
+click_buffer = ClickBuffer(
+    _flush_counts,
+    max_keys=settings.CLICK_BUFFER_MAX_KEYS,
+    interval_seconds=settings.CLICK_BUFFER_FLUSH_INTERVAL_SECONDS,
+    max_queued_flushes=settings.CLICK_BUFFER_MAX_QUEUED_FLUSHES,
+    put_timeout=settings.CLICK_BUFFER_PUT_TIMEOUT_SECONDS,
+)
+
+
+async def ingest_clicks(events: list[ClickEvent]):
+    """
+    Registra un lote de clics con una escritura atómica (Increment) por documento distinto.
+
+    Con el buffer write-behind activo, los conteos se acumulan y se escriben en el
+    siguiente flush ("buffered": true, "writes": 0). Los clics de slugs que no
+    existen se descartan y se reportan en "unknownSlugs".
+    """
+    if not events:
+        raise HTTPException(status_code=400, detail="Se requiere al menos un evento")
+    if len(events) > settings.CLICK_EVENTS_MAX_ITEMS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Máximo {settings.CLICK_EVENTS_MAX_ITEMS} eventos por lote",
+        )
+
+    storage = get_storage()
+    slugs = list(dict.fromkeys(event.slug for event in events))
+    try:
+        known = await storage.get_slugs(slugs)
+        accepted = [event for event in events if event.slug in known]
+        writes = 0
+        if click_buffer.running:
+            await click_buffer.add(count_clicks(accepted, known))
+        else:
+            writes = await _write_counts(storage, count_clicks(accepted, known))
+    except BufferFullError as e:
+        logger.warning(f"Lote de {len(events)} clics rechazado: {e}")
+        raise HTTPException(
+            status_code=503, detail="Buffer de clics lleno, reintenta más tarde",
+            headers={"Retry-After": str(max(1, round(settings.CLICK_BUFFER_FLUSH_INTERVAL_SECONDS)))},
+        )
+    except Exception as e:
+        logger.error(f"Error al registrar {len(events)} clics: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Error al registrar clics")
+
+    unknown = [slug for slug in slugs if slug not in known]
+    if unknown:
+        logger.warning(f"Clics descartados de slugs inexistentes: {unknown}")
+    logger.info(f"Lote de clics: {len(accepted)} aceptados en {writes} escrituras.")
+    return {
+        "accepted": len(accepted), "rejected": len(events) - len(accepted),
+        "writes": writes, "buffered": click_buffer.running, "unknownSlugs": unknown,
+    }
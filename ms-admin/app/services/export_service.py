@@ -0,0 +1,97 @@
+import csv
+import io
+import json
+import logging
+import re
+from typing import AsyncIterator
+
+from app.db.dynamo import get_storage
+from app.db.storage import metric_range
+from app.services.link_service import aggregate_metric_items
+
+logger = logging.getLogger(__name__)
+
+CSV_COLUMNS = [
+    "linkId", "slug", "title", "destinationUrl", "enabled", "createdAt",
+    "clicks", "byVariant", "byDevice", "byCountry",
+]
+
+# Slugs que cumplen el invariante del merge-join (los que acepta la API hoy)
+_MERGEABLE_SLUG = re.compile(r"^[a-z0-9-]+$")
+# Lo que sigue a "slug#" en un documento propio: variante y, opcional, su shard #sN
+_METRIC_SUFFIX = re.compile(r"^[a-z0-9_-]+(#s\d+)?$")
+
+
+async def export_rows() -> AsyncIterator[dict]:
+    """
+    Recorre todos los links con sus totales de clics en una sola pasada.
+
+    Hace un merge-join entre los links ordenados por slug y la colección de métricas
+    ordenada por ID. Como '#' ordena antes que cualquier carácter válido de un slug
+    ([a-z0-9-]), los documentos slug#variant quedan agrupados en el mismo orden que
+    los slugs, así que basta con avanzar ambos streams a la par: la memoria usada es
+    la de un link y sus variantes, sin importar el tamaño de la colección.
+
+    Los slugs heredados que no cumplen ese invariante (p. ej. con '#' o caracteres
+    que ordenan antes que '#') se resuelven con una consulta por rango propia, y del
+    stream solo se toman documentos cuyo resto tras "slug#" es una variante válida:
+    los de esos slugs nunca se suman a otro link.
+    """
+    storage = get_storage()
+    metrics = storage.stream_metric_docs()
+    pending = await anext(metrics, None)
+    exported = 0
+
+    fallbacks = 0
+
+    async for link in storage.stream_links_by_slug():
+        slug = link["slug"]
+        start, end = metric_range(slug)
+        items = []
+        # Los documentos anteriores a este slug son métricas huérfanas (link borrado) o de
+        # slugs heredados (se leen aparte): se saltan
+        while pending is not None and pending["doc_id"] < end:
+            if pending["doc_id"] >= start and _METRIC_SUFFIX.match(pending["doc_id"][len(start):]):
+                items.append(pending)
+            pending = await anext(metrics, None)
+        if not _MERGEABLE_SLUG.match(slug):
+            items = await storage.get_metric_docs(slug)
+            fallbacks += 1
+
+        totals = aggregate_metric_items(items, link.get("variants") or ["default"])
+        exported += 1
+        yield {
+            "linkId": link["linkId"],
+            "slug": link["slug"],
+            "title": link.get("title"),
+            "destinationUrl": link.get("destinationUrl"),
+            "enabled": link.get("enabled", True),
+            "createdAt": link.get("createdAt"),
+            **totals,
+        }
+
+    logger.info(f"Exportación completada: {exported} links ({fallbacks} con slug heredado leídos aparte).")
+
+
+async def export_ndjson() -> AsyncIterator[str]:
+    """Un objeto JSON por línea."""
+    async for row in export_rows():
+        yield json.dumps(row, ensure_ascii=False) + "\n"
+
+
+async def export_csv() -> AsyncIterator[str]:
+    """CSV con encabezado; los desgloses (byVariant, byDevice, byCountry) van como JSON."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_COLUMNS)
+    async for row in export_rows():
+        writer.writerow([
+            json.dumps(row[col], ensure_ascii=False) if isinstance(row[col], dict) else row[col]
+            for col in CSV_COLUMNS
+        ])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    # Encabezado de una exportación vacía
+    if buffer.tell():
+        yield buffer.getvalue()
@@ -0,0 +1,58 @@
+import hashlib
+import math
+
+# --- HyperLogLog para visitantes únicos ---
+#
+# Cada documento de contadores (slug#variant[#sN] y sus buckets) guarda un sketch en
+# el campo "hll": un mapa {índice de registro: rango} solo con los registros no
+# nulos, como máximo HLL_REGISTERS entradas (memoria fija, error típico ~3,2 %).
+# Dos sketches se combinan tomando el máximo por registro, así que se pueden unir
+# variantes, shards y buckets sin volver a ver los visitantes.
+#
+# ms-redirect (src/hll.js) calcula los registros con el mismo hash: un visitante
+# cuenta una sola vez aunque sus clics lleguen por las dos vías.
+
+HLL_FIELD = "hll"
+HLL_PRECISION = 10
+HLL_REGISTERS = 1 << HLL_PRECISION
+# Bits del hash que quedan para el rango, después de los del índice
+_RANK_BITS = 64 - HLL_PRECISION
+_ALPHA = 0.7213 / (1 + 1.079 / HLL_REGISTERS)
+
+
+def hll_register(visitor_id: str) -> tuple[str, int]:
+    """
+    Registro que actualiza un visitante: (índice como str, rango).
+
+    Se usan los primeros 64 bits del SHA-1 del ID: los HLL_PRECISION bits altos
+    eligen el registro y el rango es la posición del primer 1 en el resto.
+    """
+    digest = int.from_bytes(hashlib.sha1(visitor_id.encode("utf-8")).digest()[:8], "big")
+    index = digest >> _RANK_BITS
+    rest = digest & ((1 << _RANK_BITS) - 1)
+    rank = _RANK_BITS - rest.bit_length() + 1
+    return str(index), rank
+
+
+def merge_hll(dst: dict, src: dict | None) -> None:
+    """Une en dst el sketch src (máximo por registro)."""
+    for index, rank in (src or {}).items():
+        try:
+            rank = int(rank)
+        except (ValueError, TypeError):
+            continue
+        if rank > dst.get(index, 0):
+            dst[index] = rank
+
+
+def hll_estimate(registers: dict | None) -> int:
+    """Estimación de distintos de un sketch (con conteo lineal para cardinalidades bajas)."""
+    registers = registers or {}
+    if not registers:
+        return 0
+    zeros = HLL_REGISTERS - len(registers)
+    harmonic = zeros + sum(2.0 ** -int(rank) for rank in registers.values())
+    estimate = _ALPHA * HLL_REGISTERS * HLL_REGISTERS / harmonic
+    if estimate <= 2.5 * HLL_REGISTERS and zeros:
+        estimate = HLL_REGISTERS * math.log(HLL_REGISTERS / zeros)
+    return round(estimate)
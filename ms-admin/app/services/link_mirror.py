@@ -0,0 +1,190 @@
+import asyncio
+import bisect
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Callable
+
+from app.db.storage import StorageBackend, select_links
+
+logger = logging.getLogger(__name__)
+
+
+class LinkMirror:
+    """
+    Copia en memoria de las colecciones de links y slugs, mantenida por un listener
+    del motor (StorageBackend.watch_links, on_snapshot en Firestore).
+
+    Los cambios llegan desde el hilo del listener y se aplican en el event loop, así
+    que las lecturas no necesitan locks. Solo conviene leer del espejo si is_fresh();
+    si no, quien lo usa lee del motor. on_link_change(linkId, link o None) se llama
+    con cada link que cambia (p. ej. para mantener el índice de búsqueda).
+
+    Con heartbeat_interval se escribe un latido cada tantos segundos (ver
+    StorageBackend.watch_links): un listener colgado deja de entregarlos aunque siga
+    activo, y sin cambios ni latidos durante max_lag el espejo deja de estar al día.
+    """
+
+    def __init__(
+        self,
+        max_lag: float,
+        on_link_change: Callable[[str, dict | None], None] | None = None,
+        heartbeat_interval: float | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_lag = max_lag
+        self.heartbeat_interval = heartbeat_interval
+        self._on_link_change = on_link_change
+        self._clock = clock
+        self._links: dict[str, dict] = {}
+        self._slugs: dict[str, str] = {}
+        # linkIds ordenados para listar sin filtros; se recalcula tras cada cambio
+        self._sorted_keys: list[tuple[str, str]] | None = None
+        self._synced: set[str] = set()
+        self._watch = None
+        self._heartbeat_task: asyncio.Task | None = None
+        # Retraso de la última entrega del listener, cambio o latido (segundos entre
+        # read_time y su aplicación), y cuándo llegó
+        self._lag: float | None = None
+        self._last_callback: float | None = None
+        self.hits = 0
+        self.misses = 0
+        self.stale_reads = 0
+
+    def start(self, storage: StorageBackend, loop: asyncio.AbstractEventLoop) -> bool:
+        """Empieza a escuchar; False si el motor no admite escuchar cambios."""
+        def on_change(collection, changes, read_time):
+            loop.call_soon_threadsafe(self.apply, collection, changes, read_time)
+
+        self._watch = storage.watch_links(on_change)
+        if self._watch is not None and self.heartbeat_interval:
+            self._heartbeat_task = loop.create_task(self._heartbeat())
+        return self._watch is not None
+
+    async def _heartbeat(self) -> None:
+        while True:
+            try:
+                await asyncio.to_thread(self._watch.heartbeat)
+            except Exception as e:
+                logger.warning(f"Espejo de links: no se pudo escribir el latido: {e}")
+            await asyncio.sleep(self.heartbeat_interval)
+
+    def stop(self) -> None:
+        if self._heartbeat_task is not None:
+            self._heartbeat_task.cancel()
+            self._heartbeat_task = None
+        if self._watch is not None:
+            self._watch.stop()
+            self._watch = None
+
+    def apply(self, collection: str, changes: list[tuple[str, dict | None]], read_time: datetime) -> None:
+        if collection == "links":
+            for link_id, data in changes:
+                if data is None:
+                    self._links.pop(link_id, None)
+                else:
+                    self._links[link_id] = {**data, "linkId": link_id}
+                if self._on_link_change is not None:
+                    self._on_link_change(link_id, self._links.get(link_id))
+            self._sorted_keys = None
+        elif collection == "slugs":
+            for slug, data in changes:
+                if data is None or "linkId" not in data:
+                    self._slugs.pop(slug, None)
+                else:
+                    self._slugs[slug] = data["linkId"]
+        elif collection != "heartbeat":
+            return
+        if collection != "heartbeat" and collection not in self._synced:
+            logger.info(f"Espejo de links: {collection} sincronizado ({len(changes)} documentos).")
+            self._synced.add(collection)
+        self._lag = max(0.0, (datetime.now(timezone.utc) - read_time).total_seconds())
+        self._last_callback = self._clock()
+
+    def put(self, link: dict) -> None:
+        """Aplica un link creado en esta instancia sin esperar al listener (leer lo propio)."""
+        self._links[link["linkId"]] = dict(link)
+        self._slugs[link["slug"]] = link["linkId"]
+        self._sorted_keys = None
+
+    def discard(self, link_id: str) -> None:
+        """Quita un link borrado en esta instancia sin esperar al listener."""
+        link = self._links.pop(link_id, None)
+        if link is not None:
+            self._slugs.pop(link.get("slug"), None)
+            self._sorted_keys = None
+
+    def is_fresh(self) -> bool:
+        """
+        Recibió ambas colecciones, el listener sigue activo, el retraso es <= max_lag
+        y la última entrega (cambio o latido) llegó hace <= max_lag.
+        """
+        return (
+            self._watch is not None
+            and self._watch.is_active
+            and len(self._synced) == 2
+            and self._lag is not None
+            and self._lag <= self.max_lag
+            and self._clock() - self._last_callback <= self.max_lag
+        )
+
+    def get_link(self, link_id: str) -> dict | None:
+        link = self._links.get(link_id)
+        if link is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return dict(link)
+
+    def get_slug(self, slug: str) -> str | None:
+        link_id = self._slugs.get(slug)
+        if link_id is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return link_id
+
+    def list_links(
+        self,
+        limit: int | None = None,
+        start_after: str | None = None,
+        *,
+        enabled: bool | None = None,
+        created_after: str | None = None,
+        order_by: str | None = None,
+        start_after_value=None,
+    ) -> list[dict]:
+        """Como StorageBackend.list_links."""
+        self.hits += 1
+        if enabled is None and created_after is None and order_by == "createdAt":
+            # El orden de "newest": (createdAt, linkId) ordenado una vez hasta el próximo cambio
+            if self._sorted_keys is None:
+                self._sorted_keys = sorted(
+                    (link["createdAt"], link_id) for link_id, link in self._links.items()
+                    if link.get("createdAt") is not None
+                )
+            keys = self._sorted_keys
+            end = bisect.bisect_left(keys, (start_after_value, start_after)) if start_after is not None else len(keys)
+            start = max(0, end - limit) if limit is not None else 0
+            return [dict(self._links[link_id]) for _, link_id in reversed(keys[start:end])]
+        return [
+            dict(link) for link in select_links(
+                self._links.values(), limit, start_after,
+                enabled=enabled, created_after=created_after, order_by=order_by, start_after_value=start_after_value,
+            )
+        ]
+
+    def stats(self) -> dict:
+        return {
+            "links": len(self._links),
+            "slugs": len(self._slugs),
+            "synced": len(self._synced) == 2,
+            "active": self._watch is not None and self._watch.is_active,
+            "lagSeconds": round(self._lag, 3) if self._lag is not None else None,
+            "secondsSinceLastCallback": (
+                round(self._clock() - self._last_callback, 1) if self._last_callback is not None else None
+            ),
+            "hits": self.hits,
+            "misses": self.misses,
+            "staleReads": self.stale_reads,
+        }
@@ -1,32 +1,80 @@
+import asyncio
+import base64
+import json
 import logging
+import re
+import secrets
+import string
+import unicodedata
 from fastapi import HTTPException
-from datetime import datetime, timezone
-import uuid
+from datetime import datetime, timedelta, timezone
 from google.api_core.exceptions import AlreadyExists, NotFound
-from google.cloud.firestore_v1.client import Client
-from google.cloud.firestore_v1.async_client import AsyncClient # Usar cliente asíncrono
-from google.cloud.firestore_v1 import AsyncTransaction, transactional # Usar transacciones asíncronas
-from google.cloud.firestore_v1.base_query import FieldFilter
+from pydantic import ValidationError
 
-# --- CORRECCIÓN IMPORTANTE ---
-# from app.db.dynamo import get_db # <-- ESTABA MAL
-from app.db.dynamo import get_db # <-- ASÍ ES CORRECTO
-# -----------------------------
-
-from app.core.config import settings # Asumiendo que settings tiene las colecciones
+from app.core.config import settings
+from app.db.dynamo import get_storage  # Motor configurado en settings.STORAGE_BACKEND
+from app.db.storage import slug_family_range
+from app.models.link_schemas import LinkCreate
+from app.services.bloom import BloomFilter
+from app.services.cache import LRUTTLCache
+from app.services.hll import HLL_FIELD, hll_estimate, merge_hll
+from app.services.link_mirror import LinkMirror
+from app.services.search_index import LinkSearchIndex
+from app.services.single_flight import coalesce
+from app.services.topk import TOPK_FIELDS, merge_summaries, top_items
+from app.services.ulid import ULIDGenerator
 
 logger = logging.getLogger(__name__)
 
-# Leer nombres de colecciones desde settings para consistencia
-LINKS_COLLECTION = settings.LINKS_COLLECTION
-SLUGS_COLLECTION = settings.SLUGS_COLLECTION
-METRICS_COLLECTION = settings.METRICS_COLLECTION
+# Caché read-through de get_link_by_id (clave: linkId). Se invalida en create/delete.
+link_cache = LRUTTLCache(settings.LINK_CACHE_MAX_ENTRIES, settings.LINK_CACHE_TTL_SECONDS)
+# Índice linkId -> slug, se llena al leer links y se invalida al borrarlos
+link_slug_cache = LRUTTLCache(settings.LINK_SLUG_CACHE_MAX_ENTRIES, settings.LINK_SLUG_CACHE_TTL_SECONDS)
+# Filtro de Bloom de slugs existentes (ver load_slug_filter). None hasta cargarlo:
+# mientras tanto check_slug_available consulta siempre el motor.
+slug_filter: BloomFilter | None = None
+# Filtro en construcción y tarea que lo carga en segundo plano (ver start_slug_filter)
+_loading_slug_filter: BloomFilter | None = None
+_slug_filter_task: asyncio.Task | None = None
+# Índice de búsqueda por título y slug (ver rebuild_search_index). None hasta cargarlo.
+search_index: LinkSearchIndex | None = None
+# Generador de IDs de links (ver gen_link_id)
+_link_ids = ULIDGenerator()
+# Espejo de links y slugs (ver start_link_mirror); None si no está activo
+link_mirror: LinkMirror | None = None
+
+# Granularidades de las series de tiempo: (código en el ID del bucket, paso, formato de la clave)
+_SERIES_GRANULARITIES = {
+    "hour": ("h", timedelta(hours=1), "%Y%m%d%H"),
+    "day": ("d", timedelta(days=1), "%Y%m%d"),
+}
+
+# Desgloses de los totales que se pueden pedir con "fields". Sin ninguno, los totales
+# son solo {"clicks": N} y se calculan con agregaciones en el servidor.
+_BREAKDOWN_FIELDS = ("byVariant", "byDevice", "byCountry")
+
+# Órdenes de GET /links ("sort") y el campo por el que ordena cada uno (desempata linkId).
+# "newest" usa createdAt y no el linkId: los IDs legados lk_<hex> no tienen orden de tiempo
+# y quedarían delante de todos los ULID.
+_LIST_SORTS = {"newest": "createdAt", "clicks": "totalClicks"}
+
+# Slugs generados desde el título: deben cumplir el patrón de LinkCreate
+# (^[a-z0-9-]{3,48}$) con lugar para el sufijo -N o aleatorio
+_SLUG_MIN_LENGTH = 3
+_SLUG_BASE_MAX_LENGTH = 40
+_SLUG_RANDOM_SUFFIX_LENGTH = 6
+# Intentos de reservar un slug generado si otra creación lo gana (el resto con sufijo aleatorio)
+_SLUG_CREATE_ATTEMPTS = 3
 
 # --- Funciones de Ayuda (Mantenidas o Adaptadas) ---
 
 def gen_link_id() -> str:
-    """Genera un ID único para los links."""
-    return f"lk_{uuid.uuid4().hex[:8]}"
+    """
+    Genera un ID único para los links: lk_ + ULID. Los IDs crecen con el instante de
+    creación (desempatan el orden por createdAt). Los IDs anteriores (lk_ + 8 hex)
+    siguen siendo válidos, pero no llevan tiempo: por eso "newest" ordena por createdAt.
+    """
+    return f"lk_{_link_ids.new()}"
 
 def _sum_maps(dst: dict, src: dict | None):
     """Suma los valores de src en dst (acumulador). Se mantiene igual."""
@@ -42,54 +90,236 @@ def _sum_maps(dst: dict, src: dict | None):
             pass
 
 def _variant_from_metric_id(doc_id: str) -> str:
-    """Extrae la variante del ID de documento de métrica (ej: slug#variant)."""
-    parts = doc_id.split("#", 1)
-    return parts[1] if len(parts) == 2 and parts[1] else "default"
+    """Extrae la variante del ID de documento de métrica (ej: slug#variant o su shard slug#variant#s3)."""
+    parts = doc_id.split("#")
+    return parts[1] if len(parts) >= 2 and parts[1] else "default"
+
+def aggregate_metric_items(metric_items: list[dict], declared_variants: list[str]) -> dict:
+    """
+    Agrega documentos de métricas (slug#variant) en los totales de un link.
+    Los shards de una misma variante (slug#variant#sN) se suman entre sí.
+    """
+    by_variant_items: dict[str, list[dict]] = {}
+    for item in metric_items:
+        by_variant_items.setdefault(_variant_from_metric_id(item["doc_id"]), []).append(item)
+    variants_to_process = sorted(by_variant_items) if by_variant_items else list(declared_variants)
+    logger.debug(f"Agregando métricas para las variantes: {variants_to_process}")
+    total_clicks = 0
+    aggregated_by_variant = {}
+    aggregated_by_device = {}
+    aggregated_by_country = {}
+    for v in variants_to_process:
+        clicks = 0
+        for item in by_variant_items.get(v, []):
+            try:
+                clicks += int(item.get("clicks", 0))
+            except (ValueError, TypeError): pass
+            _sum_maps(aggregated_by_device, item.get("byDevice"))
+            _sum_maps(aggregated_by_country, item.get("byCountry"))
+        aggregated_by_variant[v] = clicks
+        total_clicks += clicks
+    return {
+        "clicks": total_clicks, "byVariant": aggregated_by_variant,
+        "byDevice": aggregated_by_device, "byCountry": aggregated_by_country,
+    }
+
+def rollup_from_metric_items(metric_items: list[dict]) -> dict:
+    """Rollup de un slug (solo variantes con métricas) a partir de sus documentos slug#variant."""
+    return aggregate_metric_items(metric_items, [])
+
+def totals_from_rollup(rollup: dict, declared_variants: list[str]) -> dict:
+    """Totales de un link a partir de su rollup, con el mismo formato que aggregate_metric_items."""
+    by_variant = {}
+    _sum_maps(by_variant, rollup.get("byVariant"))
+    by_device = {}
+    _sum_maps(by_device, rollup.get("byDevice"))
+    by_country = {}
+    _sum_maps(by_country, rollup.get("byCountry"))
+    try:
+        clicks = int(rollup.get("clicks", 0))
+    except (ValueError, TypeError):
+        clicks = 0
+    return {
+        "clicks": clicks,
+        "byVariant": dict(sorted(by_variant.items())) if by_variant else {v: 0 for v in declared_variants},
+        "byDevice": by_device, "byCountry": by_country,
+    }
+
+def parse_fields(fields: str | None) -> tuple[str, ...]:
+    """
+    Desgloses pedidos en "fields" (p. ej. "byCountry,byDevice"), en el orden de
+    _BREAKDOWN_FIELDS. "clicks" siempre se incluye y se acepta por compatibilidad.
+    """
+    requested = {f.strip() for f in (fields or "").split(",") if f.strip()} - {"clicks"}
+    unknown = requested.difference(_BREAKDOWN_FIELDS)
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Campos desconocidos en 'fields': {', '.join(sorted(unknown))}",
+        )
+    return tuple(f for f in _BREAKDOWN_FIELDS if f in requested)
+
+def _parse_series_time(value: str, field: str) -> datetime:
+    """Fecha ISO 8601 (con o sin hora) en UTC. Lanza 400 si no es válida."""
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Fecha inválida en '{field}': {value}")
+    return parsed.replace(tzinfo=timezone.utc) if parsed.tzinfo is None else parsed.astimezone(timezone.utc)
+
+def _floor_to_bucket(moment: datetime, granularity: str) -> datetime:
+    moment = moment.replace(minute=0, second=0, microsecond=0)
+    return moment.replace(hour=0) if granularity == "day" else moment
+
+def _encode_cursor(last_link_id: str, sort_value, order_by: str) -> str:
+    """
+    Cursor opaco (base64url de JSON) que apunta al último link de una página: su
+    linkId, el valor del campo de orden en el link y ese campo (un cursor solo sirve
+    para el mismo orden).
+    """
+    payload = {"id": last_link_id, "v": sort_value, "o": order_by}
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def _decode_cursor(cursor: str, order_by: str) -> tuple[str, object]:
+    """Inverso de _encode_cursor: (linkId, valor de orden). Lanza 400 si no es válido o es de otro orden."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded))
+        last_link_id = payload["id"]
+        if not isinstance(last_link_id, str):
+            raise ValueError("id no es texto")
+        if payload.get("o") != order_by or payload.get("v") is None:
+            raise ValueError("cursor de otro orden")
+        return last_link_id, payload["v"]
+    except (ValueError, KeyError, TypeError, AttributeError):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+def _encode_search_cursor(offset: int) -> str:
+    """Cursor opaco de GET /links/search: posición del siguiente resultado."""
+    raw = json.dumps({"offset": offset}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def _decode_search_cursor(cursor: str) -> int:
+    """Inverso de _encode_search_cursor. Lanza 400 si el cursor no es válido."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        offset = json.loads(base64.urlsafe_b64decode(padded))["offset"]
+        if not isinstance(offset, int) or offset < 0:
+            raise ValueError("offset inválido")
+        return offset
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
 
 # --- Funciones Principales (Unificadas y Asíncronas) ---
 
+def _fresh_mirror() -> LinkMirror | None:
+    """El espejo de links si está al día; si no, None y la lectura va al motor."""
+    if link_mirror is None:
+        return None
+    if not link_mirror.is_fresh():
+        link_mirror.stale_reads += 1
+        return None
+    return link_mirror
+
+
+@coalesce
 async def get_link_by_id(link_id: str):
     """
-    Obtiene un link desde Firestore por su linkId (documento en colección 'links').
+    Obtiene un link por su linkId desde el espejo, la caché o el motor de almacenamiento.
     """
-    db: AsyncClient = get_db() # Obtiene la instancia Async de Firestore
-    logger.debug(f"Buscando link en Firestore con ID={link_id} en colección '{LINKS_COLLECTION}'")
+    mirror = _fresh_mirror()
+    if mirror is not None:
+        # Un link que no está puede haberse creado en otra instancia hace instantes
+        link = mirror.get_link(link_id)
+        if link is not None:
+            return link
+
+    cached = link_cache.get(link_id)
+    if cached is not None:
+        logger.debug(f"Link servido desde caché para ID={link_id}")
+        return dict(cached)
+
+    storage = get_storage()
+    logger.debug(f"Buscando link con ID={link_id} en motor '{storage.name}'")
     try:
-        doc_ref = db.collection(LINKS_COLLECTION).document(link_id)
-        doc = await doc_ref.get()
+        link_data = await storage.get_link(link_id)
 
-        if not doc.exists:
-            logger.warning(f"Link no encontrado en Firestore para ID={link_id}")
+        if link_data is None:
+            logger.warning(f"Link no encontrado para ID={link_id}")
             raise HTTPException(status_code=404, detail=f"Link {link_id} no encontrado")
 
-        logger.debug(f"Link encontrado en Firestore para ID={link_id}")
-        link_data = doc.to_dict()
-        link_data['linkId'] = doc.id # Asegurarse que el ID esté presente
-        return link_data
+        logger.debug(f"Link encontrado para ID={link_id}")
+        link_cache.set(link_id, link_data)
+        if link_data.get("slug"):
+            link_slug_cache.set(link_id, link_data["slug"])
+        return dict(link_data)
     except HTTPException:
         raise
     except Exception as e:
         logger.error(
-            f"Error inesperado al buscar link {link_id} en Firestore: {e}", exc_info=True
+            f"Error inesperado al buscar link {link_id}: {e}", exc_info=True
         )
         raise HTTPException(
-            status_code=500, detail="Error inesperado al buscar el link en Firestore"
+            status_code=500, detail="Error inesperado al buscar el link"
         )
 
-# Usamos una transacción asíncrona explícita para mejor control con FastAPI
-async def create_link(payload):
+def slug_base(title: str) -> str:
+    """Slug derivado del título: minúsculas sin acentos, solo [a-z0-9] separados por guiones."""
+    ascii_title = unicodedata.normalize("NFKD", title).encode("ascii", "ignore").decode()
+    base = re.sub(r"[^a-z0-9]+", "-", ascii_title.lower()).strip("-")
+    return base[:_SLUG_BASE_MAX_LENGTH].rstrip("-") or "link"
+
+
+def _random_slug_suffix() -> str:
+    return "".join(secrets.choice(string.ascii_lowercase + string.digits) for _ in range(_SLUG_RANDOM_SUFFIX_LENGTH))
+
+
+async def _free_slugs(base: str, count: int, reserved: set[str]) -> list[str]:
     """
-    Crea un link y su slug asociado en Firestore usando una transacción asíncrona.
+    `count` slugs libres para una base: base, base-2, base-3... (los primeros sin usar).
+
+    Los ocupados se leen con UNA consulta por rango (slug_family_range), sin
+    transacciones de prueba. Si la base tiene más de SLUG_GENERATION_SCAN_LIMIT slugs,
+    se usa base-<sufijo aleatorio>. `reserved` son slugs ya elegidos en la misma
+    operación que aún no están en el motor; se le agregan los devueltos. Una creación
+    concurrente con el mismo título puede ganar el slug: quien pierde reintenta con
+    base-<sufijo aleatorio> (ver _SLUG_CREATE_ATTEMPTS).
     """
-    db: AsyncClient = get_db()
-    transaction = db.transaction()
+    start, end = slug_family_range(base)
+    limit = settings.SLUG_GENERATION_SCAN_LIMIT
+    try:
+        taken = await get_storage().list_slugs_in_range(start, end, limit + 1)
+    except Exception as e:
+        logger.error(f"Error al buscar slugs libres para '{base}': {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Error al generar el slug")
+
+    used = set(taken) | reserved
+    slugs = []
+    n = 1
+    while len(slugs) < count:
+        if len(taken) > limit:
+            candidate = f"{base}-{_random_slug_suffix()}"
+        else:
+            candidate = base if n == 1 else f"{base}-{n}"
+            n += 1
+        if len(candidate) >= _SLUG_MIN_LENGTH and candidate not in used:
+            used.add(candidate)
+            slugs.append(candidate)
+    reserved.update(slugs)
+    return slugs
 
+
+def _build_link_doc(payload) -> dict:
+    """Valida un LinkCreate y arma el documento del link. Lanza HTTPException 400 si es inválido."""
     # --- Validación de entrada (igual que antes) ---
     if not payload.title or not str(payload.title).strip():
         logger.warning("Intento de crear link con título vacío.")
         raise HTTPException(status_code=400, detail="El título es requerido")
 
-    slug = payload.slug or payload.title.lower().strip().replace(" ", "-")
+    # Sin slug se usa la base derivada del título; create_link / create_links_batch
+    # la cambian por un slug libre (ver _free_slugs)
+    slug = payload.slug or slug_base(payload.title)
     # Añade validación más robusta de slug si es necesario
     if not slug:
         logger.warning(f"Intento de crear link con slug inválido: {slug}")
@@ -110,121 +340,225 @@ async def create_link(payload):
     if "default" not in variants:
         variants.append("default")
 
-    link_doc_data = {
+    return {
         "linkId": link_id, # Redundante si el ID del doc es link_id, pero útil tenerlo dentro
         "slug": slug,
         "title": payload.title.strip(),
         "destinationUrl": str(payload.destinationUrl),
         "variants": list(set(variants)),
         "enabled": True,
+        # Desnormalizado para ordenar por clics; lo suma la ingesta y lo corrige reconcile_rollups
+        "totalClicks": 0,
         "createdAt": created_at,
         "updatedAt": created_at,
     }
-    slug_doc_data = { "linkId": link_id } # Documento simple para mapeo
 
-    logger.info(f"Intentando crear link en transacción: ID={link_id}, Slug={slug}")
+async def create_link(payload):
+    """
+    Crea un link reservando su slug solo si no existe (409 si ya está tomado).
+    Sin slug, se genera uno libre a partir del título; si otra creación lo reserva
+    antes, se reintenta con un sufijo aleatorio en vez de responder 409.
+    """
+    storage = get_storage()
+    link_doc_data = _build_link_doc(payload)
+    base = link_doc_data["slug"]
+    if not payload.slug:
+        link_doc_data["slug"] = (await _free_slugs(base, 1, set()))[0]
+    link_id = link_doc_data["linkId"]
 
-    try:
-        # Definir la lógica de la transacción
-        @firestore.async_transactional # Decorador para manejar commit/rollback
-        async def _run_create_transaction(transaction: AsyncTransaction):
-            link_ref = db.collection(LINKS_COLLECTION).document(link_id)
-            slug_ref = db.collection(SLUGS_COLLECTION).document(slug)
-
-            # Verificar si el slug ya existe DENTRO de la transacción
-            slug_doc = await transaction.get(slug_ref, field_paths=["linkId"])
-            if slug_doc.exists:
-                logger.warning(f"Colisión de slug detectada en transacción: {slug}")
-                # Lanzar una excepción específica o devolver un estado
-                raise AlreadyExists("El slug ya existe")
-
-            # Si no existe, crear ambos documentos
-            transaction.set(link_ref, link_doc_data)
-            transaction.set(slug_ref, slug_doc_data)
-            logger.info(f"Documentos preparados en transacción para linkId: {link_id}, Slug: {slug}")
-
-        # Ejecutar la transacción
-        await _run_create_transaction(transaction)
-
-    except AlreadyExists as e_alias:
-        # El decorador @async_transactional convierte AlreadyExists en un error HTTP si no se maneja
-        raise HTTPException(status_code=409, detail=str(e_alias))
-    except Exception as e:
-        logger.error(
-            f"Error Firestore inesperado al crear link {slug}: {e}", exc_info=True
-        )
-        raise HTTPException(
-            status_code=500, detail=f"Error Firestore al crear link: {e}"
-        )
+    for attempt in range(1, _SLUG_CREATE_ATTEMPTS + 1):
+        slug = link_doc_data["slug"]
+        logger.info(f"Intentando crear link: ID={link_id}, Slug={slug}")
+        try:
+            await storage.create_link(link_doc_data)
+            link_cache.invalidate(link_id)
+            _remember_slug(slug)
+            _index_link(link_doc_data)
+            if link_mirror is not None:
+                link_mirror.put(link_doc_data)
+            break
+        except AlreadyExists as e_alias:
+            # Lo reservó otra instancia: este filtro aún no lo tenía
+            _remember_slug(slug)
+            if payload.slug or attempt == _SLUG_CREATE_ATTEMPTS:
+                raise HTTPException(status_code=409, detail=e_alias.message)
+            logger.info(f"Slug generado {slug} tomado por una creación concurrente; se reintenta")
+            link_doc_data["slug"] = f"{base}-{_random_slug_suffix()}"
+        except Exception as e:
+            logger.error(
+                f"Error inesperado al crear link {slug}: {e}", exc_info=True
+            )
+            raise HTTPException(
+                status_code=500, detail=f"Error al crear link: {e}"
+            )
 
     logger.info(f"Link creado exitosamente: ID={link_id}, Slug={slug}")
     return link_doc_data # Devolver el link creado
 
-async def list_links():
-    """ Lista todos los links (documentos principales) desde Firestore. """
-    db: AsyncClient = get_db()
-    logger.info(f"Listando todos los links desde '{LINKS_COLLECTION}'...")
-    try:
-        links_stream = db.collection(LINKS_COLLECTION).stream()
-        items = []
-        async for doc in links_stream:
-            data = doc.to_dict()
-            data['linkId'] = doc.id # Asegurar que el ID esté
-            items.append(data)
+async def create_links_batch(items: list[dict]):
+    """
+    Crea varios links en una sola operación.
+
+    Todos los items se validan antes de escribir nada; luego los válidos se envían
+    juntos al motor, que reserva cada slug solo si no existe. Devuelve un resultado
+    por item (en el mismo orden) con status "created", "conflict", "invalid" o "error".
+    Los items sin slug reciben uno libre derivado del título, distinto dentro del batch;
+    si una creación concurrente lo gana, se reintentan con sufijo aleatorio.
+    """
+    if not items:
+        raise HTTPException(status_code=400, detail="Se requiere al menos un item")
+    if len(items) > settings.BATCH_CREATE_MAX_ITEMS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Máximo {settings.BATCH_CREATE_MAX_ITEMS} items por batch",
+        )
+
+    results: list[dict] = [None] * len(items)
+    to_create: list[tuple[int, dict]] = []
+    slugs_in_batch = set()
+    # Items sin slug, agrupados por la base derivada del título
+    auto_slug: dict[str, list[tuple[int, dict]]] = {}
+
+    for index, raw in enumerate(items):
+        try:
+            payload = LinkCreate.model_validate(raw)
+            link_doc = _build_link_doc(payload)
+        except ValidationError as e:
+            results[index] = {
+                "index": index, "status": "invalid",
+                "errors": [err["msg"] for err in e.errors()],
+            }
+            continue
+        except HTTPException as e:
+            results[index] = {"index": index, "status": "invalid", "errors": [e.detail]}
+            continue
+        if not payload.slug:
+            auto_slug.setdefault(link_doc["slug"], []).append((index, link_doc))
+            continue
+        # Un slug repetido dentro del mismo batch choca con el primero sin consultar el motor
+        if link_doc["slug"] in slugs_in_batch:
+            results[index] = {"index": index, "status": "conflict", "slug": link_doc["slug"]}
+            continue
+        slugs_in_batch.add(link_doc["slug"])
+        to_create.append((index, link_doc))
+
+    # Una consulta por base; los slugs explícitos del batch también cuentan como ocupados
+    generated = await asyncio.gather(
+        *(_free_slugs(base, len(group), slugs_in_batch) for base, group in auto_slug.items())
+    )
+    for group, slugs in zip(auto_slug.values(), generated):
+        for (index, link_doc), slug in zip(group, slugs):
+            link_doc["slug"] = slug
+            to_create.append((index, link_doc))
+    to_create.sort(key=lambda entry: entry[0])
+
+    logger.info(f"Batch de creación: {len(items)} items, {len(to_create)} válidos.")
+
+    # Los slugs generados que gana una creación concurrente se reintentan con sufijo aleatorio
+    generated_bases = {index: base for base, group in auto_slug.items() for index, _ in group}
+    attempt = 1
+    while to_create:
+        try:
+            statuses = await get_storage().create_links([doc for _, doc in to_create])
+        except Exception as e:
+            logger.error(f"Error inesperado en batch de creación: {e}", exc_info=True)
+            raise HTTPException(status_code=500, detail=f"Error al crear links: {e}")
+        retry = []
+        for (index, link_doc), status in zip(to_create, statuses):
+            if status == "conflict" and index in generated_bases and attempt < _SLUG_CREATE_ATTEMPTS:
+                _remember_slug(link_doc["slug"])
+                link_doc["slug"] = f"{generated_bases[index]}-{_random_slug_suffix()}"
+                retry.append((index, link_doc))
+                continue
+            if status in ("created", "conflict"):
+                _remember_slug(link_doc["slug"])
+            if status == "created":
+                _index_link(link_doc)
+                if link_mirror is not None:
+                    link_mirror.put(link_doc)
+                results[index] = {"index": index, "status": "created", "link": link_doc}
+            else:
+                results[index] = {"index": index, "status": status, "slug": link_doc["slug"]}
+        to_create = retry
+        attempt += 1
 
-        logger.info(f"Listado completado. Encontrados {len(items)} items.")
-        # Opcional: formatear la salida si es necesario (ya lo hace tu código original)
-        return items
+    summary = {"created": 0, "conflict": 0, "invalid": 0, "error": 0}
+    for result in results:
+        summary[result["status"]] += 1
+    logger.info(f"Batch de creación completado: {summary}")
+    return {"items": results, "summary": summary}
+
+@coalesce
+async def list_links(
+    limit: int | None = None,
+    cursor: str | None = None,
+    enabled: bool | None = None,
+    created_after: str | None = None,
+    sort: str = "newest",
+):
+    """
+    Lista una página de links, de la más nueva a la más antigua (createdAt descendente,
+    desempatando por linkId).
+
+    Filtros opcionales: enabled y created_after (fecha ISO 8601). sort="clicks"
+    ordena por el campo desnormalizado totalClicks (lo suman por lotes la ingesta
+    de clics y el spool de ms-redirect, y lo corrige el job programado de
+    reconciliación de rollups, que también suma los clics que ms-redirect registra
+    sin spool y lo rellena en los links anteriores al campo; hasta entonces esos
+    links no aparecen); no se combina con created_after, porque Firestore solo ordena
+    primero por el campo del rango. Todo se resuelve con consultas
+    indexadas en el motor (ver infra/main.tf).
+
+    Devuelve {"items": [...], "nextCursor": str | None}; nextCursor es None en la última página.
+    """
+    storage = get_storage()
+    limit = min(limit or settings.LIST_LINKS_DEFAULT_LIMIT, settings.LIST_LINKS_MAX_LIMIT)
+    if sort not in _LIST_SORTS:
+        raise HTTPException(status_code=400, detail=f"Orden no soportado: {sort}")
+    if created_after is not None:
+        if sort == "clicks":
+            raise HTTPException(status_code=400, detail="sort=clicks no se puede combinar con createdAfter")
+        created_after = _parse_series_time(created_after, "createdAfter").isoformat()
+    order_by = _LIST_SORTS[sort]
+    start_after, start_after_value = _decode_cursor(cursor, order_by) if cursor else (None, None)
+    logger.info(
+        f"Listando links desde motor '{storage.name}' (limit={limit}, cursor={start_after}, "
+        f"enabled={enabled}, createdAfter={created_after}, sort={sort})..."
+    )
+    try:
+        # Se pide uno de más para saber si hay otra página sin una consulta extra
+        query = dict(
+            limit=limit + 1, start_after=start_after, enabled=enabled, created_after=created_after,
+            order_by=order_by, start_after_value=start_after_value,
+        )
+        mirror = _fresh_mirror()
+        items = mirror.list_links(**query) if mirror is not None else await storage.list_links(**query)
+        next_cursor = None
+        if len(items) > limit:
+            items = items[:limit]
+            last = items[-1]
+            next_cursor = _encode_cursor(last["linkId"], last[order_by], order_by)
+        logger.info(f"Listado completado. Devueltos {len(items)} items.")
+        return {"items": items, "nextCursor": next_cursor}
 
     except Exception as e:
-        logger.error(f"Error Firestore al listar links: {e}", exc_info=True)
+        logger.error(f"Error al listar links: {e}", exc_info=True)
         raise HTTPException(
-            status_code=500, detail=f"Error Firestore al listar links: {e}"
+            status_code=500, detail=f"Error al listar links: {e}"
         )
 
-# Usamos transacción asíncrona explícita también para borrar
 async def delete_link(link_id: str):
-    """ Borra un link y su slug asociado usando una transacción asíncrona. """
-    db: AsyncClient = get_db()
-    transaction = db.transaction()
-    logger.info(f"Intentando eliminar link en transacción con ID: {link_id}")
+    """ Borra un link y su slug asociado de forma atómica. """
+    storage = get_storage()
+    logger.info(f"Intentando eliminar link con ID: {link_id}")
 
     try:
-        @firestore.async_transactional
-        async def _run_delete_transaction(transaction: AsyncTransaction):
-            link_ref = db.collection(LINKS_COLLECTION).document(link_id)
-            # Leer el link DENTRO de la transacción para obtener el slug
-            link_doc = await transaction.get(link_ref)
-
-            if not link_doc.exists:
-                logger.warning(f"Intento de eliminar link no encontrado en transacción: {link_id}")
-                raise NotFound("Link no encontrado")
-
-            link_data = link_doc.to_dict()
-            slug = link_data.get("slug")
-
-            # Borrar el link principal
-            transaction.delete(link_ref)
-            logger.debug(f"Maestro preparado para eliminar en transacción: {link_id}")
-
-            # Borrar el slug si existe
-            if slug:
-                slug_ref = db.collection(SLUGS_COLLECTION).document(slug)
-                # Opcional: verificar si existe antes de borrar, aunque delete es idempotente
-                transaction.delete(slug_ref)
-                logger.debug(f"Slug preparado para eliminar en transacción: {slug}")
-            else:
-                 logger.warning(f"Link {link_id} no tenía slug asociado, no se borró slug.")
-
-        # Ejecutar la transacción
-        await _run_delete_transaction(transaction)
-
+        await storage.delete_link(link_id)
         logger.info(f"Eliminación completada exitosamente para linkId: {link_id}")
-        # En FastAPI, un DELETE exitoso usualmente devuelve un 204 No Content (sin cuerpo)
-        # o un mensaje simple. No necesitas devolver nada aquí si tu endpoint maneja el 204.
+        # El endpoint devuelve 204 No Content, no hace falta retornar nada.
 
     except NotFound as e:
-        raise HTTPException(status_code=404, detail=str(e))
+        raise HTTPException(status_code=404, detail=e.message)
     except Exception as e:
         logger.error(
             f"Error inesperado durante la eliminación del link {link_id}: {e}",
@@ -233,16 +567,253 @@ async def delete_link(link_id: str):
         raise HTTPException(
             status_code=500, detail=f"Error inesperado al eliminar link: {e}"
         )
+    finally:
+        # Después del borrado: descarta también lecturas concurrentes que lo hayan recacheado.
+        # El slug queda en slug_filter (un Bloom no admite borrar): solo cuesta una
+        # lectura de confirmación en check_slug_available.
+        link_cache.invalidate(link_id)
+        link_slug_cache.invalidate(link_id)
+        if search_index is not None:
+            search_index.remove(link_id)
+        if link_mirror is not None:
+            link_mirror.discard(link_id)
+
+
+def _index_link(link_doc: dict) -> None:
+    if search_index is not None:
+        search_index.add(link_doc)
+
+
+async def rebuild_search_index() -> None:
+    """
+    Reconstruye search_index recorriendo la colección de links (se llama al arrancar).
+
+    Si falla, se conserva el índice anterior (o ninguno: la búsqueda responde 503).
+    """
+    global search_index
+    index = LinkSearchIndex()
+    try:
+        async for link in get_storage().stream_links_by_slug():
+            index.add(link)
+    except Exception as e:
+        logger.error(f"No se pudo construir el índice de búsqueda: {e}", exc_info=True)
+        return
+    search_index = index
+    logger.info(f"Índice de búsqueda construido: {len(index)} links.")
+
+
+async def search_links(q: str, limit: int | None = None, cursor: str | None = None):
+    """
+    Busca links por título y slug (cada término como prefijo) con search_index.
+
+    Devuelve {"items": [...], "total": N, "nextCursor": str | None}, ordenado por
+    relevancia y luego de más nuevo a más antiguo.
+    """
+    if search_index is None:
+        raise HTTPException(status_code=503, detail="El índice de búsqueda no está disponible")
+    limit = min(limit or settings.LIST_LINKS_DEFAULT_LIMIT, settings.LIST_LINKS_MAX_LIMIT)
+    offset = _decode_search_cursor(cursor) if cursor else 0
+
+    end = offset + limit
+    total, results = search_index.search(q, limit=end)
+    return {
+        "items": results[offset:],
+        "total": total,
+        "nextCursor": _encode_search_cursor(end) if end < total else None,
+    }
 
 
-async def get_link_metrics(link_id: str):
+def _remember_slug(slug: str) -> None:
+    # También en el filtro que se está cargando: el recorrido pudo pasar ya por ese slug
+    for bloom in (slug_filter, _loading_slug_filter):
+        if bloom is not None:
+            bloom.add(slug)
+
+
+async def load_slug_filter() -> None:
+    """
+    Construye slug_filter recorriendo la colección de slugs.
+
+    Si falla, el filtro queda sin cargar y la disponibilidad se consulta en el motor.
     """
-    Agrega métricas para un link_id dado desde Firestore.
-    (Esta función ya estaba bien en el archivo original abierto, la copio aquí
-     para unificar, asegurándome que use el cliente async y settings).
+    global slug_filter, _loading_slug_filter
+    bloom = BloomFilter(settings.SLUG_FILTER_CAPACITY, settings.SLUG_FILTER_ERROR_RATE)
+    _loading_slug_filter = bloom
+    try:
+        async for slug in get_storage().stream_slugs():
+            bloom.add(slug)
+    except Exception as e:
+        logger.error(f"No se pudo cargar el filtro de slugs: {e}", exc_info=True)
+        return
+    finally:
+        _loading_slug_filter = None
+    slug_filter = bloom
+    logger.info(f"Filtro de slugs cargado: {bloom.count} slugs.")
+
+
+def start_slug_filter() -> None:
+    """Carga slug_filter en segundo plano (se llama al arrancar): no retrasa el arranque."""
+    global _slug_filter_task
+    if _slug_filter_task is None or _slug_filter_task.done():
+        _slug_filter_task = asyncio.create_task(load_slug_filter())
+
+
+async def stop_slug_filter() -> None:
+    global _slug_filter_task
+    if _slug_filter_task is not None:
+        _slug_filter_task.cancel()
+        await asyncio.gather(_slug_filter_task, return_exceptions=True)
+        _slug_filter_task = None
+
+
+async def check_slug_available(slug: str):
+    """
+    Indica si un slug está libre: {"slug", "available"}.
+
+    Con el espejo al día responde el espejo. Si no, el filtro de Bloom solo ve los
+    slugs creados en este proceso: un negativo es definitivo (sin leer el motor)
+    únicamente si todas las escrituras pasan por aquí (StorageBackend.single_process);
+    con varias instancias se confirma con get_slug, igual que un positivo.
     """
-    db: AsyncClient = get_db()
-    logger.info(f"Calculando métricas agregadas de Firestore para linkId={link_id}")
+    mirror = _fresh_mirror()
+    if mirror is not None:
+        return {"slug": slug, "available": mirror.get_slug(slug) is None}
+    storage = get_storage()
+    if slug_filter is not None and storage.single_process and slug not in slug_filter:
+        return {"slug": slug, "available": True}
+
+    try:
+        link_id = await storage.get_slug(slug)
+    except Exception as e:
+        logger.error(f"Error al consultar el slug {slug}: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Error al consultar el slug")
+    return {"slug": slug, "available": link_id is None}
+
+
+def _on_mirrored_link(link_id: str, link: dict | None) -> None:
+    """Cambios de links que llegan al espejo (también los de otras instancias)."""
+    link_cache.invalidate(link_id)
+    if search_index is None:
+        return
+    if link is None:
+        search_index.remove(link_id)
+    else:
+        search_index.add(link)
+
+
+async def start_link_mirror() -> None:
+    """
+    Arranca el espejo de links y slugs (se llama al arrancar). Hasta que reciba ambas
+    colecciones, y cada vez que se atrase o se corte el listener, se lee del motor.
+    """
+    global link_mirror
+    mirror = LinkMirror(
+        settings.LINK_MIRROR_MAX_LAG_SECONDS,
+        on_link_change=_on_mirrored_link,
+        heartbeat_interval=settings.LINK_MIRROR_HEARTBEAT_SECONDS,
+    )
+    storage = get_storage()
+    try:
+        started = mirror.start(storage, asyncio.get_running_loop())
+    except Exception as e:
+        logger.error(f"No se pudo iniciar el espejo de links: {e}", exc_info=True)
+        return
+    if not started:
+        logger.warning(f"El motor '{storage.name}' no admite el espejo de links: se lee del motor.")
+        return
+    link_mirror = mirror
+    logger.info("Espejo de links iniciado.")
+
+
+def stop_link_mirror() -> None:
+    global link_mirror
+    if link_mirror is not None:
+        link_mirror.stop()
+        link_mirror = None
+
+
+def _sketch_totals(sketch_docs: list[dict]) -> dict:
+    """
+    "uniques" (unión de los HyperLogLog) y los heavy hitters (unión de los resúmenes
+    Space-Saving) de los documentos slug#variant de un slug.
+    """
+    registers: dict = {}
+    for doc in sketch_docs:
+        merge_hll(registers, doc.get(HLL_FIELD))
+    totals = {"uniques": hll_estimate(registers)}
+    for field in TOPK_FIELDS.values():
+        merged = merge_summaries((doc.get(field) for doc in sketch_docs), settings.METRICS_TOPK_CAPACITY)
+        totals[field] = top_items(merged, settings.METRICS_TOPK_RESULTS)
+    return totals
+
+
+def _totals_from_source(
+    source: int | dict | list[dict], sketch_docs: list[dict], declared_variants: list[str], breakdowns: tuple[str, ...]
+) -> dict:
+    """
+    Totales con "clicks", "uniques", "topReferrers", "topUserAgents" (de los sketches
+    del slug) y solo los desgloses pedidos. source int: total de clics ya agregado.
+    """
+    if isinstance(source, int):
+        clicks, totals = source, {}
+    else:
+        if isinstance(source, dict):
+            totals = totals_from_rollup(source, declared_variants)
+        else:
+            totals = aggregate_metric_items(source, declared_variants)
+        clicks = totals["clicks"]
+    return {"clicks": clicks, **_sketch_totals(sketch_docs), **{field: totals[field] for field in breakdowns}}
+
+
+def _metrics_response(
+    link: dict, slug: str, loaded: tuple[int | dict | list[dict], list[dict]], breakdowns: tuple[str, ...]
+) -> dict:
+    source, sketch_docs = loaded
+    totals = _totals_from_source(source, sketch_docs, link.get("variants") or ["default"], breakdowns)
+    return {"slug": slug, "linkId": link["linkId"], "totals": totals}
+
+
+async def _load_totals_source(
+    storage, slug: str, breakdowns: tuple[str, ...]
+) -> tuple[int | dict | list[dict], list[dict]]:
+    """
+    (fuente de totales, sketches de sus documentos slug#variant) del slug. Sin desgloses, la fuente es
+    solo el total de clics (agregación en el motor); con desgloses, el rollup o los
+    documentos del slug. Los errores del motor se reportan como 500.
+    """
+    try:
+        if not breakdowns:
+            source = storage.get_click_totals([slug])
+        else:
+            source = _get_totals_sources(storage, [slug], breakdowns)
+        sources, sketches = await asyncio.gather(source, storage.get_metric_sketches([slug]))
+        return sources.get(slug, []), sketches.get(slug, [])
+    except Exception as e:
+        logger.error(f"Error durante consulta de métricas para slug={slug}: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Error al consultar métricas")
+
+
+@coalesce
+async def get_link_metrics(link_id: str, fields: str | None = None):
+    """
+    Totales de métricas de un link.
+
+    Por defecto solo el total de clics, calculado con una agregación en el motor (sin
+    leer los documentos). Los desgloses (byVariant, byDevice, byCountry) se piden con
+    "fields" y se leen del rollup del slug (un solo documento, mantenido por ms-redirect). Si el
+    slug aún no tiene rollup (métricas anteriores a los rollups) se agregan sus
+    documentos slug#variant como antes. Si el slug del link ya se conoce (caché), la
+    lectura del link y la de métricas corren en paralelo.
+    """
+    breakdowns = parse_fields(fields)
+    storage = get_storage()
+    logger.info(f"Calculando métricas agregadas para linkId={link_id}")
+
+    slug = link_slug_cache.get(link_id)
+    if slug:
+        link, source = await asyncio.gather(get_link_by_id(link_id), _load_totals_source(storage, slug, breakdowns))
+        if link.get("slug") == slug:
+            return _metrics_response(link, slug, source, breakdowns)
 
     link = await get_link_by_id(link_id) # Llama a la versión unificada
     slug = link.get("slug")
@@ -250,55 +821,234 @@ async def get_link_metrics(link_id: str):
         logger.error(f"Link maestro {link_id} no tiene slug.")
         raise HTTPException(status_code=500, detail="Error interno: Link maestro sin slug.")
 
-    declared_variants = link.get("variants") or ["default"]
-    logger.debug(f"Consultando métricas en Firestore para slug={slug} en colección '{METRICS_COLLECTION}'...")
+    logger.debug(f"Consultando métricas para slug={slug}...")
+    result = _metrics_response(link, slug, await _load_totals_source(storage, slug, breakdowns), breakdowns)
+    logger.info(f"Métricas agregadas calculadas para linkId={link_id}")
+    return result
+
 
+async def get_slug_metrics(slug: str, fields: str | None = None):
+    """
+    Totales de métricas de un link a partir de su slug.
+
+    La lectura de métricas arranca de inmediato, en paralelo con la resolución
+    slug -> linkId -> link, así que la respuesta cuesta una sola latencia de lectura
+    de métricas en vez de dos consecutivas. "fields": ver get_link_metrics.
+    """
+    breakdowns = parse_fields(fields)
+    storage = get_storage()
+    logger.info(f"Calculando métricas agregadas para slug={slug}")
+
+    async def resolve_link():
+        mirror = _fresh_mirror()
+        link_id = (mirror.get_slug(slug) if mirror is not None else None) or await storage.get_slug(slug)
+        if link_id is None:
+            logger.warning(f"Slug no encontrado: {slug}")
+            raise HTTPException(status_code=404, detail=f"Slug {slug} no encontrado")
+        return await get_link_by_id(link_id)
+
+    link, source = await asyncio.gather(resolve_link(), _load_totals_source(storage, slug, breakdowns))
+    return _metrics_response(link, slug, source, breakdowns)
+
+
+async def get_link_timeseries(
+    link_id: str, from_: str | None = None, to: str | None = None, granularity: str = "day"
+):
+    """
+    Serie de tiempo de clics de un link a partir de los buckets por hora o por día.
+
+    El rango incluye los buckets de 'from' y de 'to' (por defecto: los últimos
+    METRICS_SERIES_DEFAULT_DAYS días hasta ahora). Cada serie es una lista densa con
+    un valor por bucket, alineada con "timestamps"; los buckets sin clics valen 0.
+    "uniques" estima los visitantes distintos de cada bucket y, en los totales, de
+    todo el rango (unión de los sketches HyperLogLog, no la suma de la serie).
+    """
+    if granularity not in _SERIES_GRANULARITIES:
+        raise HTTPException(status_code=400, detail="granularity debe ser 'hour' o 'day'")
+    code, step, key_format = _SERIES_GRANULARITIES[granularity]
+
+    end = _floor_to_bucket(_parse_series_time(to, "to") if to else datetime.now(timezone.utc), granularity)
+    if from_:
+        start = _floor_to_bucket(_parse_series_time(from_, "from"), granularity)
+    else:
+        start = end - timedelta(days=settings.METRICS_SERIES_DEFAULT_DAYS) + step
+    if start > end:
+        raise HTTPException(status_code=400, detail="'from' debe ser anterior a 'to'")
+    points = (end - start) // step + 1
+    if points > settings.METRICS_SERIES_MAX_POINTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Máximo {settings.METRICS_SERIES_MAX_POINTS} puntos por serie; reduce el rango o usa granularity=day",
+        )
+
+    link = await get_link_by_id(link_id)
+    slug = link.get("slug")
+    if not slug:
+        logger.error(f"Link maestro {link_id} no tiene slug.")
+        raise HTTPException(status_code=500, detail="Error interno: Link maestro sin slug.")
+
+    buckets = [start + i * step for i in range(points)]
+    keys = [moment.strftime(key_format) for moment in buckets]
     try:
-        start_at_id = f"{slug}#"
-        end_at_id = f"{slug}#~"
-        query = db.collection(METRICS_COLLECTION).where(filter=FieldFilter("__name__", ">=", start_at_id)).where(filter=FieldFilter("__name__", "<", end_at_id))
-
-        docs_stream = query.stream()
-        metric_items = []
-        async for doc in docs_stream:
-            item_data = doc.to_dict()
-            item_data['doc_id'] = doc.id
-            metric_items.append(item_data)
-        logger.info(f"Consulta de métricas para slug={slug} encontró {len(metric_items)} items.")
+        docs = await get_storage().get_bucket_docs(slug, code, keys[0], keys[-1])
     except Exception as e:
-        logger.error(f"Error Firestore durante consulta de métricas para slug={slug}: {e}", exc_info=True)
-        raise HTTPException(status_code=500, detail="Error Firestore al consultar métricas")
+        logger.error(f"Error al consultar buckets de slug={slug}: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Error al consultar métricas")
 
-    # --- Procesamiento (igual que antes) ---
-    found_variants = {_variant_from_metric_id(i["doc_id"]) for i in metric_items}
-    variants_to_process = sorted(list(found_variants)) if found_variants else list(declared_variants)
-    logger.debug(f"Agregando métricas para las variantes: {variants_to_process}")
-    by_variant_item_map = {_variant_from_metric_id(i["doc_id"]): i for i in metric_items}
-    total_clicks = 0
-    aggregated_by_variant = {}
-    aggregated_by_device = {}
-    aggregated_by_country = {}
-    for v in variants_to_process:
-        item = by_variant_item_map.get(v)
-        clicks = 0
-        if item:
-            try:
-                clicks = int(item.get("clicks", 0))
-            except (ValueError, TypeError): clicks = 0
-            _sum_maps(aggregated_by_device, item.get("byDevice"))
-            _sum_maps(aggregated_by_country, item.get("byCountry"))
-        else: clicks = 0
-        aggregated_by_variant[v] = clicks
-        total_clicks += clicks
+    # Cada documento suma en su posición de la serie (clave -> índice): una pasada, sin ordenar ni agrupar
+    position = {key: i for i, key in enumerate(keys)}
+    prefix_len = len(f"{slug}#{code}#")
+    clicks_series = [0] * points
+    sketches: list[dict] = [{} for _ in range(points)]
+    by_variant_series: dict[str, list[int]] = {}
+    by_device: dict = {}
+    by_country: dict = {}
+    for doc in docs:
+        key, _, variant = doc["doc_id"][prefix_len:].partition("#")
+        variant = variant.partition("#")[0]  # sin el sufijo de shard (#sN)
+        i = position.get(key)
+        if i is None:
+            continue
+        try:
+            clicks = int(doc.get("clicks", 0))
+        except (ValueError, TypeError):
+            clicks = 0
+        series = by_variant_series.get(variant)
+        if series is None:
+            series = by_variant_series[variant] = [0] * points
+        series[i] += clicks
+        clicks_series[i] += clicks
+        merge_hll(sketches[i], doc.get(HLL_FIELD))
+        _sum_maps(by_device, doc.get("byDevice"))
+        _sum_maps(by_country, doc.get("byCountry"))
 
-    # --- Respuesta (igual que antes) ---
-    result = {
-        "slug": slug, "linkId": link_id,
+    logger.info(f"Serie {granularity} de slug={slug}: {points} puntos, {len(docs)} buckets leídos.")
+    by_variant_series = dict(sorted(by_variant_series.items()))
+    range_sketch: dict = {}
+    for sketch in sketches:
+        merge_hll(range_sketch, sketch)
+    return {
+        "slug": slug, "linkId": link_id, "granularity": granularity,
+        "from": start.isoformat(), "to": end.isoformat(),
+        "series": {
+            "timestamps": [moment.isoformat() for moment in buckets],
+            "clicks": clicks_series,
+            "uniques": [hll_estimate(sketch) for sketch in sketches],
+            "byVariant": by_variant_series,
+        },
         "totals": {
-            "clicks": total_clicks, "byVariant": aggregated_by_variant,
-            "byDevice": aggregated_by_device, "byCountry": aggregated_by_country,
+            "clicks": sum(clicks_series),
+            "uniques": hll_estimate(range_sketch),
+            "byVariant": {v: sum(series) for v, series in by_variant_series.items()},
+            "byDevice": by_device, "byCountry": by_country,
         },
     }
-    logger.info(f"Métricas agregadas calculadas para linkId={link_id}")
-    return result
 
+
+async def get_metrics_for_links(
+    link_ids: list[str] | None = None, slugs: list[str] | None = None, fields: str | None = None
+):
+    """
+    Totales de métricas de varios links en una sola llamada (por linkId o por slug).
+
+    Los links se leen con una lectura en lote y los rollups de todos los slugs se
+    piden juntos; solo los slugs sin rollup caen a sus documentos slug#variant. Con
+    slugs, la resolución slug -> link y la lectura de métricas corren en paralelo.
+    Sin "fields" solo se devuelve el total de clics (ver get_link_metrics).
+    Devuelve {"items": [{"linkId", "slug", "totals"}], "missing": [ids o slugs no encontrados]}.
+    """
+    requested = list(dict.fromkeys(link_ids or slugs or []))  # sin duplicados, en orden
+    if not requested or (link_ids and slugs):
+        raise HTTPException(status_code=400, detail="Indica linkIds o slugs (solo uno de los dos)")
+    if len(requested) > settings.METRICS_BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Máximo {settings.METRICS_BATCH_MAX_ITEMS} links por consulta",
+        )
+
+    breakdowns = parse_fields(fields)
+    storage = get_storage()
+    logger.info(f"Calculando métricas de {len(requested)} links ({'linkIds' if link_ids else 'slugs'})")
+    try:
+        if link_ids:
+            links = await _get_links_cached(requested)
+            slug_of = {link_id: link.get("slug") for link_id, link in links.items() if link.get("slug")}
+            slugs_found = list(slug_of.values())
+            metrics_by_slug, sketches = await asyncio.gather(
+                _get_totals_sources(storage, slugs_found, breakdowns), storage.get_metric_sketches(slugs_found)
+            )
+            keyed = {link_id: (links[link_id], slug_of[link_id]) for link_id in slug_of}
+        else:
+            async def resolve_links():
+                ids_by_slug = {}
+                mirror = _fresh_mirror()
+                if mirror is not None:
+                    ids_by_slug = {slug: mirror.get_slug(slug) for slug in requested}
+                    ids_by_slug = {slug: link_id for slug, link_id in ids_by_slug.items() if link_id}
+                unresolved = [slug for slug in requested if slug not in ids_by_slug]
+                if unresolved:
+                    ids_by_slug.update(await storage.get_slugs(unresolved))
+                links = await _get_links_cached(list(ids_by_slug.values()))
+                return {slug: links[link_id] for slug, link_id in ids_by_slug.items() if link_id in links}
+
+            links_by_slug, metrics_by_slug, sketches = await asyncio.gather(
+                resolve_links(), _get_totals_sources(storage, requested, breakdowns),
+                storage.get_metric_sketches(requested),
+            )
+            keyed = {slug: (link, slug) for slug, link in links_by_slug.items()}
+    except Exception as e:
+        logger.error(f"Error al consultar métricas de varios links: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Error al consultar métricas")
+
+    items = []
+    missing = []
+    for key in requested:
+        if key not in keyed:
+            missing.append(key)
+            continue
+        link, slug = keyed[key]
+        totals = _totals_from_source(
+            metrics_by_slug.get(slug, []), sketches.get(slug, []), link.get("variants") or ["default"], breakdowns
+        )
+        items.append({"linkId": link["linkId"], "slug": slug, "totals": totals})
+    return {"items": items, "missing": missing}
+
+
+async def _get_totals_sources(
+    storage, slugs: list[str], breakdowns: tuple[str, ...]
+) -> dict[str, int | dict | list[dict]]:
+    """
+    Por slug: sin desgloses, su total de clics (int); con desgloses, su rollup (dict)
+    o, si no tiene, sus documentos slug#variant (lista).
+    """
+    if not breakdowns:
+        return await storage.get_click_totals(slugs)
+    sources = await storage.get_rollups(slugs)
+    without_rollup = [slug for slug in slugs if slug not in sources]
+    if without_rollup:
+        sources.update(await storage.get_metric_docs_for_slugs(without_rollup))
+    return sources
+
+
+async def _get_links_cached(link_ids: list[str]) -> dict[str, dict]:
+    """Lee varios links usando el espejo, la caché y una sola lectura en lote para los que falten."""
+    found = {}
+    pending = []
+    mirror = _fresh_mirror()
+    for link_id in link_ids:
+        mirrored = mirror.get_link(link_id) if mirror is not None else None
+        if mirrored is not None:
+            found[link_id] = mirrored
+            continue
+        cached = link_cache.get(link_id)
+        if cached is not None:
+            found[link_id] = dict(cached)
+        else:
+            pending.append(link_id)
+    if pending:
+        for link_id, link in (await get_storage().get_links(pending)).items():
+            link_cache.set(link_id, link)
+            if link.get("slug"):
+                link_slug_cache.set(link_id, link["slug"])
+            found[link_id] = dict(link)
+    return found
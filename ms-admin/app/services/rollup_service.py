@@ -0,0 +1,67 @@
+import asyncio
+import logging
+
+from app.core.config import settings
+from app.db.dynamo import get_storage
+from app.services.link_service import rollup_from_metric_items, totals_from_rollup
+
+logger = logging.getLogger(__name__)
+
+# Slugs reconstruidos a la vez (cada uno es una transacción independiente)
+_RECONCILE_CONCURRENCY = 20
+
+
+async def reconcile_rollups(slugs: list[str] | None = None) -> dict:
+    """
+    Reconstruye los rollups a partir de los documentos slug#variant, que son la fuente de verdad.
+
+    También mantiene el campo desnormalizado totalClicks de cada link (orden por
+    clics de GET /links): se escribe solo si cambió. Y recorta a METRICS_TOPK_CAPACITY
+    los resúmenes de referrers / user agents, que la ingesta solo hace crecer.
+
+    Sin slugs recorre todos los links. Devuelve un resumen
+    {"checked", "missing", "drifted", "totalClicks"}: rollups revisados, que no
+    existían y que no coincidían con sus variantes (ambos quedan corregidos), y
+    links cuyo totalClicks se actualizó.
+    """
+    storage = get_storage()
+    summary = {"checked": 0, "missing": 0, "drifted": 0, "totalClicks": 0}
+
+    async def reconcile(slug: str, link: dict):
+        previous, rollup = await storage.rebuild_rollup(slug, rollup_from_metric_items)
+        await storage.trim_heavy_hitters(slug, settings.METRICS_TOPK_CAPACITY)
+        summary["checked"] += 1
+        if previous is None:
+            summary["missing"] += 1
+        elif totals_from_rollup(previous, []) != totals_from_rollup(rollup, []):
+            logger.warning(f"Rollup desviado para slug={slug}: {previous} -> {rollup}")
+            summary["drifted"] += 1
+        clicks = (rollup or {}).get("clicks", 0)
+        if link.get("totalClicks") != clicks:
+            await storage.set_total_clicks(link["linkId"], clicks)
+            summary["totalClicks"] += 1
+
+    pending = []
+    async for slug, link in _iter_links(storage, slugs):
+        pending.append(reconcile(slug, link))
+        if len(pending) >= _RECONCILE_CONCURRENCY:
+            await asyncio.gather(*pending)
+            pending = []
+    await asyncio.gather(*pending)
+
+    logger.info(f"Reconciliación de rollups completada: {summary}")
+    return summary
+
+
+async def _iter_links(storage, slugs: list[str] | None):
+    """(slug, link) de los slugs pedidos (los que no existen se omiten) o de todos los links."""
+    if slugs is not None:
+        for slug in dict.fromkeys(slugs):
+            link_id = await storage.get_slug(slug)
+            link = await storage.get_link(link_id) if link_id else None
+            if link is not None:
+                yield slug, link
+        return
+    async for link in storage.stream_links_by_slug():
+        if link.get("slug"):
+            yield link["slug"], link
@@ -0,0 +1,165 @@
+import heapq
+import re
+import unicodedata
+
+# --- Búsqueda de links por título y slug (en proceso) ---
+#
+# Índice invertido token -> {linkId: peso} y un trie con los tokens para resolver
+# prefijos mientras se escribe. Los tokens son las palabras del título y las partes
+# del slug (separadas por guiones), en minúsculas y sin acentos. Pesan más los
+# tokens del slug que los del título, y una coincidencia exacta más que un prefijo.
+# Una consulta por un slug con guiones ("evento-2025") se parte igual en términos.
+
+_SLUG_WEIGHT = 2
+_TITLE_WEIGHT = 1
+_EXACT_BONUS = 3
+# Términos más cortos solo coinciden con tokens exactos (un prefijo de una letra
+# abarcaría casi todo el índice)
+_MIN_PREFIX_LENGTH = 2
+
+
+def tokenize(text: str | None) -> list[str]:
+    ascii_text = unicodedata.normalize("NFKD", text or "").encode("ascii", "ignore").decode()
+    return re.findall(r"[a-z0-9]+", ascii_text.lower())
+
+
+class _TrieNode:
+    __slots__ = ("children", "terminal")
+
+    def __init__(self):
+        self.children: dict[str, "_TrieNode"] = {}
+        self.terminal = False
+
+
+class LinkSearchIndex:
+    """
+    Índice de búsqueda de links: se actualiza con add/remove y se consulta con search.
+
+    No es thread-safe: está pensado para usarse desde el event loop de FastAPI.
+    """
+
+    def __init__(self):
+        self._postings: dict[str, dict[str, int]] = {}
+        self._trie = _TrieNode()
+        self._links: dict[str, dict] = {}
+        self._tokens_by_link: dict[str, dict[str, int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._links)
+
+    @staticmethod
+    def _link_tokens(link: dict) -> dict[str, int]:
+        tokens = {token: _TITLE_WEIGHT for token in tokenize(link.get("title"))}
+        tokens.update({token: _SLUG_WEIGHT for token in tokenize(link.get("slug"))})
+        return tokens
+
+    def add(self, link: dict) -> None:
+        link_id = link["linkId"]
+        self.remove(link_id)
+        tokens = self._link_tokens(link)
+        for token, weight in tokens.items():
+            postings = self._postings.get(token)
+            if postings is None:
+                postings = self._postings[token] = {}
+                self._trie_insert(token)
+            postings[link_id] = weight
+        self._links[link_id] = link
+        self._tokens_by_link[link_id] = tokens
+
+    def remove(self, link_id: str) -> None:
+        for token in self._tokens_by_link.pop(link_id, {}):
+            postings = self._postings[token]
+            postings.pop(link_id, None)
+            if not postings:
+                del self._postings[token]
+                self._trie_delete(token)
+        self._links.pop(link_id, None)
+
+    def _trie_insert(self, token: str) -> None:
+        node = self._trie
+        for char in token:
+            node = node.children.setdefault(char, _TrieNode())
+        node.terminal = True
+
+    def _trie_delete(self, token: str) -> None:
+        path = [self._trie]
+        for char in token:
+            node = path[-1].children.get(char)
+            if node is None:
+                return
+            path.append(node)
+        path[-1].terminal = False
+        # Poda los nodos que quedaron sin tokens debajo
+        for depth in range(len(token), 0, -1):
+            node = path[depth]
+            if node.terminal or node.children:
+                break
+            del path[depth - 1].children[token[depth - 1]]
+
+    def _tokens_with_prefix(self, prefix: str) -> list[str]:
+        node = self._trie
+        for char in prefix:
+            node = node.children.get(char)
+            if node is None:
+                return []
+        tokens = []
+        stack = [(node, prefix)]
+        while stack:
+            node, token = stack.pop()
+            if node.terminal:
+                tokens.append(token)
+            stack.extend((child, token + char) for char, child in node.children.items())
+        return tokens
+
+    def _expand(self, term: str) -> list[tuple[dict[str, int], int]]:
+        """Postings de los tokens que coinciden con un término y el bono de cada uno."""
+        if len(term) < _MIN_PREFIX_LENGTH:
+            postings = self._postings.get(term)
+            return [(postings, _EXACT_BONUS)] if postings else []
+        return [
+            (self._postings[token], _EXACT_BONUS if token == term else 1)
+            for token in self._tokens_with_prefix(term)
+        ]
+
+    def _term_scores(self, term: str, candidates: dict | None = None) -> dict[str, int]:
+        """
+        Mejor puntaje de cada link para un término (como token exacto o como prefijo).
+        Con `candidates` solo se puntúan esos links (intersección con términos previos).
+        """
+        scores: dict[str, int] = {}
+        for postings, bonus in self._expand(term):
+            if candidates is not None and len(candidates) < len(postings):
+                hits = {link_id: postings[link_id] * bonus for link_id in candidates if link_id in postings}
+            else:
+                hits = {link_id: weight * bonus for link_id, weight in postings.items()}
+            if not scores:
+                scores = hits
+                continue
+            for link_id, score in hits.items():
+                if score > scores.get(link_id, 0):
+                    scores[link_id] = score
+        return scores
+
+    def search(self, query: str, limit: int) -> tuple[int, list[dict]]:
+        """
+        Links que coinciden con todos los términos de la consulta (cada uno como
+        prefijo): (total, los `limit` mejores). Orden: puntaje y luego linkId
+        descendente (más nuevos primero). Solo se ordenan los `limit` devueltos.
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return 0, []
+        # Primero el término más largo: suele ser el más selectivo; los demás solo filtran
+        terms.sort(key=len, reverse=True)
+        totals = self._term_scores(terms[0])
+        for term in terms[1:]:
+            if not totals:
+                break
+            scores = self._term_scores(term, totals)
+            totals = {link_id: total + scores[link_id] for link_id, total in totals.items() if link_id in scores}
+
+        best = heapq.nlargest(limit, totals.items(), key=lambda item: (item[1], item[0]))
+        return len(totals), [self._links[link_id] for link_id, _ in best]
+
+    def stats(self) -> dict:
+        return {"links": len(self._links), "tokens": len(self._postings)}
@@ -0,0 +1,69 @@
+import asyncio
+import copy
+import functools
+from typing import Awaitable, Callable, Hashable
+
+from app.core.config import settings
+
+
+class SingleFlight:
+    """
+    Agrupa llamadas idénticas en curso: la primera con una clave lanza la lectura como
+    tarea y las que llegan mientras no termina esperan esa misma tarea (mismo resultado
+    o misma excepción) en vez de repetir la consulta al motor. Si hubo más de una
+    llamada, cada una recibe su propia copia del resultado: modificarlo no afecta a
+    las demás.
+
+    La tarea se protege con asyncio.shield: si se cancela quien la lanzó (p. ej. el
+    cliente cortó la conexión), las demás siguen esperándola. No es thread-safe: está
+    pensado para usarse desde el event loop.
+    """
+
+    def __init__(self):
+        # clave -> [tarea, llamadas que la esperan]
+        self._in_flight: dict[Hashable, list] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable]):
+        self.calls += 1
+        flight = self._in_flight.get(key)
+        if flight is None:
+            flight = [asyncio.ensure_future(fn()), 1]
+            self._in_flight[key] = flight
+            flight[0].add_done_callback(functools.partial(self._done, key))
+        else:
+            flight[1] += 1
+            self.coalesced += 1
+        result = await asyncio.shield(flight[0])
+        # Nadie se suma a una tarea terminada: aquí flight[1] ya es el total de llamadas
+        return copy.deepcopy(result) if flight[1] > 1 else result
+
+    def _done(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._in_flight.get(key, [None])[0] is task:
+            del self._in_flight[key]
+        # Marca la excepción como leída aunque todos los que esperaban se hayan cancelado
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> dict:
+        return {"calls": self.calls, "coalesced": self.coalesced, "inFlight": len(self._in_flight)}
+
+
+single_flight = SingleFlight()
+
+
+def coalesce(fn):
+    """
+    Decorador para funciones de servicio async: las llamadas concurrentes con la misma
+    función y argumentos (hashables) comparten una sola ejecución; cada una recibe su
+    propia copia del resultado (ver SingleFlight).
+    """
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        if not settings.SINGLE_FLIGHT_ENABLED:
+            return await fn(*args, **kwargs)
+        key = (fn.__qualname__, args, tuple(sorted(kwargs.items())))
+        return await single_flight.do(key, lambda: fn(*args, **kwargs))
+
+    return wrapper
@@ -0,0 +1,60 @@
+from urllib.parse import urlsplit
+
+# --- Heavy hitters (Space-Saving) de referrers y user agents ---
+#
+# Cada documento slug#variant[#sN] guarda, por dimensión, un resumen Space-Saving:
+# un mapa {valor: conteo} con a lo sumo `capacity` entradas. Un valor nuevo con el
+# resumen lleno reemplaza al de menor conteo y hereda ese conteo (sobrestimación
+# acotada por el mínimo). Los resúmenes se unen sumando por valor y recortando a
+# `capacity`, así que variantes y shards se combinan al leer.
+#
+# ms-redirect (src/topk.js) aplica la actualización en su transacción. La ingesta de
+# ms-admin no lee el resumen: suma con Increment los conteos del lote (recortados a
+# `capacity`), así que el mapa guardado puede crecer hasta que reconcile_rollups lo
+# recorta (ver StorageBackend.trim_heavy_hitters); al leer se recorta igual.
+
+TOPK_FIELDS = {"referrer": "topReferrers", "userAgent": "topUserAgents"}
+DIRECT_REFERRER = "(direct)"
+_MAX_VALUE_LENGTH = 200
+
+
+def normalize_referrer(referrer: str | None) -> str:
+    """Host del referrer en minúsculas (sin "www."); "(direct)" si no hay o no es una URL."""
+    host = (urlsplit(referrer.strip()).hostname or "") if referrer else ""
+    host = host.removeprefix("www.")
+    return host[:_MAX_VALUE_LENGTH] or DIRECT_REFERRER
+
+
+def normalize_user_agent(user_agent: str | None) -> str:
+    return (user_agent or "").strip()[:_MAX_VALUE_LENGTH] or "unknown"
+
+
+def space_saving_add(summary: dict, counts: dict, capacity: int) -> dict:
+    """Suma conteos {valor: n} a un resumen Space-Saving (en sitio) sin superar capacity."""
+    for value, n in counts.items():
+        if value in summary:
+            summary[value] += n
+        elif len(summary) < capacity:
+            summary[value] = n
+        else:
+            evicted = min(summary, key=summary.get)
+            summary[value] = summary.pop(evicted) + n
+    return summary
+
+
+def merge_summaries(summaries, capacity: int) -> dict:
+    """Une resúmenes (suma por valor) y se queda con los `capacity` de mayor conteo."""
+    merged: dict = {}
+    for summary in summaries:
+        for value, n in (summary or {}).items():
+            try:
+                merged[value] = merged.get(value, 0) + int(n)
+            except (ValueError, TypeError):
+                continue
+    return dict(sorted(merged.items(), key=lambda item: -item[1])[:capacity])
+
+
+def top_items(summary: dict, limit: int) -> list[dict]:
+    """Los `limit` valores más frecuentes, de mayor a menor: [{"value", "clicks"}]."""
+    ranked = sorted(summary.items(), key=lambda item: (-item[1], item[0]))[:limit]
+    return [{"value": value, "clicks": n} for value, n in ranked]
@@ -0,0 +1,49 @@
+import os
+import time
+from typing import Callable
+
+# Base32 de Crockford en minúsculas: el orden de los caracteres es el de sus valores,
+# así que el orden lexicográfico de los IDs es el numérico
+_ALPHABET = "0123456789abcdefghjkmnpqrstvwxyz"
+_ULID_LENGTH = 26
+_RANDOM_BITS = 80
+
+
+def _now_ms() -> int:
+    return time.time_ns() // 1_000_000
+
+
+class ULIDGenerator:
+    """
+    IDs ordenables por tiempo con el formato ULID: 48 bits de milisegundos Unix y 80
+    bits aleatorios, 26 caracteres en base32.
+
+    Dentro de un mismo milisegundo (o si el reloj retrocede) se reusa el último instante
+    y se incrementa la parte aleatoria, así los IDs de un proceso son estrictamente
+    crecientes. No es thread-safe: está pensado para usarse desde el event loop.
+    """
+
+    def __init__(self, clock: Callable[[], int] = _now_ms):
+        self._clock = clock
+        self._last_ms = -1
+        self._last_random = 0
+
+    def new(self) -> str:
+        now = self._clock()
+        if now <= self._last_ms:
+            now = self._last_ms
+            self._last_random += 1
+            if self._last_random >> _RANDOM_BITS:
+                # Se agotó la parte aleatoria en este milisegundo: se pasa al siguiente
+                now += 1
+                self._last_random = int.from_bytes(os.urandom(_RANDOM_BITS // 8), "big")
+        else:
+            self._last_random = int.from_bytes(os.urandom(_RANDOM_BITS // 8), "big")
+        self._last_ms = now
+
+        value = (now << _RANDOM_BITS) | self._last_random
+        chars = []
+        for _ in range(_ULID_LENGTH):
+            value, digit = divmod(value, 32)
+            chars.append(_ALPHABET[digit])
+        return "".join(reversed(chars))
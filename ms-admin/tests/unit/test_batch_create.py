@@ -0,0 +1,65 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.db import dynamo
+from app.db.storage import MemoryBackend
+from app.main import app
+
+
+@pytest.fixture
+def client():
+    backend = MemoryBackend()
+    dynamo.set_storage(backend)
+    yield TestClient(app), backend
+    dynamo.set_storage(None)
+
+
+def item(slug, **overrides):
+    return {"title": f"Link {slug}", "slug": slug, "destinationUrl": "https://example.com", **overrides}
+
+
+def test_batch_create_reports_status_per_item(client):
+    http, backend = client
+    asyncio.run(backend.create_link({"linkId": "lk_old", "slug": "tomado"}))
+
+    response = http.post("/links:batch", json={"items": [
+        item("uno"),
+        item("tomado"),                       # ya existe en el motor
+        item("UNO MAL"),                      # no cumple el patrón de slug
+        item("uno"),                          # repetido dentro del batch
+        item("dos", destinationUrl="nope"),   # URL inválida
+        item("tres", variants=["ig", "x"]),
+    ]})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert [r["status"] for r in body["items"]] == [
+        "created", "conflict", "invalid", "conflict", "invalid", "created",
+    ]
+    assert body["summary"] == {"created": 2, "conflict": 2, "invalid": 2, "error": 0}
+    assert body["items"][2]["errors"]
+    assert sorted(backend.slugs) == ["tomado", "tres", "uno"]
+    created_id = body["items"][0]["link"]["linkId"]
+    assert http.get(f"/links/{created_id}").json()["slug"] == "uno"
+
+
+def test_batch_create_enforces_max_items(client, monkeypatch):
+    http, _ = client
+    monkeypatch.setattr("app.services.link_service.settings.BATCH_CREATE_MAX_ITEMS", 2)
+
+    response = http.post("/links:batch", json={"items": [item("a-1"), item("a-2"), item("a-3")]})
+
+    assert response.status_code == 400
+
+
+def test_batch_create_sqlite_conflicts(tmp_path):
+    from app.db.sqlite_backend import SQLiteBackend
+
+    backend = SQLiteBackend(str(tmp_path / "b.db"))
+    docs = [{"linkId": "lk_1", "slug": "a"}, {"linkId": "lk_2", "slug": "a"}, {"linkId": "lk_3", "slug": "b"}]
+
+    assert asyncio.run(backend.create_links(docs)) == ["created", "conflict", "created"]
+    assert asyncio.run(backend.get_link("lk_2")) is None
+    asyncio.run(backend.close())
@@ -0,0 +1,91 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.db import dynamo
+from app.db.storage import MemoryBackend
+from app.main import app
+from app.services import link_service
+from app.services.cache import LRUTTLCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUTTLCache(max_entries=2, ttl_seconds=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")  # "b" queda como el menos usado
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.evictions == 1
+
+
+def test_ttl_expires_entries():
+    clock = FakeClock()
+    cache = LRUTTLCache(max_entries=10, ttl_seconds=5, clock=clock)
+    cache.set("a", 1)
+
+    clock.now = 4.9
+    assert cache.get("a") == 1
+    clock.now = 5.0
+    assert cache.get("a") is None
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["expirations"] == 1
+    assert stats["size"] == 0
+
+
+def test_disabled_cache_never_stores():
+    cache = LRUTTLCache(max_entries=0, ttl_seconds=30)
+    cache.set("a", 1)
+    assert cache.get("a") is None
+
+
+@pytest.fixture
+def backend():
+    storage = MemoryBackend()
+    dynamo.set_storage(storage)
+    link_service.link_cache.clear()
+    yield storage
+    link_service.link_cache.clear()
+    dynamo.set_storage(None)
+
+
+def test_get_link_by_id_reads_through_and_invalidates(backend):
+    client = TestClient(app)
+    link_id = client.post(
+        "/links", json={"title": "Promo", "slug": "promo", "destinationUrl": "https://example.com"}
+    ).json()["linkId"]
+
+    calls = []
+    original = backend.get_link
+
+    async def counting_get_link(lid):
+        calls.append(lid)
+        return await original(lid)
+
+    backend.get_link = counting_get_link
+
+    asyncio.run(link_service.get_link_by_id(link_id))
+    asyncio.run(link_service.get_link_by_id(link_id))
+    assert calls == [link_id]
+
+    client.delete(f"/links/{link_id}")
+    assert client.get(f"/links/{link_id}").status_code == 404
+
+    stats = client.get("/health/stats").json()["linkCache"]
+    assert stats["hits"] >= 1
+    assert stats["size"] == 0
@@ -0,0 +1,199 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.db import dynamo
+from app.db.storage import MemoryBackend
+from app.main import app
+from app.services import link_service
+from app.services.click_buffer import BufferFullError, ClickBuffer, MaxKey
+from app.services.click_service import click_buffer
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def make_buffer(flush, **kwargs):
+    options = {"max_keys": 100, "interval_seconds": 60, "max_queued_flushes": 2, "put_timeout": 0.01}
+    return ClickBuffer(flush, **{**options, **kwargs})
+
+
+def test_coalesces_and_drains_on_stop():
+    batches = []
+
+    async def flush(batch):
+        batches.append(batch)
+
+    async def scenario():
+        buffer = make_buffer(flush)
+        await buffer.start()
+        for _ in range(1000):
+            await buffer.add({"a": 1})
+        await buffer.add({"b": 2})
+        await buffer.stop()
+        return buffer
+
+    buffer = run(scenario())
+
+    assert batches == [{"a": 1000, "b": 2}]
+    assert buffer.stats()["flushes"] == 1
+    assert not buffer.running
+
+
+def test_flushes_on_size_and_interval():
+    batches = []
+
+    async def flush(batch):
+        batches.append(dict(batch))
+
+    async def scenario():
+        buffer = make_buffer(flush, max_keys=2, interval_seconds=0.02)
+        await buffer.start()
+        await buffer.add({"a": 1, "b": 1})
+        await buffer.add({"c": 1})  # el lote ya tenía 2 claves: se entrega antes de sumar
+        await asyncio.sleep(0.1)   # y "c" sale por tiempo
+        await buffer.stop()
+
+    run(scenario())
+
+    assert batches == [{"a": 1, "b": 1}, {"c": 1}]
+
+
+def test_backpressure_when_queue_is_full():
+    async def scenario():
+        gate = asyncio.Event()
+
+        async def flush(batch):
+            await gate.wait()
+
+        buffer = make_buffer(flush, max_keys=1, max_queued_flushes=1)
+        await buffer.start()
+        with pytest.raises(BufferFullError):
+            for i in range(10):
+                await buffer.add({i: 1})
+        rejected = buffer.stats()["rejectedAdds"]
+        gate.set()
+        await buffer.stop()
+        return rejected
+
+    assert run(scenario()) == 1
+
+
+def test_stop_during_hand_off_keeps_the_batch():
+    batches = []
+
+    async def scenario():
+        gate = asyncio.Event()
+
+        async def flush(batch):
+            await gate.wait()
+            batches.append(dict(batch))
+
+        buffer = make_buffer(flush, max_queued_flushes=1, interval_seconds=0.01)
+        await buffer.start()
+        # "a" queda en el worker, "b" llena la cola y el ticker se bloquea entregando "c"
+        for key in ("a", "b", "c"):
+            await buffer.add({key: 1})
+            await asyncio.sleep(0.03)
+        gate.set()
+        await buffer.stop()
+
+    run(scenario())
+
+    assert sorted(key for batch in batches for key in batch) == ["a", "b", "c"]
+
+
+def test_failed_flush_returns_deltas_to_pending():
+    calls = []
+
+    async def flush(batch):
+        calls.append(dict(batch))
+        if len(calls) == 1:
+            raise RuntimeError("Firestore no disponible")
+
+    async def scenario():
+        buffer = make_buffer(flush, flush_attempts=1, interval_seconds=0.01)
+        await buffer.start()
+        await buffer.add({"a": 3})
+        await asyncio.sleep(0.05)
+        await buffer.add({"a": 1})
+        await buffer.stop()
+        return buffer.stats()
+
+    stats = run(scenario())
+
+    assert stats["failedFlushes"] == 1
+    assert sum(batch.get("a", 0) for batch in calls[1:]) == 4
+
+
+def test_retry_carries_only_what_flush_did_not_write():
+    calls = []
+
+    async def flush(batch):
+        calls.append(dict(batch))
+        # Escribe "a" y falla antes de escribir "b"
+        batch.pop("a", None)
+        if len(calls) == 1:
+            raise RuntimeError("Firestore no disponible")
+        batch.clear()
+
+    async def scenario():
+        buffer = make_buffer(flush, flush_attempts=2)
+        await buffer.start()
+        await buffer.add({"a": 3, "b": 2})
+        await buffer.stop()
+        return buffer.stats()
+
+    stats = run(scenario())
+
+    assert calls == [{"a": 3, "b": 2}, {"b": 2}]
+    assert stats["flushedKeys"] == 2 and stats["failedFlushes"] == 0
+
+
+def test_ingest_through_buffer(monkeypatch):
+    backend = MemoryBackend()
+    run(backend.create_link({"linkId": "lk_1", "slug": "promo", "variants": ["default"]}))
+    dynamo.set_storage(backend)
+    link_service.link_cache.clear()
+    monkeypatch.setattr(settings, "CLICK_BUFFER_ENABLED", True)
+    events = [{"slug": "promo", "country": "CO"}] * 50
+
+    with TestClient(app) as http:
+        body = http.post("/events/clicks", json={"events": events}).json()
+        assert body["buffered"] is True
+        assert body["writes"] == 0
+        assert http.get("/health/stats").json()["clickBuffer"]["running"] is True
+
+    # Al cerrar la app el buffer se vacía
+    assert not click_buffer.running
+    assert backend.metrics["promo#default"] == {
+        "clicks": 50, "byCountry": {"CO": 50}, "byDevice": {"unknown": 50},
+        "topReferrers": {"(direct)": 50}, "topUserAgents": {"unknown": 50},
+    }
+    assert backend.rollups["promo"]["byVariant"] == {"default": 50}
+    dynamo.set_storage(None)
+
+
+def test_max_keys_keep_the_highest_value():
+    batches = []
+
+    async def flush(batch):
+        batches.append(batch)
+
+    register = MaxKey(("promo", "default", "2025102213", "17"))
+
+    async def scenario():
+        buffer = make_buffer(flush)
+        await buffer.start()
+        await buffer.add({register: 3, "a": 1})
+        await buffer.add({register: 2, "a": 1})
+        await buffer.stop()
+        return buffer
+
+    buffer = run(scenario())
+
+    assert batches == [{register: 3, "a": 2}]
+    assert buffer.stats()["clicksBuffered"] == 2
@@ -0,0 +1,169 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+from google.cloud import firestore
+
+from app.core.config import settings
+from app.db import dynamo
+from app.db.firestore_backend import FirestoreBackend
+from app.db.sqlite_backend import SQLiteBackend
+from app.main import app
+from app.models.event_schemas import ClickEvent
+from app.services import link_service
+from app.db.storage import LINK_TOTALS_KIND, MemoryBackend
+from app.services.click_service import TotalKey, _write_counts, click_increments, count_clicks
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def storage(request, tmp_path):
+    if request.param == "memory":
+        backend = MemoryBackend()
+    else:
+        backend = SQLiteBackend(str(tmp_path / "linkly.db"))
+    run(backend.create_link({"linkId": "lk_1", "slug": "promo", "variants": ["default", "ig"]}))
+    dynamo.set_storage(backend)
+    link_service.link_cache.clear()
+    yield backend
+    link_service.link_cache.clear()
+    dynamo.set_storage(None)
+    run(backend.close())
+
+
+EVENTS = [
+    {"slug": "promo", "variant": "ig", "country": "co", "device": "mobile", "timestamp": "2025-10-22T13:05:00Z"},
+    {"slug": "promo", "variant": "ig", "country": "CO", "device": "mobile", "timestamp": "2025-10-22T13:59:00Z"},
+    {"slug": "promo", "country": "US", "device": "desktop", "timestamp": "2025-10-22T14:00:00Z"},
+    {"slug": "no-existe", "timestamp": "2025-10-22T14:00:00Z"},
+]
+
+
+def test_click_increments_one_delta_per_document():
+    increments = click_increments([ClickEvent(**e) for e in EVENTS[:3]])
+
+    assert increments[("metrics", "promo#ig")] == {
+        "clicks": 2, "byCountry": {"CO": 2}, "byDevice": {"mobile": 2},
+        "topReferrers": {"(direct)": 2}, "topUserAgents": {"unknown": 2},
+    }
+    assert increments[("rollups", "promo")]["byVariant"] == {"ig": 2, "default": 1}
+    assert increments[("buckets", "promo#h#2025102213#ig")]["clicks"] == 2
+    assert increments[("buckets", "promo#d#20251022#default")]["clicks"] == 1
+    # 2 variantes x (métrica + bucket hora + bucket día) + 1 rollup
+    assert len(increments) == 7
+
+
+def test_ingest_clicks_endpoint(storage):
+    http = TestClient(app)
+
+    response = http.post("/events/clicks", json={"events": EVENTS})
+
+    assert response.status_code == 200
+    assert response.json() == {
+        "accepted": 3, "rejected": 1, "writes": 8, "buffered": False, "unknownSlugs": ["no-existe"],
+    }
+    http.post("/events/clicks", json={"events": EVENTS[:1]})
+    totals = http.get("/links/lk_1/metrics", params={"fields": "byVariant,byDevice,byCountry"}).json()["totals"]
+    assert totals == {
+        "clicks": 4, "uniques": 0, "byVariant": {"default": 1, "ig": 3},
+        "byDevice": {"mobile": 3, "desktop": 1}, "byCountry": {"CO": 3, "US": 1},
+        "topReferrers": [{"value": "(direct)", "clicks": 4}],
+        "topUserAgents": [{"value": "unknown", "clicks": 4}],
+    }
+    series = http.get("/links/lk_1/metrics", params={"from": "2025-10-22", "to": "2025-10-22"}).json()
+    assert series["series"]["clicks"] == [4]
+    assert run(storage.get_metric_docs("promo"))[1]["clicks"] == 3
+    # El link no tenía totalClicks (anterior al campo): la ingesta lo crea y lo suma
+    assert run(storage.get_link("lk_1"))["totalClicks"] == 4
+
+
+def test_ingest_clicks_validation(storage):
+    http = TestClient(app)
+
+    assert http.post("/events/clicks", json={"events": []}).status_code == 400
+    assert http.post("/events/clicks", json={"events": [{"slug": "promo", "variant": "a/b"}]}).status_code == 422
+
+
+def test_firestore_increment_transforms():
+    transforms = FirestoreBackend._increment_transforms({"clicks": 2, "byCountry": {"CO": 2}})
+
+    assert transforms["clicks"] == firestore.Increment(2)
+    assert transforms["byCountry"]["CO"] == firestore.Increment(2)
+
+
+def test_ingest_clicks_counts_unique_visitors(storage):
+    events = [
+        {"slug": "promo", "variant": "ig", "visitorId": f"v{i % 40}", "timestamp": "2025-10-22T13:05:00Z"}
+        for i in range(100)
+    ] + [{"slug": "promo", "visitorId": "v1", "timestamp": "2025-10-22T14:05:00Z"}]
+    http = TestClient(app)
+
+    assert http.post("/events/clicks", json={"events": events}).status_code == 200
+
+    totals = http.get("/links/lk_1/metrics").json()["totals"]
+    # v1 clicó en las dos variantes: cuenta una vez al unir los sketches (estimación)
+    assert totals["clicks"] == 101
+    assert abs(totals["uniques"] - 40) <= 2
+    series = http.get(
+        "/links/lk_1/metrics", params={"from": "2025-10-22T13:00", "to": "2025-10-22T14:00", "granularity": "hour"}
+    ).json()
+    assert series["series"]["uniques"][1] == 1
+    assert series["totals"]["uniques"] == totals["uniques"]
+
+
+def test_firestore_increments_use_maximum_for_hll():
+    transforms = FirestoreBackend._increment_transforms({"clicks": 2, "hll": {"17": 3}})
+
+    assert transforms["clicks"] == firestore.Increment(2)
+    assert transforms["hll"]["17"] == firestore.Maximum(3)
+
+
+def test_ingest_clicks_tracks_top_referrers_and_user_agents(storage):
+    events = (
+        [{"slug": "promo", "referrer": "https://www.google.com/search?q=x", "userAgent": "Chrome"}] * 5
+        + [{"slug": "promo", "variant": "ig", "referrer": "https://t.co/abc", "userAgent": "Safari"}] * 3
+        + [{"slug": "promo", "variant": "ig", "referrer": "https://google.com/", "userAgent": "Chrome"}] * 2
+    )
+    http = TestClient(app)
+
+    assert http.post("/events/clicks", json={"events": events}).status_code == 200
+
+    totals = http.get("/links/lk_1/metrics").json()["totals"]
+    # Se unen los resúmenes de las dos variantes
+    assert totals["topReferrers"] == [{"value": "google.com", "clicks": 7}, {"value": "t.co", "clicks": 3}]
+    assert totals["topUserAgents"] == [{"value": "Chrome", "clicks": 7}, {"value": "Safari", "clicks": 3}]
+
+
+def test_write_counts_retry_does_not_apply_twice(storage, monkeypatch):
+    counts = count_clicks([ClickEvent(**e) for e in EVENTS[:3]], {"promo": "lk_1"})
+    apply_increments = storage.apply_increments
+
+    async def links_unavailable(increments):
+        if any(kind == LINK_TOTALS_KIND for kind, _ in increments):
+            raise RuntimeError("Firestore no disponible")
+        return await apply_increments(increments)
+
+    monkeypatch.setattr(storage, "apply_increments", links_unavailable)
+    with pytest.raises(RuntimeError):
+        run(_write_counts(storage, counts))
+    # Solo queda lo que no se escribió
+    assert counts == {TotalKey(("lk_1",)): 3}
+
+    monkeypatch.setattr(storage, "apply_increments", apply_increments)
+    assert run(_write_counts(storage, counts)) == 1
+    assert counts == {}
+    assert sum(doc["clicks"] for doc in run(storage.get_metric_docs("promo"))) == 3
+    assert sum(doc["topReferrers"]["(direct)"] for doc in run(storage.get_metric_docs("promo"))) == 3
+    assert run(storage.get_link("lk_1"))["totalClicks"] == 3
+
+
+def test_click_increments_trim_top_k_per_batch(monkeypatch):
+    monkeypatch.setattr(settings, "METRICS_TOPK_CAPACITY", 2)
+    events = [ClickEvent(slug="promo", referrer=f"https://{host}/") for host in ("a.com", "a.com", "b.com", "b.com", "c.com")]
+
+    increments = click_increments(events)
+
+    assert increments[("metrics", "promo#default")]["topReferrers"] == {"a.com": 2, "b.com": 2}
@@ -0,0 +1,77 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.http_cache import etag_for
+from app.db import dynamo
+from app.db.storage import MemoryBackend
+from app.main import app
+from app.services import link_service
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+@pytest.fixture
+def storage():
+    backend = MemoryBackend()
+    run(backend.create_link({
+        "linkId": "lk_1",
+        "slug": "promo",
+        "title": "Promo",
+        "destinationUrl": "https://example.com/",
+        "variants": ["default"],
+        "createdAt": "2025-03-01T00:00:00+00:00",
+    }))
+    backend.rollups["promo"] = {"clicks": 5, "byVariant": {"default": 5}, "seeded": True}
+    dynamo.set_storage(backend)
+    link_service.link_cache.clear()
+    link_service.link_slug_cache.clear()
+    yield backend
+    link_service.link_cache.clear()
+    link_service.link_slug_cache.clear()
+    dynamo.set_storage(None)
+
+
+@pytest.mark.parametrize("path", ["/links", "/links/lk_1", "/links/lk_1/metrics"])
+def test_get_returns_strong_etag_and_304_when_unchanged(storage, path):
+    client = TestClient(app)
+
+    first = client.get(path)
+    etag = first.headers["etag"]
+    assert first.status_code == 200
+    assert etag == etag_for(first.content)
+    assert first.headers["cache-control"] == "no-cache"
+
+    again = client.get(path, headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.content == b""
+    assert again.headers["etag"] == etag
+
+
+def test_metrics_etag_changes_with_clicks(storage):
+    client = TestClient(app)
+    etag = client.get("/links/lk_1/metrics").headers["etag"]
+
+    storage.rollups["promo"] = {"clicks": 6, "byVariant": {"default": 6}, "seeded": True}
+    res = client.get("/links/lk_1/metrics", headers={"If-None-Match": etag})
+
+    assert res.status_code == 200
+    assert res.json()["totals"]["clicks"] == 6
+    assert res.headers["etag"] != etag
+
+
+def test_if_none_match_lists_and_weak_tags(storage):
+    client = TestClient(app)
+    etag = client.get("/links/lk_1").headers["etag"]
+
+    assert client.get("/links/lk_1", headers={"If-None-Match": f'"otro", W/{etag}'}).status_code == 304
+    assert client.get("/links/lk_1", headers={"If-None-Match": '"otro"'}).status_code == 200
+
+
+def test_get_link_still_filtered_by_response_model(storage):
+    body = TestClient(app).get("/links/lk_1").json()
+
+    assert set(body) == {"linkId", "slug", "title", "destinationUrl", "variants", "createdAt"}
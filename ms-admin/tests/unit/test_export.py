@@ -0,0 +1,89 @@
+import asyncio
+import csv
+import io
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.db import dynamo
+from app.db.storage import MemoryBackend
+from app.main import app
+
+
+def link_doc(link_id, slug, variants=("default",)):
+    return {
+        "linkId": link_id,
+        "slug": slug,
+        "title": slug.title(),
+        "destinationUrl": "https://example.com/",
+        "variants": list(variants),
+        "enabled": True,
+        "createdAt": "2025-10-22T12:00:00+00:00",
+    }
+
+
+@pytest.fixture
+def client():
+    backend = MemoryBackend()
+    # "promo" es prefijo de "promo-2": el merge no debe mezclar sus métricas
+    asyncio.run(backend.create_link(link_doc("lk_b", "promo", ["default", "ig"])))
+    asyncio.run(backend.create_link(link_doc("lk_a", "promo-2")))
+    asyncio.run(backend.create_link(link_doc("lk_c", "zeta")))
+    backend.metrics.update({
+        "borrado#default": {"clicks": 100},  # huérfano: su link ya no existe
+        "promo#default": {"clicks": 3, "byCountry": {"CO": 3}},
+        "promo#ig": {"clicks": 2, "byDevice": {"mobile": 2}},
+        "promo-2#default": {"clicks": 7},
+    })
+    dynamo.set_storage(backend)
+    yield TestClient(app)
+    dynamo.set_storage(None)
+
+
+def test_export_ndjson_merges_links_and_metrics(client):
+    response = client.get("/links/export")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [r["slug"] for r in rows] == ["promo", "promo-2", "zeta"]
+    assert rows[0]["clicks"] == 5
+    assert rows[0]["byVariant"] == {"default": 3, "ig": 2}
+    assert rows[1]["clicks"] == 7
+    assert rows[2]["clicks"] == 0
+
+
+def test_export_csv(client):
+    response = client.get("/links/export", params={"format": "csv"})
+
+    assert response.status_code == 200
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [r["linkId"] for r in rows] == ["lk_b", "lk_a", "lk_c"]
+    assert rows[0]["clicks"] == "5"
+    assert json.loads(rows[0]["byCountry"]) == {"CO": 3}
+
+
+def test_export_rejects_unknown_format(client):
+    assert client.get("/links/export", params={"format": "xml"}).status_code == 422
+
+
+def test_export_legacy_slugs_do_not_mix_metrics():
+    backend = MemoryBackend()
+    # Slugs heredados: "a!b" ordena después de "a" pero sus métricas antes de "a#..."; y
+    # las de "a#x" caen dentro del rango de "a"
+    for link_id, slug in (("lk_1", "a"), ("lk_2", "a!b"), ("lk_3", "a#x")):
+        asyncio.run(backend.create_link(link_doc(link_id, slug)))
+    backend.metrics.update({
+        "a!b#default": {"clicks": 5},
+        "a#default": {"clicks": 1},
+        "a#x#default": {"clicks": 20},
+    })
+    dynamo.set_storage(backend)
+    try:
+        lines = TestClient(app).get("/links/export").text.splitlines()
+    finally:
+        dynamo.set_storage(None)
+
+    clicks = {row["slug"]: row["clicks"] for row in map(json.loads, lines)}
+    assert clicks == {"a": 1, "a!b": 5, "a#x": 20}
@@ -0,0 +1,275 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from google.api_core.exceptions import AlreadyExists, NotFound, ServiceUnavailable
+from google.rpc import code_pb2
+
+from app.db.firestore_backend import FirestoreBackend
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+@pytest.fixture
+def db():
+    """Cliente Firestore simulado: una referencia por (colección, id) y un batch."""
+    refs = {}
+
+    def collection(name):
+        col = MagicMock()
+        col.document.side_effect = lambda doc_id: refs.setdefault(
+            (name, doc_id),
+            MagicMock(create=AsyncMock(return_value=MagicMock(update_time="t1")), delete=AsyncMock()),
+        )
+        return col
+
+    client = MagicMock()
+    client.collection.side_effect = collection
+    client.batch.return_value = MagicMock(commit=AsyncMock())
+    client.write_option.side_effect = lambda **kwargs: ("option", kwargs)
+    client.refs = refs
+    return client
+
+
+LINK = {"linkId": "lk_1", "slug": "promo"}
+
+
+def test_create_link_reserves_slug_then_writes_batch(db):
+    run(FirestoreBackend(db).create_link(LINK))
+
+    slug_ref = db.refs[("slugs", "promo")]
+    slug_ref.create.assert_awaited_once_with({"linkId": "lk_1"})
+    batch = db.batch.return_value
+    batch.set.assert_called_once_with(db.refs[("links", "lk_1")], LINK)
+    batch.update.assert_called_once_with(
+        slug_ref, {"linkId": "lk_1"}, option=("option", {"last_update_time": "t1"})
+    )
+    batch.commit.assert_awaited_once()
+    slug_ref.delete.assert_not_awaited()
+
+
+def test_create_link_existing_slug_raises_already_exists(db):
+    backend = FirestoreBackend(db)
+    backend.slugs.document("promo").create.side_effect = AlreadyExists("exists")
+
+    with pytest.raises(AlreadyExists, match="El slug ya existe"):
+        run(backend.create_link(LINK))
+    db.batch.return_value.commit.assert_not_awaited()
+
+
+def test_create_link_releases_slug_when_batch_fails(db):
+    db.batch.return_value.commit.side_effect = ServiceUnavailable("down")
+
+    with pytest.raises(ServiceUnavailable):
+        run(FirestoreBackend(db).create_link(LINK))
+
+    db.refs[("slugs", "promo")].delete.assert_awaited_once_with(option=("option", {"last_update_time": "t1"}))
+
+
+def _aggregation(**values):
+    query = MagicMock()
+    query.count.return_value = query
+    query.sum.return_value = query
+    query.get = AsyncMock(return_value=[[MagicMock(alias=alias, value=value) for alias, value in values.items()]])
+    return query
+
+
+def test_click_totals_use_aggregation_queries(db):
+    backend = FirestoreBackend(db)
+    # "viejo" tiene un rollup creado por incrementos tras el despliegue, aún sin sembrar
+    rollups = {
+        "promo": _aggregation(clicks=7), "nuevo": _aggregation(clicks=None), "viejo": _aggregation(clicks=1),
+    }
+    metrics = {"nuevo": _aggregation(clicks=3), "viejo": _aggregation(clicks=41)}
+    seeded = {"promo": {"seeded": True}, "nuevo": None, "viejo": {"clicks": 1}}
+    for slug, data in seeded.items():
+        db.refs[("metrics_rollups", slug)] = MagicMock(get=AsyncMock(return_value=MagicMock(to_dict=lambda data=data: data)))
+    backend._rollup_shards_query = lambda slug: rollups[slug]
+    backend._metric_docs_query = lambda slug: metrics[slug]
+
+    assert run(backend.get_click_totals(["promo", "nuevo", "viejo"])) == {"promo": 7, "nuevo": 3, "viejo": 41}
+    rollups["promo"].sum.assert_called_once_with("clicks", alias="clicks")
+    # Con rollup sembrado no se consultan los documentos de variantes
+    assert "promo" not in metrics
+
+
+def test_watch_links_translates_snapshot_changes(db):
+    from datetime import datetime, timezone
+    from google.cloud.firestore_v1.watch import ChangeType
+
+    callbacks = {}
+    refs = {}
+
+    def collection(name):
+        def on_snapshot(callback):
+            callbacks[name] = callback
+            return MagicMock(is_active=True)
+        refs[name] = MagicMock(on_snapshot=on_snapshot)
+        return MagicMock(on_snapshot=on_snapshot, document=lambda doc_id: refs[name])
+
+    listen_db = MagicMock()
+    listen_db.collection.side_effect = collection
+    received = []
+    watch = FirestoreBackend(db, listen_db=lambda: listen_db).watch_links(
+        lambda *args: received.append(args)
+    )
+
+    read_time = datetime(2025, 3, 1, tzinfo=timezone.utc)
+    added = MagicMock(type=ChangeType.ADDED, document=MagicMock(id="lk_1", to_dict=lambda: {"slug": "promo"}))
+    removed = MagicMock(type=ChangeType.REMOVED, document=MagicMock(id="lk_2"))
+    callbacks["links"]([], [added, removed], read_time)
+    watch.heartbeat()
+    callbacks["link_mirror_heartbeats"]([], [MagicMock()], read_time)
+
+    assert received == [
+        ("links", [("lk_1", {"slug": "promo"}), ("lk_2", None)], read_time),
+        ("heartbeat", [], read_time),
+    ]
+    assert set(callbacks) == {"links", "slugs", "link_mirror_heartbeats"}
+    (beat,), _ = refs["link_mirror_heartbeats"].set.call_args
+    assert "at" in beat and "expireAt" in beat
+    assert watch.is_active
+
+
+def test_watch_links_needs_listen_client(db):
+    assert FirestoreBackend(db).watch_links(lambda *args: None) is None
+
+
+def test_trim_heavy_hitters_rewrites_only_oversized_summaries(db, monkeypatch):
+    from google.cloud.firestore_v1.async_transaction import AsyncTransaction
+
+    from app.db import firestore_backend
+
+    docs = [
+        MagicMock(id="promo#default", to_dict=lambda: {"topReferrers": {"a.com": 5, "b.com": 1, "c.com": 3}}),
+        MagicMock(id="promo#ig", to_dict=lambda: {"topReferrers": {"a.com": 1}, "topUserAgents": {}}),
+    ]
+
+    async def stream(transaction=None):
+        assert transaction is txn
+        for doc in docs:
+            yield doc
+
+    backend = FirestoreBackend(db)
+    monkeypatch.setattr(backend, "_metric_docs_query", lambda slug: MagicMock(
+        select=lambda fields: MagicMock(stream=stream) if set(fields) == {"topReferrers", "topUserAgents"} else None
+    ))
+    txn = AsyncTransaction(db)
+    txn.update = MagicMock()
+    db.transaction.return_value = txn
+    # Sin begin/commit reales: solo se ejecuta la función con la transacción
+    monkeypatch.setattr(firestore_backend.firestore, "async_transactional", lambda fn: fn)
+
+    assert run(backend.trim_heavy_hitters("promo", capacity=2)) == 1
+    txn.update.assert_called_once_with(docs[0].reference, {"topReferrers": {"a.com": 5, "c.com": 3}})
+
+
+def test_apply_increments_adds_total_clicks_without_creating_links(db):
+    backend = FirestoreBackend(db)
+    db.refs[("links", "lk_1")] = MagicMock(update=AsyncMock())
+    db.refs[("links", "lk_borrado")] = MagicMock(update=AsyncMock(side_effect=NotFound("borrado")))
+
+    written = run(backend.apply_increments({
+        ("metrics", "promo#default"): {"clicks": 2},
+        ("links", "lk_1"): {"totalClicks": 2},
+        ("links", "lk_borrado"): {"totalClicks": 1},
+    }))
+
+    assert written == 3
+    (ref, _), kwargs = db.batch.return_value.set.call_args
+    assert ref is db.refs[("metrics", "promo#default")] and kwargs == {"merge": True}
+    db.batch.return_value.set.assert_called_once()
+    (update,), _ = db.refs[("links", "lk_1")].update.call_args
+    assert update["totalClicks"].value == 2
+
+
+class FakeBulk:
+    """BatchWrite simulado: reserva en `slugs` y falla entero a partir del commit número `fail_from`."""
+
+    commits = 0
+    fail_from = None
+
+    def __init__(self, slugs):
+        self.slugs = slugs
+        self.creates = []
+
+    def create(self, ref, data):
+        self.creates.append((ref.doc_id, data))
+
+    async def commit(self):
+        FakeBulk.commits += 1
+        if FakeBulk.fail_from is not None and FakeBulk.commits >= FakeBulk.fail_from:
+            # La RPC falla después de aplicar las escrituras (el cliente no lo sabe)
+            for slug, data in self.creates:
+                self.slugs.setdefault(slug, data)
+            raise ServiceUnavailable("batch_write")
+        status = []
+        for slug, data in self.creates:
+            taken = slug in self.slugs
+            self.slugs.setdefault(slug, data)
+            status.append(MagicMock(code=code_pb2.ALREADY_EXISTS if taken else code_pb2.OK))
+        return MagicMock(status=status)
+
+
+@pytest.fixture
+def bulk_db(monkeypatch):
+    """Cliente con slugs en un dict: get() y delete() con precondición sobre ellos."""
+    from app.db import firestore_backend
+
+    slugs = {"tomado": {"linkId": "lk_otro"}}
+    links = {}
+    broken = set()  # slugs cuya lectura falla al liberarlos
+
+    def slug_ref(slug):
+        async def get():
+            if slug in broken:
+                raise ServiceUnavailable("get")
+            return MagicMock(exists=slug in slugs, to_dict=lambda: slugs.get(slug), update_time="t1")
+
+        async def delete(option=None):
+            assert option == ("option", {"last_update_time": "t1"})
+            slugs.pop(slug, None)
+
+        return MagicMock(doc_id=slug, get=get, delete=delete)
+
+    client = MagicMock()
+    client.collection.side_effect = lambda name: MagicMock(
+        document=slug_ref if name == "slugs" else (lambda doc_id: MagicMock(doc_id=doc_id))
+    )
+    batch = MagicMock()
+    batch.set.side_effect = lambda ref, data: links.__setitem__(ref.doc_id, data)
+    client.batch.return_value = batch
+    batch.commit = AsyncMock()
+    client.write_option.side_effect = lambda **kwargs: ("option", kwargs)
+    FakeBulk.commits, FakeBulk.fail_from = 0, None
+    monkeypatch.setattr(firestore_backend, "_AsyncBulkWriteBatch", lambda db: FakeBulk(slugs))
+    monkeypatch.setattr(firestore_backend, "_MAX_BATCH_WRITES", 2)
+    return client, slugs, links, broken
+
+
+DOCS = [{"linkId": f"lk_{i}", "slug": f"s-{i}"} for i in range(4)] + [{"linkId": "lk_4", "slug": "tomado"}]
+
+
+def test_create_links_releases_earlier_reservations_when_a_chunk_rpc_fails(bulk_db):
+    client, slugs, links, _ = bulk_db
+    FakeBulk.fail_from = 2  # el segundo BatchWrite de reservas falla
+
+    statuses = run(FirestoreBackend(client).create_links(DOCS))
+
+    assert statuses == ["error"] * 5
+    assert slugs == {"tomado": {"linkId": "lk_otro"}}
+    assert links == {}
+
+
+def test_create_links_releases_slugs_when_link_batch_fails_and_cleanup_errors(bulk_db):
+    client, slugs, links, broken = bulk_db
+    client.batch.return_value.commit = AsyncMock(side_effect=[None, ServiceUnavailable("commit")])
+    broken.add("s-3")
+
+    statuses = run(FirestoreBackend(client).create_links(DOCS))
+
+    assert statuses == ["created", "created", "error", "error", "conflict"]
+    # s-2 se libera; la limpieza fallida de s-3 se registra sin propagar el error
+    assert sorted(slugs) == ["s-0", "s-1", "s-3", "tomado"]
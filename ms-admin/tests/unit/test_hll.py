@@ -0,0 +1,36 @@
+from app.services.hll import HLL_REGISTERS, hll_estimate, hll_register, merge_hll
+
+
+def sketch(visitors):
+    registers = {}
+    for visitor in visitors:
+        index, rank = hll_register(visitor)
+        merge_hll(registers, {index: rank})
+    return registers
+
+
+def test_register_is_deterministic_and_in_range():
+    index, rank = hll_register("visitante-1")
+
+    assert (index, rank) == hll_register("visitante-1")
+    assert 0 <= int(index) < HLL_REGISTERS
+    assert rank >= 1
+
+
+def test_estimate_small_and_large_cardinalities():
+    assert hll_estimate({}) == 0
+    assert hll_estimate(sketch(["v1", "v1", "v1"])) == 1
+    assert abs(hll_estimate(sketch(f"v{i}" for i in range(50))) - 50) <= 2
+
+    estimate = hll_estimate(sketch(f"v{i}" for i in range(100_000)))
+    # Error típico ~3,2 % con 1024 registros; 4 desviaciones de margen
+    assert abs(estimate - 100_000) < 13_000
+
+
+def test_merge_is_a_union():
+    a = sketch(f"v{i}" for i in range(0, 3000))
+    b = sketch(f"v{i}" for i in range(2000, 5000))
+    merge_hll(a, b)
+
+    assert a == sketch(f"v{i}" for i in range(5000))
+    assert len(a) <= HLL_REGISTERS
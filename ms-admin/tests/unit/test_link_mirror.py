@@ -0,0 +1,240 @@
+import asyncio
+import threading
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.db import dynamo
+from app.db.storage import MemoryBackend
+from app.main import app
+from app.services import link_service
+from app.services.link_mirror import LinkMirror
+
+
+class FakeWatch:
+    is_active = True
+    heartbeats = 0
+
+    def heartbeat(self):
+        self.heartbeats += 1
+
+    def stop(self):
+        self.is_active = False
+
+
+class WatchedBackend(MemoryBackend):
+    """Motor en memoria con un listener simulado; cuenta las lecturas de links."""
+
+    def __init__(self):
+        super().__init__()
+        self.on_change = None
+        self.watch = FakeWatch()
+        self.reads = 0
+
+    def watch_links(self, on_change):
+        self.on_change = on_change
+        return self.watch
+
+    async def get_link(self, link_id):
+        self.reads += 1
+        return await super().get_link(link_id)
+
+    async def list_links(self, *args, **kwargs):
+        self.reads += 1
+        return await super().list_links(*args, **kwargs)
+
+    async def get_slug(self, slug):
+        self.reads += 1
+        return await super().get_slug(slug)
+
+    def push(self, collection, changes, lag_seconds=0.0):
+        """Entrega cambios desde otro hilo, como el listener de Firestore."""
+        read_time = datetime.now(timezone.utc) - timedelta(seconds=lag_seconds)
+        thread = threading.Thread(target=self.on_change, args=(collection, changes, read_time))
+        thread.start()
+        thread.join()
+
+
+LINKS = [
+    ("lk_01", {"slug": "promo", "title": "Promo verano", "enabled": True, "createdAt": "2025-01-01T00:00:00+00:00"}),
+    ("lk_02", {"slug": "evento", "title": "Evento anual", "enabled": True, "createdAt": "2025-02-01T00:00:00+00:00"}),
+]
+SLUGS = [("promo", {"linkId": "lk_01"}), ("evento", {"linkId": "lk_02"})]
+
+
+@pytest.fixture
+def storage(monkeypatch):
+    backend = WatchedBackend()
+    dynamo.set_storage(backend)
+    monkeypatch.setattr(link_service, "search_index", None)
+    link_service.link_cache.clear()
+    yield backend
+    link_service.stop_link_mirror()
+    link_service.link_cache.clear()
+    dynamo.set_storage(None)
+
+
+async def start_synced(storage, lag_seconds=0.0):
+    await link_service.start_link_mirror()
+    storage.push("links", LINKS, lag_seconds)
+    storage.push("slugs", SLUGS, lag_seconds)
+    await asyncio.sleep(0)  # aplica los cambios encolados en el event loop
+
+
+def test_reads_served_from_synced_mirror(storage):
+    async def scenario():
+        await start_synced(storage)
+        link = await link_service.get_link_by_id("lk_02")
+        page = await link_service.list_links(limit=1)
+        available = await link_service.check_slug_available("promo")
+        return link, page, available
+
+    link, page, available = asyncio.run(scenario())
+
+    assert link["slug"] == "evento"
+    assert [item["linkId"] for item in page["items"]] == ["lk_02"]
+    assert page["nextCursor"] is not None
+    assert available == {"slug": "promo", "available": False}
+    assert storage.reads == 0
+
+
+def test_mirror_pages_newest_by_creation(storage):
+    async def scenario():
+        await start_synced(storage)
+        # ID legado: por texto iría primero, pero es el más antiguo
+        storage.push("links", [("lk_ffffffff", {"slug": "viejo", "createdAt": "2024-01-01T00:00:00+00:00"})])
+        await asyncio.sleep(0)
+        seen, cursor = [], None
+        while True:
+            page = await link_service.list_links(limit=1, cursor=cursor)
+            seen += [item["linkId"] for item in page["items"]]
+            cursor = page["nextCursor"]
+            if cursor is None:
+                return seen
+
+    assert asyncio.run(scenario()) == ["lk_02", "lk_01", "lk_ffffffff"]
+    assert storage.reads == 0
+
+
+def test_stale_or_partial_mirror_falls_back_to_storage(storage):
+    asyncio.run(storage.create_link({"linkId": "lk_01", "slug": "promo"}))
+
+    async def scenario():
+        await link_service.start_link_mirror()
+        storage.push("links", LINKS)
+        await asyncio.sleep(0)
+        await link_service.get_link_by_id("lk_01")  # falta la colección de slugs
+        storage.push("slugs", SLUGS, lag_seconds=60)
+        await asyncio.sleep(0)
+        link_service.link_cache.clear()
+        await link_service.get_link_by_id("lk_01")  # retraso mayor al permitido
+
+    asyncio.run(scenario())
+
+    assert storage.reads == 2
+    assert link_service.link_mirror.stats()["staleReads"] == 2
+
+
+def test_inactive_listener_falls_back_to_storage(storage):
+    asyncio.run(storage.create_link({"linkId": "lk_01", "slug": "promo"}))
+
+    async def scenario():
+        await start_synced(storage)
+        storage.watch.is_active = False
+        return await link_service.get_link_by_id("lk_01")
+
+    assert asyncio.run(scenario())["slug"] == "promo"
+    assert storage.reads == 1
+
+
+def test_stalled_listener_goes_stale_until_next_heartbeat(storage):
+    now = [1000.0]
+
+    async def scenario():
+        mirror = LinkMirror(max_lag=5.0, clock=lambda: now[0])
+        mirror.start(storage, asyncio.get_running_loop())
+        storage.push("links", LINKS)
+        storage.push("slugs", SLUGS)
+        await asyncio.sleep(0)
+        fresh = mirror.is_fresh()
+        # El listener sigue "activo" pero no entrega nada
+        now[0] += 6
+        stalled = mirror.is_fresh()
+        storage.push("heartbeat", [])
+        await asyncio.sleep(0)
+        return fresh, stalled, mirror.is_fresh(), mirror.stats()
+
+    fresh, stalled, recovered, stats = asyncio.run(scenario())
+
+    assert (fresh, stalled, recovered) == (True, False, True)
+    assert storage.watch.is_active
+    assert stats["links"] == 2 and stats["secondsSinceLastCallback"] == 0
+
+
+def test_mirror_writes_heartbeats(storage):
+    async def scenario():
+        mirror = LinkMirror(max_lag=5.0, heartbeat_interval=0.01)
+        mirror.start(storage, asyncio.get_running_loop())
+        await asyncio.sleep(0.05)
+        mirror.stop()
+
+    asyncio.run(scenario())
+
+    assert storage.watch.heartbeats >= 2
+
+
+def test_mirrored_changes_update_search_index(storage, monkeypatch):
+    monkeypatch.setattr(link_service, "search_index", link_service.LinkSearchIndex())
+
+    async def scenario():
+        await start_synced(storage)
+        # Cambios hechos desde otra instancia
+        storage.push("links", [("lk_01", {"slug": "promo", "title": "Liquidación"}), ("lk_02", None)])
+        await asyncio.sleep(0)
+        return (
+            await link_service.search_links("liquidacion"),
+            await link_service.search_links("evento"),
+        )
+
+    found, gone = asyncio.run(scenario())
+
+    assert [item["linkId"] for item in found["items"]] == ["lk_01"]
+    assert gone["total"] == 0
+
+
+def test_local_writes_visible_before_listener(storage):
+    client = TestClient(app)
+
+    async def scenario():
+        await start_synced(storage)
+
+    asyncio.run(scenario())
+    created = client.post("/links", json={"title": "Nuevo", "slug": "nuevo", "destinationUrl": "https://x.com"})
+    link_id = created.json()["linkId"]
+    storage.reads = 0
+
+    assert link_id in [item["linkId"] for item in client.get("/links").json()["items"]]
+    assert client.get("/slugs/nuevo/available").json()["available"] is False
+    assert client.delete(f"/links/{link_id}").status_code == 204
+    assert link_id not in [item["linkId"] for item in client.get("/links").json()["items"]]
+    assert storage.reads == 0
+
+
+def test_health_stats_reports_mirror_size_and_lag(storage):
+    asyncio.run(start_synced(storage, lag_seconds=0.5))
+
+    stats = TestClient(app).get("/health/stats").json()["linkMirror"]
+
+    assert stats["links"] == 2 and stats["slugs"] == 2
+    assert stats["synced"] is True and stats["active"] is True
+    assert 0.5 <= stats["lagSeconds"] < 5
+
+
+def test_backend_without_watch_keeps_mirror_off():
+    dynamo.set_storage(MemoryBackend())
+    try:
+        asyncio.run(link_service.start_link_mirror())
+        assert link_service.link_mirror is None
+    finally:
+        dynamo.set_storage(None)
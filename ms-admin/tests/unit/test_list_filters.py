@@ -0,0 +1,142 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.db import dynamo
+from app.db.sqlite_backend import SQLiteBackend
+from app.db.storage import MemoryBackend
+from app.main import app
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+BASE = datetime(2025, 3, 1, tzinfo=timezone.utc)
+
+
+def link_doc(n, enabled=True, total_clicks=0):
+    return {
+        "linkId": f"lk_{n:02d}",
+        "slug": f"link-{n:02d}",
+        "variants": ["default"],
+        "enabled": enabled,
+        "totalClicks": total_clicks,
+        "createdAt": (BASE + timedelta(days=n)).isoformat(),
+    }
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def storage(request, tmp_path):
+    if request.param == "memory":
+        backend = MemoryBackend()
+    else:
+        backend = SQLiteBackend(str(tmp_path / "linkly.db"))
+    # lk_00..lk_05: los impares deshabilitados; clics 0, 10, 20, 10, 40, 50
+    for n, clicks in enumerate([0, 10, 20, 10, 40, 50]):
+        run(backend.create_link(link_doc(n, enabled=n % 2 == 0, total_clicks=clicks)))
+    yield backend
+    run(backend.close())
+
+
+@pytest.fixture
+def client(storage):
+    dynamo.set_storage(storage)
+    yield TestClient(app)
+    dynamo.set_storage(None)
+
+
+def ids(items):
+    return [item["linkId"] for item in items]
+
+
+def test_storage_filters_enabled_and_created_after(storage):
+    assert ids(run(storage.list_links(enabled=False))) == ["lk_05", "lk_03", "lk_01"]
+
+    created_after = (BASE + timedelta(days=2)).isoformat()
+    items = run(storage.list_links(enabled=True, created_after=created_after, order_by="createdAt"))
+    assert ids(items) == ["lk_04", "lk_02"]
+
+
+def test_storage_orders_by_total_clicks_with_keyset(storage):
+    first = run(storage.list_links(limit=3, order_by="totalClicks"))
+    assert ids(first) == ["lk_05", "lk_04", "lk_02"]
+
+    # Empate en 10 clics: desempata el linkId descendente
+    rest = run(storage.list_links(order_by="totalClicks", start_after="lk_02", start_after_value=20))
+    assert ids(rest) == ["lk_03", "lk_01", "lk_00"]
+
+
+def test_storage_order_skips_links_without_field(storage):
+    run(storage.create_link({"linkId": "lk_99", "slug": "viejo", "variants": ["default"]}))
+
+    assert "lk_99" not in ids(run(storage.list_links(order_by="totalClicks")))
+    assert ids(run(storage.list_links(limit=1))) == ["lk_99"]
+
+
+def test_storage_set_total_clicks(storage):
+    run(storage.set_total_clicks("lk_00", 99))
+    run(storage.set_total_clicks("lk_inexistente", 5))
+
+    assert ids(run(storage.list_links(limit=1, order_by="totalClicks"))) == ["lk_00"]
+
+
+def test_list_sorted_by_clicks_paginates_with_cursor(client):
+    first = client.get("/links?sort=clicks&limit=2").json()
+    assert ids(first["items"]) == ["lk_05", "lk_04"]
+
+    second = client.get(f"/links?sort=clicks&limit=2&cursor={first['nextCursor']}").json()
+    assert ids(second["items"]) == ["lk_02", "lk_03"]
+
+    third = client.get(f"/links?sort=clicks&limit=2&cursor={second['nextCursor']}").json()
+    assert ids(third["items"]) == ["lk_01", "lk_00"]
+    assert third["nextCursor"] is None
+
+
+def test_list_filters_enabled_and_created_after(client):
+    res = client.get("/links?enabled=true&createdAfter=2025-03-03")
+    assert ids(res.json()["items"]) == ["lk_04", "lk_02"]
+
+    page = client.get("/links?enabled=true&createdAfter=2025-03-01&limit=2").json()
+    rest = client.get(f"/links?enabled=true&createdAfter=2025-03-01&limit=2&cursor={page['nextCursor']}").json()
+    assert ids(page["items"] + rest["items"]) == ["lk_04", "lk_02", "lk_00"]
+
+
+def test_list_rejects_clicks_with_created_after(client):
+    res = client.get("/links?sort=clicks&createdAfter=2025-03-01")
+    assert res.status_code == 400
+
+
+def test_list_rejects_invalid_created_after(client):
+    assert client.get("/links?createdAfter=ayer").status_code == 400
+
+
+def test_list_rejects_cursor_from_other_order(client):
+    page = client.get("/links?limit=1").json()
+
+    res = client.get(f"/links?sort=clicks&cursor={page['nextCursor']}")
+    assert res.status_code == 400
+
+
+def test_newest_orders_legacy_and_ulid_ids_by_creation(storage, client):
+    # Los IDs legados lk_<8 hex> ordenan después de todos los ULID "lk_01..." por texto
+    legacy = [("lk_9f3a0c1e", "2024-05-01"), ("lk_0a1b2c3d", "2024-06-01")]
+    ulids = [("lk_01JB2Q7M3ZK9X4T6W8Y0C5N1PR", "2026-01-01"), ("lk_01JB2Q7M40A1B2C3D4E5F6G7HJ", "2026-01-02")]
+    for link_id, day in legacy + ulids:
+        run(storage.create_link({**link_doc(0), "linkId": link_id, "slug": link_id.replace("_", "-"), "createdAt": f"{day}T00:00:00+00:00"}))
+
+    seen, cursor = [], None
+    while True:
+        page = client.get("/links", params={"limit": 3, **({"cursor": cursor} if cursor else {})}).json()
+        seen += ids(page["items"])
+        cursor = page["nextCursor"]
+        if cursor is None:
+            break
+
+    assert seen == [
+        "lk_01JB2Q7M40A1B2C3D4E5F6G7HJ", "lk_01JB2Q7M3ZK9X4T6W8Y0C5N1PR",
+        "lk_05", "lk_04", "lk_03", "lk_02", "lk_01", "lk_00",
+        "lk_0a1b2c3d", "lk_9f3a0c1e",
+    ]
@@ -0,0 +1,68 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.db import dynamo
+from app.db.sqlite_backend import SQLiteBackend
+from app.db.storage import MemoryBackend
+from app.main import app
+from app.services import link_service
+
+
+def seed(backend):
+    for link_id, slug in [("lk_1", "promo"), ("lk_2", "promo-2"), ("lk_3", "evento")]:
+        asyncio.run(backend.create_link({"linkId": link_id, "slug": slug, "variants": ["default"]}))
+
+
+@pytest.fixture
+def client():
+    backend = MemoryBackend()
+    seed(backend)
+    backend.metrics.update({
+        "promo#default": {"clicks": 3, "byCountry": {"CO": 3}},
+        "promo#ig": {"clicks": 2},
+        "promo-2#default": {"clicks": 7},
+    })
+    dynamo.set_storage(backend)
+    link_service.link_cache.clear()
+    yield TestClient(app)
+    link_service.link_cache.clear()
+    dynamo.set_storage(None)
+
+
+def test_metrics_by_link_ids(client):
+    response = client.get("/metrics", params={"linkIds": "lk_2,lk_1,lk_nope", "fields": "byVariant"})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert [(i["linkId"], i["totals"]["clicks"]) for i in body["items"]] == [("lk_2", 7), ("lk_1", 5)]
+    assert body["items"][1]["totals"]["byVariant"] == {"default": 3, "ig": 2}
+    assert body["missing"] == ["lk_nope"]
+
+
+def test_metrics_by_slugs(client):
+    body = client.get("/metrics", params={"slugs": "evento,promo,nada"}).json()
+
+    assert [(i["slug"], i["totals"]["clicks"]) for i in body["items"]] == [("evento", 0), ("promo", 5)]
+    assert body["missing"] == ["nada"]
+
+
+def test_metrics_requires_exactly_one_selector(client):
+    assert client.get("/metrics").status_code == 400
+    assert client.get("/metrics", params={"linkIds": "lk_1", "slugs": "promo"}).status_code == 400
+
+
+def test_sqlite_metric_docs_for_slugs_single_query(tmp_path):
+    backend = SQLiteBackend(str(tmp_path / "m.db"))
+    backend.conn.executemany(
+        "INSERT INTO metrics (doc_id, data) VALUES (?, ?)",
+        [("a#default", '{"clicks": 1}'), ("a-b#x", '{"clicks": 2}'), ("c#default", '{"clicks": 3}')],
+    )
+
+    docs = asyncio.run(backend.get_metric_docs_for_slugs(["a", "c", "z"]))
+
+    assert {slug: [d["doc_id"] for d in items] for slug, items in docs.items()} == {
+        "a": ["a#default"], "c": ["c#default"], "z": [],
+    }
+    asyncio.run(backend.close())
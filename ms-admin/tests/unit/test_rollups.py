@@ -0,0 +1,185 @@
+import asyncio
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.db import dynamo
+from app.db.sqlite_backend import SQLiteBackend
+from app.db.storage import MemoryBackend
+from app.main import app
+from app.services import link_service
+from app.services.link_service import rollup_from_metric_items
+from app.services.rollup_service import reconcile_rollups
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def storage(request, tmp_path):
+    if request.param == "memory":
+        backend = MemoryBackend()
+    else:
+        backend = SQLiteBackend(str(tmp_path / "linkly.db"))
+    dynamo.set_storage(backend)
+    link_service.link_cache.clear()
+    yield backend
+    link_service.link_cache.clear()
+    dynamo.set_storage(None)
+    run(backend.close())
+
+
+def put_metric(backend, doc_id, data):
+    if isinstance(backend, MemoryBackend):
+        backend.metrics[doc_id] = data
+    else:
+        backend.conn.execute("INSERT OR REPLACE INTO metrics (doc_id, data) VALUES (?, ?)", (doc_id, json.dumps(data)))
+
+
+def seed(backend):
+    run(backend.create_link({"linkId": "lk_1", "slug": "promo", "variants": ["default", "ig"]}))
+    put_metric(backend, "promo#default", {"clicks": 3, "byCountry": {"CO": 3}, "byDevice": {"mobile": 3}})
+    put_metric(backend, "promo#ig", {"clicks": 2, "byCountry": {"US": 2}, "byDevice": {"desktop": 2}})
+
+
+def test_rebuild_rollup_aggregates_variants(storage):
+    seed(storage)
+
+    previous, rollup = run(storage.rebuild_rollup("promo", rollup_from_metric_items))
+
+    assert previous is None
+    assert rollup == {
+        "clicks": 5, "byVariant": {"default": 3, "ig": 2},
+        "byDevice": {"mobile": 3, "desktop": 2}, "byCountry": {"CO": 3, "US": 2},
+    }
+    assert run(storage.get_rollup("promo")) == rollup
+    assert run(storage.get_rollups(["promo", "nada"])) == {"promo": rollup}
+
+
+def test_metrics_endpoint_reads_rollup(storage):
+    seed(storage)
+    run(storage.rebuild_rollup("promo", rollup_from_metric_items))
+    # Si el endpoint leyera las variantes vería 6 clics; el rollup manda
+    put_metric(storage, "promo#tw", {"clicks": 1})
+
+    totals = TestClient(app).get("/links/lk_1/metrics", params={"fields": "byVariant,byDevice,byCountry"}).json()["totals"]
+
+    assert totals["clicks"] == 5
+    assert totals["byVariant"] == {"default": 3, "ig": 2}
+
+
+def test_metrics_endpoint_falls_back_without_rollup(storage):
+    seed(storage)
+
+    totals = TestClient(app).get("/links/lk_1/metrics", params={"fields": "byVariant,byDevice,byCountry"}).json()["totals"]
+
+    assert totals["clicks"] == 5
+    assert totals["byCountry"] == {"CO": 3, "US": 2}
+
+
+def test_unseeded_rollup_falls_back_until_reconciled(storage):
+    seed(storage)
+    # Primer clic tras desplegar: el incremento crea un rollup sin la historia del link
+    put_metric(storage, "promo#default", {"clicks": 4, "byCountry": {"CO": 4}, "byDevice": {"mobile": 4}})
+    run(storage.apply_increments({("rollups", "promo"): {"clicks": 1, "byVariant": {"default": 1}}}))
+
+    assert run(storage.get_rollup("promo")) is None
+    assert run(storage.get_click_totals(["promo"])) == {"promo": 6}
+    assert run(reconcile_rollups(["promo"]))["missing"] == 1
+    run(storage.apply_increments({("rollups", "promo"): {"clicks": 1}}))
+    assert run(storage.get_click_totals(["promo"])) == {"promo": 7}
+    assert run(storage.get_rollup("promo"))["clicks"] == 7
+
+
+def test_metrics_batch_mixes_rollups_and_fallback(storage):
+    seed(storage)
+    run(storage.create_link({"linkId": "lk_2", "slug": "evento", "variants": ["default"]}))
+    put_metric(storage, "evento#default", {"clicks": 4})
+    run(storage.rebuild_rollup("evento", rollup_from_metric_items))
+
+    body = TestClient(app).get("/metrics", params={"linkIds": "lk_1,lk_2"}).json()
+
+    assert [(i["slug"], i["totals"]["clicks"]) for i in body["items"]] == [("promo", 5), ("evento", 4)]
+
+
+def test_reconcile_rollups_repairs_drift(storage):
+    seed(storage)
+    run(storage.create_link({"linkId": "lk_2", "slug": "evento", "variants": ["default"]}))
+    run(storage.rebuild_rollup("promo", rollup_from_metric_items))
+    # Un incremento que llegó a la variante pero no al rollup
+    put_metric(storage, "promo#ig", {"clicks": 3, "byCountry": {"US": 3}, "byDevice": {"desktop": 3}})
+
+    summary = run(reconcile_rollups())
+
+    assert summary == {"checked": 2, "missing": 1, "drifted": 1, "totalClicks": 2}
+    assert run(storage.get_rollup("promo"))["byVariant"] == {"default": 3, "ig": 3}
+    assert run(storage.get_rollup("evento")) == {"clicks": 0, "byVariant": {}, "byDevice": {}, "byCountry": {}}
+    assert run(storage.get_link("lk_1"))["totalClicks"] == 6
+    assert run(reconcile_rollups(["promo"])) == {"checked": 1, "missing": 0, "drifted": 0, "totalClicks": 0}
+
+
+def test_reconcile_rollups_trims_top_k_summaries(storage, monkeypatch):
+    seed(storage)
+    monkeypatch.setattr(settings, "METRICS_TOPK_CAPACITY", 2)
+    put_metric(storage, "promo#ig", {"clicks": 2, "topReferrers": {"a.com": 1, "b.com": 4, "c.com": 2}})
+
+    run(reconcile_rollups(["promo"]))
+
+    docs = {doc["doc_id"]: doc for doc in run(storage.get_metric_docs("promo"))}
+    assert docs["promo#ig"]["topReferrers"] == {"b.com": 4, "c.com": 2}
+    assert docs["promo#ig"]["clicks"] == 2 and docs["promo#default"]["clicks"] == 3
+
+
+def test_metrics_sum_counter_shards(storage):
+    seed(storage)
+    put_metric(storage, "promo#ig#s1", {"clicks": 4, "byCountry": {"US": 1, "MX": 3}})
+    put_metric(storage, "promo#ig#s7", {"clicks": 1, "byDevice": {"mobile": 1}})
+
+    totals = TestClient(app).get("/links/lk_1/metrics", params={"fields": "byVariant,byDevice,byCountry"}).json()["totals"]
+
+    assert totals["clicks"] == 10
+    assert totals["byVariant"] == {"default": 3, "ig": 7}
+    assert totals["byCountry"] == {"CO": 3, "US": 3, "MX": 3}
+    assert totals["byDevice"] == {"mobile": 4, "desktop": 2}
+
+
+def test_rollup_shards_are_merged_and_collapsed_on_rebuild(storage):
+    seed(storage)
+    run(storage.rebuild_rollup("promo", rollup_from_metric_items))
+    put_metric(storage, "promo#ig#s1", {"clicks": 1, "byCountry": {"US": 1}})
+    # Lo que escribiría ms-redirect en el shard 1 del rollup
+    shard = {"clicks": 1, "byVariant": {"ig": 1}, "byCountry": {"US": 1}, "byDevice": {}}
+    if isinstance(storage, MemoryBackend):
+        storage.rollups["promo#s1"] = shard
+    else:
+        storage.conn.execute("INSERT INTO metrics_rollups (doc_id, data) VALUES (?, ?)", ("promo#s1", json.dumps(shard)))
+
+    assert run(storage.get_rollup("promo"))["byVariant"] == {"default": 3, "ig": 3}
+    assert run(storage.get_rollups(["promo"]))["promo"]["clicks"] == 6
+    assert run(reconcile_rollups(["promo"])) == {"checked": 1, "missing": 0, "drifted": 0, "totalClicks": 1}
+    assert run(storage.get_rollup("promo"))["clicks"] == 6
+
+
+def test_click_totals_without_breakdowns(storage):
+    seed(storage)
+    run(storage.create_link({"linkId": "lk_2", "slug": "evento", "variants": ["default"]}))
+    run(storage.rebuild_rollup("evento", rollup_from_metric_items))
+    put_metric(storage, "evento#default", {"clicks": 9})  # el rollup manda
+
+    assert run(storage.get_click_totals(["promo", "evento", "nada"])) == {"promo": 5, "evento": 0, "nada": 0}
+    assert TestClient(app).get("/links/lk_1/metrics").json()["totals"] == {
+        "clicks": 5, "uniques": 0, "topReferrers": [], "topUserAgents": [],
+    }
+
+    totals = TestClient(app).get("/links/lk_1/metrics", params={"fields": "byCountry"}).json()["totals"]
+    assert totals["byCountry"] == {"CO": 3, "US": 2}
+    assert "byVariant" not in totals
+
+
+def test_metrics_unknown_field_is_400(storage):
+    seed(storage)
+
+    assert TestClient(app).get("/links/lk_1/metrics", params={"fields": "byCity"}).status_code == 400
@@ -61,10 +61,41 @@ def test_create_link_endpoint(mock_create_link):
 
 
 def test_list_links_endpoint(mock_list_links):
-    mock_list_links.return_value = [{"linkId": "lk_123"}]
+    mock_list_links.return_value = {"items": [{"linkId": "lk_123"}], "nextCursor": None}
     response = client.get("/links")
     assert response.status_code == 200
-    assert response.json() == {"items": [{"linkId": "lk_123"}]}
+    assert response.json() == {"items": [{"linkId": "lk_123"}], "nextCursor": None}
+    mock_list_links.assert_called_once_with(
+        limit=None, cursor=None, enabled=None, created_after=None, sort="newest"
+    )
+
+
+def test_list_links_endpoint_passes_pagination(mock_list_links):
+    mock_list_links.return_value = {"items": [], "nextCursor": None}
+    response = client.get("/links?limit=10&cursor=abc")
+    assert response.status_code == 200
+    mock_list_links.assert_called_once_with(
+        limit=10, cursor="abc", enabled=None, created_after=None, sort="newest"
+    )
+
+
+def test_list_links_endpoint_passes_filters(mock_list_links):
+    mock_list_links.return_value = {"items": [], "nextCursor": None}
+    response = client.get("/links?enabled=true&createdAfter=2025-01-01&sort=clicks")
+    assert response.status_code == 200
+    mock_list_links.assert_called_once_with(
+        limit=None, cursor=None, enabled=True, created_after="2025-01-01", sort="clicks"
+    )
+
+
+def test_list_links_endpoint_rejects_unknown_sort(mock_list_links):
+    response = client.get("/links?sort=alfabetico")
+    assert response.status_code == 422
+
+
+def test_list_links_endpoint_rejects_limit_over_max(mock_list_links):
+    response = client.get("/links?limit=100000")
+    assert response.status_code == 422
 
 
 def test_get_link_endpoint_found(mock_get_item):
@@ -0,0 +1,81 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.db import dynamo
+from app.db.storage import MemoryBackend
+from app.main import app
+from app.services import link_service
+from app.services.search_index import LinkSearchIndex
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def link(link_id, slug, title):
+    return {"linkId": link_id, "slug": slug, "title": title}
+
+
+def test_search_ranks_exact_and_slug_matches_first():
+    index = LinkSearchIndex()
+    index.add(link("lk_1", "black-friday", "Ofertas de noviembre"))
+    index.add(link("lk_2", "promo-1", "Black Friday en la tienda"))
+    index.add(link("lk_3", "blackout", "Corte"))
+
+    assert [r["linkId"] for r in index.search("black", limit=10)[1]] == ["lk_1", "lk_2", "lk_3"]
+    assert [r["linkId"] for r in index.search("Bláck fri", limit=10)[1]] == ["lk_1", "lk_2"]
+    assert index.search("noviembre black", limit=10)[1][0]["linkId"] == "lk_1"
+    total, top = index.search("black", limit=1)
+    assert total == 3 and [r["linkId"] for r in top] == ["lk_1"]
+    assert index.search("inexistente", limit=10) == (0, [])
+    assert index.search("  ", limit=10) == (0, [])
+
+
+def test_search_index_remove_prunes_tokens():
+    index = LinkSearchIndex()
+    index.add(link("lk_1", "evento-2025", "Evento"))
+    index.add(link("lk_2", "eventos", "Otros eventos"))
+
+    index.remove("lk_2")
+
+    assert [r["linkId"] for r in index.search("even", limit=10)[1]] == ["lk_1"]
+    assert index.search("eventos", limit=10) == (0, [])
+    # Un término de una letra solo coincide con tokens exactos
+    assert index.search("e", limit=10) == (0, [])
+    assert index.stats() == {"links": 1, "tokens": 2}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    backend = MemoryBackend()
+    for i in range(5):
+        run(backend.create_link(link(f"lk_{i}", f"promo-{i}", f"Promo número {i}")))
+    dynamo.set_storage(backend)
+    monkeypatch.setattr(link_service, "search_index", None)
+    yield TestClient(app)
+    dynamo.set_storage(None)
+
+
+def test_search_endpoint_pages_and_follows_create_delete(client):
+    assert client.get("/links/search", params={"q": "promo"}).status_code == 503
+    run(link_service.rebuild_search_index())
+
+    first = client.get("/links/search", params={"q": "promo", "limit": 3}).json()
+    rest = client.get("/links/search", params={"q": "promo", "cursor": first["nextCursor"]}).json()
+    assert first["total"] == 5
+    assert [r["linkId"] for r in first["items"] + rest["items"]] == [f"lk_{i}" for i in reversed(range(5))]
+    assert rest["nextCursor"] is None
+
+    created = client.post("/links", json={"title": "Lanzamiento", "slug": "lanzamiento", "destinationUrl": "https://x.com"})
+    assert client.get("/links/search", params={"q": "lanza"}).json()["total"] == 1
+    client.delete(f"/links/{created.json()['linkId']}")
+    assert client.get("/links/search", params={"q": "lanza"}).json()["total"] == 0
+
+
+def test_search_endpoint_validation(client):
+    run(link_service.rebuild_search_index())
+
+    assert client.get("/links/search").status_code == 422
+    assert client.get("/links/search", params={"q": "promo", "cursor": "x"}).status_code == 400
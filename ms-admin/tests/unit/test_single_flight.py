@@ -0,0 +1,138 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.db import dynamo
+from app.db.storage import MemoryBackend
+from app.main import app
+from app.services import link_service
+from app.services.single_flight import SingleFlight, single_flight
+
+
+class SlowBackend(MemoryBackend):
+    """Motor en memoria con lecturas lentas que se cuentan."""
+
+    def __init__(self):
+        super().__init__()
+        self.link_reads = 0
+        self.total_reads = 0
+
+    async def get_link(self, link_id):
+        self.link_reads += 1
+        await asyncio.sleep(0.01)
+        return await super().get_link(link_id)
+
+    async def get_click_totals(self, slugs):
+        self.total_reads += 1
+        await asyncio.sleep(0.01)
+        return await super().get_click_totals(slugs)
+
+
+@pytest.fixture
+def storage():
+    backend = SlowBackend()
+    asyncio.run(backend.create_link({"linkId": "lk_1", "slug": "promo", "variants": ["default"]}))
+    backend.rollups["promo"] = {"clicks": 7, "seeded": True}
+    dynamo.set_storage(backend)
+    link_service.link_cache.clear()
+    link_service.link_slug_cache.clear()
+    yield backend
+    link_service.link_cache.clear()
+    link_service.link_slug_cache.clear()
+    dynamo.set_storage(None)
+
+
+def test_concurrent_identical_metrics_share_one_read(storage):
+    coalesced_before = single_flight.coalesced
+
+    async def scenario():
+        return await asyncio.gather(*(link_service.get_link_metrics("lk_1") for _ in range(20)))
+
+    results = asyncio.run(scenario())
+
+    assert all(result == results[0] for result in results)
+    assert storage.link_reads == 1
+    assert storage.total_reads == 1
+    assert single_flight.coalesced - coalesced_before == 19
+
+
+def test_coalesced_callers_get_independent_copies(storage):
+    async def scenario():
+        return await asyncio.gather(*(link_service.get_link_by_id("lk_1") for _ in range(3)))
+
+    first, second, third = asyncio.run(scenario())
+    first["slug"] = "modificado"
+    second["variants"].append("ig")
+
+    assert storage.link_reads == 1
+    assert third["slug"] == "promo" and third["variants"] == ["default"]
+    assert first["variants"] == ["default"]
+
+
+def test_different_arguments_are_not_coalesced(storage):
+    async def scenario():
+        await asyncio.gather(
+            link_service.get_link_metrics("lk_1"),
+            link_service.get_link_metrics("lk_1", fields="byVariant"),
+        )
+
+    asyncio.run(scenario())
+
+    assert storage.total_reads == 1  # la segunda lee el rollup, no el total
+
+
+def test_errors_are_shared_and_key_released(storage):
+    async def scenario():
+        results = await asyncio.gather(
+            *(link_service.get_link_by_id("lk_no") for _ in range(5)), return_exceptions=True
+        )
+        await link_service.get_link_by_id("lk_1")
+        return results
+
+    results = asyncio.run(scenario())
+
+    assert all(isinstance(result, HTTPException) and result.status_code == 404 for result in results)
+    assert storage.link_reads == 2
+    assert single_flight.stats()["inFlight"] == 0
+
+
+def test_cancelled_caller_does_not_cancel_waiters():
+    flight = SingleFlight()
+    calls = 0
+
+    async def slow_read():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return "ok"
+
+    async def scenario():
+        first = asyncio.ensure_future(flight.do("k", slow_read))
+        second = asyncio.ensure_future(flight.do("k", slow_read))
+        await asyncio.sleep(0)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(scenario()) == "ok"
+    assert calls == 1
+    assert flight.stats() == {"calls": 2, "coalesced": 1, "inFlight": 0}
+
+
+def test_disabled_single_flight_reads_every_time(storage, monkeypatch):
+    monkeypatch.setattr(settings, "SINGLE_FLIGHT_ENABLED", False)
+
+    async def scenario():
+        await asyncio.gather(*(link_service.get_link_by_id("lk_1") for _ in range(3)))
+
+    asyncio.run(scenario())
+
+    assert storage.link_reads == 3
+
+
+def test_health_stats_reports_coalesced_calls(storage):
+    stats = TestClient(app).get("/health/stats").json()["singleFlight"]
+
+    assert set(stats) == {"calls", "coalesced", "inFlight"}
@@ -0,0 +1,123 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.db import dynamo
+from app.db.storage import MemoryBackend
+from app.main import app
+from app.services import link_service
+from app.services.bloom import BloomFilter
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+class CountingBackend(MemoryBackend):
+    def __init__(self):
+        super().__init__()
+        self.slug_reads = 0
+
+    async def get_slug(self, slug):
+        self.slug_reads += 1
+        return await super().get_slug(slug)
+
+
+@pytest.fixture
+def storage(monkeypatch):
+    backend = CountingBackend()
+    run(backend.create_link({"linkId": "lk_1", "slug": "promo", "variants": ["default"]}))
+    dynamo.set_storage(backend)
+    monkeypatch.setattr(link_service, "slug_filter", None)
+    link_service.link_cache.clear()
+    yield backend
+    link_service.link_cache.clear()
+    dynamo.set_storage(None)
+
+
+def test_bloom_filter_has_no_false_negatives_and_few_false_positives():
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    for i in range(1000):
+        bloom.add(f"slug-{i}")
+
+    assert all(f"slug-{i}" in bloom for i in range(1000))
+    false_positives = sum(f"otro-{i}" in bloom for i in range(10000))
+    assert false_positives < 300  # ~1 % esperado
+    assert bloom.stats()["items"] == 1000
+
+
+def test_available_negative_answered_by_filter(storage):
+    run(link_service.load_slug_filter())
+    client = TestClient(app)
+
+    res = client.get("/slugs/libre/available")
+
+    assert res.status_code == 200
+    assert res.json() == {"slug": "libre", "available": True}
+    assert storage.slug_reads == 0
+
+
+def test_available_positive_is_confirmed(storage):
+    run(link_service.load_slug_filter())
+    client = TestClient(app)
+
+    assert client.get("/slugs/promo/available").json()["available"] is False
+    assert storage.slug_reads == 1
+
+
+def test_filter_tracks_create_and_delete(storage):
+    run(link_service.load_slug_filter())
+    client = TestClient(app)
+
+    created = client.post("/links", json={"title": "Nuevo", "slug": "nuevo", "destinationUrl": "https://x.com"})
+    assert client.get("/slugs/nuevo/available").json()["available"] is False
+
+    # Tras borrar, el filtro sigue dando positivo y la lectura de confirmación lo libera
+    assert client.delete(f"/links/{created.json()['linkId']}").status_code == 204
+    assert client.get("/slugs/nuevo/available").json()["available"] is True
+    assert storage.slug_reads == 2
+
+
+def test_available_without_filter_reads_storage(storage):
+    client = TestClient(app)
+
+    assert client.get("/slugs/promo/available").json()["available"] is False
+    assert client.get("/slugs/libre/available").json()["available"] is True
+    assert storage.slug_reads == 2
+
+
+def test_negative_is_confirmed_when_other_instances_write(storage, monkeypatch):
+    monkeypatch.setattr(storage, "single_process", False)
+    run(link_service.load_slug_filter())
+    # Creado desde otra instancia: este filtro no lo vio
+    run(storage.create_link({"linkId": "lk_2", "slug": "otra", "variants": ["default"]}))
+    client = TestClient(app)
+
+    assert client.get("/slugs/otra/available").json()["available"] is False
+    assert client.get("/slugs/libre/available").json()["available"] is True
+    assert storage.slug_reads == 2
+
+
+def test_filter_loads_in_background_and_keeps_creates_made_meanwhile(storage, monkeypatch):
+    stream_slugs = storage.stream_slugs
+
+    async def slow_stream():
+        async for slug in stream_slugs():
+            await asyncio.sleep(0.01)
+            # Un link creado mientras se recorre la colección
+            link_service._remember_slug("durante-la-carga")
+            yield slug
+
+    monkeypatch.setattr(storage, "stream_slugs", slow_stream)
+
+    async def scenario():
+        link_service.start_slug_filter()
+        assert link_service.slug_filter is None
+        await link_service._slug_filter_task
+        await link_service.stop_slug_filter()
+        return link_service.slug_filter
+
+    bloom = run(scenario())
+
+    assert "promo" in bloom and "durante-la-carga" in bloom
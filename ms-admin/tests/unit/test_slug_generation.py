@@ -0,0 +1,114 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.db import dynamo
+from app.db.sqlite_backend import SQLiteBackend
+from app.db.storage import MemoryBackend, slug_family_range
+from app.main import app
+from app.services import link_service
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def storage(request, tmp_path):
+    if request.param == "memory":
+        backend = MemoryBackend()
+    else:
+        backend = SQLiteBackend(str(tmp_path / "linkly.db"))
+    for i, slug in enumerate(["evento-2025", "evento-2025-2", "evento-2025x", "evento-20"]):
+        run(backend.create_link({"linkId": f"lk_{i}", "slug": slug}))
+    dynamo.set_storage(backend)
+    yield backend
+    dynamo.set_storage(None)
+    run(backend.close())
+
+
+def link(title, **overrides):
+    return {"title": title, "destinationUrl": "https://example.com", **overrides}
+
+
+def test_slug_base_from_title():
+    assert link_service.slug_base("  Evento Año 2025! ") == "evento-ano-2025"
+    assert link_service.slug_base("¿?") == "link"
+    assert len(link_service.slug_base("x" * 120)) == 40
+
+
+def test_slug_family_range_only_covers_generated_slugs(storage):
+    start, end = slug_family_range("evento-2025")
+
+    assert run(storage.list_slugs_in_range(start, end, 10)) == ["evento-2025", "evento-2025-2"]
+
+
+def test_create_without_slug_takes_next_free(storage):
+    http = TestClient(app)
+
+    res = http.post("/links", json=link("Evento 2025"))
+
+    assert res.status_code == 201
+    assert res.json()["slug"] == "evento-2025-3"
+    assert http.post("/links", json=link("Nuevo")).json()["slug"] == "nuevo"
+
+
+def test_batch_without_slugs_gets_unique_slugs(storage):
+    http = TestClient(app)
+
+    body = http.post("/links:batch", json={"items": [
+        link("Evento 2025"),
+        link("Evento 2025", slug="evento-2025-3"),  # explícito: la generación lo salta
+        link("Evento 2025"),
+        link("Otro"),
+    ]}).json()
+
+    assert [r["status"] for r in body["items"]] == ["created"] * 4
+    assert [r["link"]["slug"] for r in body["items"]] == ["evento-2025-4", "evento-2025-3", "evento-2025-5", "otro"]
+
+
+def test_crowded_base_uses_random_suffix(storage, monkeypatch):
+    monkeypatch.setattr(link_service.settings, "SLUG_GENERATION_SCAN_LIMIT", 1)
+
+    slug = TestClient(app).post("/links", json=link("Evento 2025")).json()["slug"]
+
+    assert slug.startswith("evento-2025-") and len(slug) == len("evento-2025-") + 6
+
+
+def test_generated_slug_lost_to_concurrent_create_is_retried(storage, monkeypatch):
+    create_link = storage.create_link
+
+    async def raced(link_doc):
+        # Otra instancia reserva el slug entre la consulta y la escritura
+        if link_doc["slug"] == "evento-2025-3":
+            await create_link({"linkId": "lk_otro", "slug": "evento-2025-3"})
+        await create_link(link_doc)
+
+    monkeypatch.setattr(storage, "create_link", raced)
+    http = TestClient(app)
+
+    res = http.post("/links", json=link("Evento 2025"))
+
+    assert res.status_code == 201
+    slug = res.json()["slug"]
+    assert slug.startswith("evento-2025-") and len(slug) == len("evento-2025-") + 6
+    # Un slug explícito tomado sigue respondiendo 409
+    assert http.post("/links", json=link("Evento 2025", slug="evento-2025-3")).status_code == 409
+
+
+def test_batch_retries_generated_slugs_lost_to_concurrent_creates(storage, monkeypatch):
+    create_links = storage.create_links
+
+    async def raced(link_docs):
+        if any(doc["slug"] == "otro" for doc in link_docs):
+            await storage.create_link({"linkId": "lk_otro", "slug": "otro"})
+        return await create_links(link_docs)
+
+    monkeypatch.setattr(storage, "create_links", raced)
+
+    body = TestClient(app).post("/links:batch", json={"items": [link("Otro"), link("X", slug="evento-2025")]}).json()
+
+    assert [r["status"] for r in body["items"]] == ["created", "conflict"]
+    slug = body["items"][0]["link"]["slug"]
+    assert slug.startswith("otro-") and len(slug) == len("otro-") + 6
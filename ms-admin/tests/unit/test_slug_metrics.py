@@ -0,0 +1,115 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.db import dynamo
+from app.db.storage import MemoryBackend
+from app.main import app
+from app.services import link_service
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+@pytest.fixture
+def storage():
+    backend = MemoryBackend()
+    dynamo.set_storage(backend)
+    link_service.link_cache.clear()
+    link_service.link_slug_cache.clear()
+    yield backend
+    link_service.link_cache.clear()
+    link_service.link_slug_cache.clear()
+    dynamo.set_storage(None)
+
+
+def seed(backend):
+    run(backend.create_link({"linkId": "lk_1", "slug": "promo", "variants": ["default", "ig"]}))
+    backend.rollups["promo"] = {"clicks": 5, "byVariant": {"default": 3, "ig": 2}, "byCountry": {"CO": 5}, "seeded": True}
+
+
+def test_slug_metrics_endpoint(storage):
+    seed(storage)
+    client = TestClient(app)
+
+    res = client.get("/slugs/promo/metrics", params={"fields": "byVariant"})
+
+    assert res.status_code == 200
+    body = res.json()
+    assert body["slug"] == "promo"
+    assert body["linkId"] == "lk_1"
+    assert body["totals"]["clicks"] == 5
+    assert body["totals"]["byVariant"] == {"default": 3, "ig": 2}
+
+
+def test_slug_metrics_unknown_slug_is_404(storage):
+    res = TestClient(app).get("/slugs/nada/metrics")
+
+    assert res.status_code == 404
+
+
+def test_slug_metrics_falls_back_to_variant_docs(storage):
+    run(storage.create_link({"linkId": "lk_1", "slug": "promo", "variants": ["default"]}))
+    storage.metrics["promo#default"] = {"clicks": 4, "byCountry": {"CO": 4}}
+
+    result = run(link_service.get_slug_metrics("promo"))
+
+    assert result["totals"]["clicks"] == 4
+
+
+def test_slug_metrics_reads_metrics_concurrently(storage):
+    seed(storage)
+    started = []
+    original_get_slug, original_get_rollup = storage.get_slug, storage.get_rollup
+
+    async def slow_get_slug(slug):
+        started.append("slug")
+        await asyncio.sleep(0.01)
+        # La lectura de métricas ya arrancó sin esperar la resolución del slug
+        assert "rollup" in started
+        return await original_get_slug(slug)
+
+    async def get_rollup(slug):
+        started.append("rollup")
+        return await original_get_rollup(slug)
+
+    storage.get_slug, storage.get_rollup = slow_get_slug, get_rollup
+
+    assert run(link_service.get_slug_metrics("promo"))["totals"]["clicks"] == 5
+
+
+def test_link_metrics_uses_cached_slug_concurrently(storage):
+    seed(storage)
+    run(link_service.get_link_by_id("lk_1"))  # llena la caché linkId -> slug
+    link_service.link_cache.clear()
+    assert link_service.link_slug_cache.get("lk_1") == "promo"
+    started = []
+    original_get_link, original_get_rollup = storage.get_link, storage.get_rollup
+
+    async def slow_get_link(link_id):
+        started.append("link")
+        await asyncio.sleep(0.01)
+        assert "rollup" in started
+        return await original_get_link(link_id)
+
+    async def get_rollup(slug):
+        started.append("rollup")
+        return await original_get_rollup(slug)
+
+    storage.get_link, storage.get_rollup = slow_get_link, get_rollup
+
+    result = run(link_service.get_link_metrics("lk_1"))
+
+    assert result["slug"] == "promo"
+    assert result["totals"]["clicks"] == 5
+
+
+def test_delete_link_invalidates_slug_cache(storage):
+    seed(storage)
+    run(link_service.get_link_by_id("lk_1"))
+
+    run(link_service.delete_link("lk_1"))
+
+    assert link_service.link_slug_cache.get("lk_1") is None
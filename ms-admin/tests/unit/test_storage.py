@@ -0,0 +1,167 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+from google.api_core.exceptions import AlreadyExists, NotFound
+
+from app.db import dynamo
+from app.db.sqlite_backend import SQLiteBackend
+from app.db.storage import MemoryBackend
+from app.main import app
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def storage(request, tmp_path):
+    """Cada prueba del contrato corre contra ambos motores locales."""
+    if request.param == "memory":
+        backend = MemoryBackend()
+    else:
+        backend = SQLiteBackend(str(tmp_path / "linkly.db"))
+    yield backend
+    run(backend.close())
+
+
+@pytest.fixture
+def client():
+    """Cliente HTTP con el motor en memoria instalado."""
+    backend = MemoryBackend()
+    dynamo.set_storage(backend)
+    yield TestClient(app), backend
+    dynamo.set_storage(None)
+
+
+def link_doc(link_id="lk_1", slug="promo"):
+    return {
+        "linkId": link_id,
+        "slug": slug,
+        "title": "Promo",
+        "destinationUrl": "https://example.com/",
+        "variants": ["default", "ig"],
+        "enabled": True,
+        "createdAt": "2025-10-22T12:00:00+00:00",
+        "updatedAt": "2025-10-22T12:00:00+00:00",
+    }
+
+
+def test_create_and_get_link(storage):
+    run(storage.create_link(link_doc()))
+
+    found = run(storage.get_link("lk_1"))
+    assert found["slug"] == "promo"
+    assert found["linkId"] == "lk_1"
+    assert run(storage.get_slug("promo")) == "lk_1"
+    assert run(storage.get_link("lk_missing")) is None
+
+
+def test_create_link_slug_collision(storage):
+    run(storage.create_link(link_doc()))
+
+    with pytest.raises(AlreadyExists):
+        run(storage.create_link(link_doc(link_id="lk_2")))
+    # La colisión no deja un link huérfano
+    assert run(storage.get_link("lk_2")) is None
+
+
+def test_delete_link_releases_slug(storage):
+    run(storage.create_link(link_doc()))
+
+    deleted = run(storage.delete_link("lk_1"))
+
+    assert deleted["slug"] == "promo"
+    assert run(storage.get_link("lk_1")) is None
+    assert run(storage.get_slug("promo")) is None
+    with pytest.raises(NotFound):
+        run(storage.delete_link("lk_1"))
+
+
+def test_list_links(storage):
+    run(storage.create_link(link_doc("lk_1", "uno")))
+    run(storage.create_link(link_doc("lk_2", "dos")))
+
+    items = run(storage.list_links())
+
+    assert [i["linkId"] for i in items] == ["lk_2", "lk_1"]
+
+
+def test_get_metric_docs_only_matches_slug(tmp_path):
+    backend = SQLiteBackend(str(tmp_path / "m.db"))
+    backend.conn.executemany(
+        "INSERT INTO metrics (doc_id, data) VALUES (?, ?)",
+        [
+            ("promo#default", '{"clicks": 3}'),
+            ("promo#ig", '{"clicks": 2}'),
+            ("promo-2#default", '{"clicks": 9}'),
+        ],
+    )
+
+    docs = run(backend.get_metric_docs("promo"))
+
+    assert [d["doc_id"] for d in docs] == ["promo#default", "promo#ig"]
+    run(backend.close())
+
+
+def test_links_flow_with_memory_backend(client):
+    http, backend = client
+    backend.metrics["promo#default"] = {"clicks": 3, "byCountry": {"CO": 3}, "byDevice": {"mobile": 3}}
+    backend.metrics["promo#ig"] = {"clicks": 2, "byCountry": {"CO": 1, "US": 1}, "byDevice": {"desktop": 2}}
+
+    created = http.post("/links", json={"title": "Promo", "slug": "promo", "destinationUrl": "https://example.com"})
+    assert created.status_code == 201
+    link_id = created.json()["linkId"]
+
+    assert http.post("/links", json={"title": "Otra", "slug": "promo", "destinationUrl": "https://example.com"}).status_code == 409
+    assert http.get(f"/links/{link_id}").json()["slug"] == "promo"
+
+    totals = http.get(f"/links/{link_id}/metrics", params={"fields": "byVariant,byDevice,byCountry"}).json()["totals"]
+    assert totals["clicks"] == 5
+    assert totals["byVariant"] == {"default": 3, "ig": 2}
+    assert totals["byCountry"] == {"CO": 4, "US": 1}
+
+    assert http.delete(f"/links/{link_id}").status_code == 204
+    assert http.get(f"/links/{link_id}").status_code == 404
+    assert http.delete(f"/links/{link_id}").status_code == 404
+
+
+def test_list_links_limit_and_start_after(storage):
+    for i in range(5):
+        run(storage.create_link(link_doc(f"lk_{i}", f"slug-{i}")))
+
+    page = run(storage.list_links(limit=2, start_after="lk_3"))
+
+    assert [i["linkId"] for i in page] == ["lk_2", "lk_1"]
+
+
+def test_list_links_endpoint_pages_with_cursor(client):
+    http, backend = client
+    for i in range(5):
+        run(backend.create_link(link_doc(f"lk_{i}", f"slug-{i}")))
+
+    seen = []
+    cursor = None
+    pages = 0
+    while True:
+        params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+        body = http.get("/links", params=params).json()
+        seen += [i["linkId"] for i in body["items"]]
+        pages += 1
+        cursor = body["nextCursor"]
+        if cursor is None:
+            break
+
+    assert seen == [f"lk_{i}" for i in reversed(range(5))]
+    assert pages == 3
+    assert http.get("/links", params={"cursor": "no-es-un-cursor"}).status_code == 400
+
+
+def test_stream_links_by_slug_orders_by_slug(storage):
+    run(storage.create_link(link_doc("lk_1", "zeta")))
+    run(storage.create_link(link_doc("lk_2", "alfa")))
+
+    async def collect():
+        return [link["slug"] async for link in storage.stream_links_by_slug()]
+
+    assert run(collect()) == ["alfa", "zeta"]
@@ -0,0 +1,96 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.db import dynamo
+from app.db.sqlite_backend import SQLiteBackend
+from app.db.storage import MemoryBackend
+from app.main import app
+from app.services import link_service
+
+
+@pytest.fixture
+def backend():
+    backend = MemoryBackend()
+    asyncio.run(backend.create_link({"linkId": "lk_1", "slug": "promo", "variants": ["default", "ig"]}))
+    backend.buckets.update({
+        "promo#d#20251020#default": {"clicks": 2, "byCountry": {"CO": 2}},
+        "promo#d#20251022#default": {"clicks": 1, "byDevice": {"mobile": 1}},
+        "promo#d#20251022#ig": {"clicks": 4},
+        "promo#d#20251023#ig": {"clicks": 9},  # fuera de rango
+        "promo#h#2025102213#ig": {"clicks": 4},
+        "promo-2#d#20251021#default": {"clicks": 5},  # otro slug
+    })
+    dynamo.set_storage(backend)
+    link_service.link_cache.clear()
+    yield backend
+    link_service.link_cache.clear()
+    dynamo.set_storage(None)
+
+
+def test_daily_series(backend):
+    response = TestClient(app).get(
+        "/links/lk_1/metrics", params={"from": "2025-10-20", "to": "2025-10-22", "granularity": "day"}
+    )
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["series"]["timestamps"] == [
+        "2025-10-20T00:00:00+00:00", "2025-10-21T00:00:00+00:00", "2025-10-22T00:00:00+00:00",
+    ]
+    assert body["series"]["clicks"] == [2, 0, 5]
+    assert body["series"]["byVariant"] == {"default": [2, 0, 1], "ig": [0, 0, 4]}
+    assert body["totals"] == {
+        "clicks": 7, "uniques": 0, "byVariant": {"default": 3, "ig": 4},
+        "byDevice": {"mobile": 1}, "byCountry": {"CO": 2},
+    }
+
+
+def test_hourly_series_floors_bounds(backend):
+    body = TestClient(app).get(
+        "/links/lk_1/metrics",
+        params={"from": "2025-10-22T12:30:00Z", "to": "2025-10-22T14:59:00Z", "granularity": "hour"},
+    ).json()
+
+    assert body["from"] == "2025-10-22T12:00:00+00:00"
+    assert body["series"]["clicks"] == [0, 4, 0]
+
+
+def test_series_validation(backend):
+    http = TestClient(app)
+
+    assert http.get("/links/lk_1/metrics", params={"from": "ayer"}).status_code == 400
+    assert http.get("/links/lk_1/metrics", params={"from": "2025-10-22", "to": "2025-10-20"}).status_code == 400
+    assert http.get("/links/lk_1/metrics", params={"granularity": "minute"}).status_code == 422
+    too_long = {"from": "2020-01-01", "to": "2025-01-01", "granularity": "hour"}
+    assert http.get("/links/lk_1/metrics", params=too_long).status_code == 400
+    assert http.get("/links/lk_nope/metrics", params={"granularity": "day"}).status_code == 404
+
+
+def test_sqlite_bucket_range(tmp_path):
+    backend = SQLiteBackend(str(tmp_path / "b.db"))
+    backend.conn.executemany(
+        "INSERT INTO metrics_buckets (doc_id, data) VALUES (?, ?)",
+        [
+            ("promo#d#20251021#default", '{"clicks": 1}'),
+            ("promo#d#20251022#ig", '{"clicks": 2}'),
+            ("promo#d#20251023#ig", '{"clicks": 3}'),
+            ("promo#h#2025102201#ig", '{"clicks": 4}'),
+        ],
+    )
+
+    docs = asyncio.run(backend.get_bucket_docs("promo", "d", "20251021", "20251022"))
+
+    assert [d["doc_id"] for d in docs] == ["promo#d#20251021#default", "promo#d#20251022#ig"]
+    asyncio.run(backend.close())
+
+
+def test_series_sums_shards(backend):
+    backend.buckets["promo#d#20251022#ig#s2"] = {"clicks": 3}
+
+    body = TestClient(app).get(
+        "/links/lk_1/metrics", params={"from": "2025-10-22", "to": "2025-10-22"}
+    ).json()
+
+    assert body["series"]["byVariant"] == {"default": [1], "ig": [7]}
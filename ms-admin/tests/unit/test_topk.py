@@ -0,0 +1,32 @@
+from app.services.topk import (
+    DIRECT_REFERRER, merge_summaries, normalize_referrer, normalize_user_agent, space_saving_add, top_items,
+)
+
+
+def test_normalize_dimensions():
+    assert normalize_referrer("https://www.Example.com/path?q=1") == "example.com"
+    assert normalize_referrer("") == DIRECT_REFERRER
+    assert normalize_referrer("no es una url") == DIRECT_REFERRER
+    assert normalize_user_agent("  ") == "unknown"
+    assert len(normalize_user_agent("x" * 1000)) == 200
+
+
+def test_space_saving_keeps_capacity_and_finds_heavy_hitters():
+    summary = {}
+    # Un valor frecuente entre muchos valores de una sola aparición
+    for i in range(1000):
+        space_saving_add(summary, {f"raro-{i}": 1}, capacity=10)
+        if i % 4 == 0:
+            space_saving_add(summary, {"frecuente": 1}, capacity=10)
+
+    assert len(summary) == 10
+    assert top_items(summary, 1)[0]["value"] == "frecuente"
+    # Space-Saving sobrestima, nunca subestima
+    assert summary["frecuente"] >= 250
+
+
+def test_merge_summaries_sums_and_trims():
+    merged = merge_summaries([{"a": 3, "b": 1}, {"a": 2, "c": 4}, None], capacity=2)
+
+    assert merged == {"a": 5, "c": 4}
+    assert top_items(merged, 5) == [{"value": "a", "clicks": 5}, {"value": "c", "clicks": 4}]
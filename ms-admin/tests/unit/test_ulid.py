@@ -0,0 +1,63 @@
+from fastapi.testclient import TestClient
+
+from app.db import dynamo
+from app.db.storage import MemoryBackend
+from app.main import app
+from app.services.link_service import gen_link_id
+from app.services.ulid import ULIDGenerator
+
+
+class FakeClock:
+    def __init__(self, now=1_760_000_000_000):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_ids_are_time_ordered():
+    clock = FakeClock()
+    ids = ULIDGenerator(clock=clock)
+
+    first = ids.new()
+    clock.now += 1
+    second = ids.new()
+
+    assert len(first) == 26
+    assert first < second
+    # Los 10 primeros caracteres son el instante (48 bits)
+    assert first[:10] != second[:10]
+
+
+def test_ids_are_monotonic_within_a_millisecond_and_when_clock_goes_back():
+    clock = FakeClock()
+    ids = ULIDGenerator(clock=clock)
+
+    generated = [ids.new() for _ in range(1000)]
+    clock.now -= 5
+    generated.append(ids.new())
+
+    assert generated == sorted(generated)
+    assert len(set(generated)) == len(generated)
+
+
+def test_gen_link_id_format():
+    link_id = gen_link_id()
+
+    assert link_id.startswith("lk_") and len(link_id) == 29
+    assert gen_link_id() > link_id
+
+
+def test_list_links_newest_first():
+    dynamo.set_storage(MemoryBackend())
+    http = TestClient(app)
+    try:
+        for slug in ("uno", "dos", "tres"):
+            http.post("/links", json={"title": slug, "slug": slug, "destinationUrl": "https://example.com"})
+
+        first_page = http.get("/links", params={"limit": 2}).json()
+        rest = http.get("/links", params={"cursor": first_page["nextCursor"]}).json()
+
+        assert [i["slug"] for i in first_page["items"] + rest["items"]] == ["tres", "dos", "uno"]
+    finally:
+        dynamo.set_storage(None)
@@ -4,8 +4,12 @@ import morgan from "morgan";
 
 import routes from "./routes.js";
 
-export function createApp() {
+/**
+ * @param {{ clickSpool?: import("./spool.js").ClickSpool }} [options]
+ */
+export function createApp({ clickSpool } = {}) {
   const app = express();
+  app.locals.clickSpool = clickSpool;
 
   app.use(
     helmet({
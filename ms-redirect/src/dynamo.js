@@ -1,5 +1,8 @@
 import { initializeApp, applicationDefault } from "firebase-admin/app";
-import { getFirestore } from "firebase-admin/firestore";
+import { getFirestore, FieldValue } from "firebase-admin/firestore";
+
+import { HLL_FIELD, hllRegister, mergeHll } from "./hll.js";
+import { TOPK_FIELDS, normalizeUserAgent, referrerKey, spaceSavingAdd } from "./topk.js";
 
 // --- Configuración de Firestore ---
 
@@ -16,15 +19,119 @@ export const db = getFirestore();
 // Define los nombres de tus colecciones (equivalente a las tablas de DynamoDB)
 const LINKS_COLLECTION = process.env.LINKS_COLLECTION || "links";
 const METRICS_COLLECTION = process.env.METRICS_COLLECTION || "metrics";
+// Un documento por slug con los totales; ms-admin lo lee en vez de recorrer las variantes
+const METRICS_ROLLUP_COLLECTION =
+  process.env.METRICS_ROLLUP_COLLECTION || "metrics_rollups";
+// Buckets por hora y por día para las series de tiempo
+const METRICS_BUCKETS_COLLECTION =
+  process.env.METRICS_BUCKETS_COLLECTION || "metrics_buckets";
+
+// Número de shards por documento de métricas (slug#variant). Con 1 todo va al
+// documento slug#variant como siempre; el shard N > 0 usa el sufijo "#sN".
+const METRICS_SHARDS_COLLECTION =
+  process.env.METRICS_SHARDS_COLLECTION || "metrics_shards";
+const METRICS_DEFAULT_SHARDS = Number(process.env.METRICS_DEFAULT_SHARDS || 1);
+const METRICS_MAX_SHARDS = Number(process.env.METRICS_MAX_SHARDS || 16);
+const SHARD_CACHE_TTL_MS = Number(process.env.METRICS_SHARD_CACHE_TTL_MS || 60000);
+
+// Marcas de lotes del spool ya aplicados (replay idempotente). Se recomienda una
+// política TTL de Firestore sobre el campo expireAt.
+const METRICS_SPOOL_BATCHES_COLLECTION =
+  process.env.METRICS_SPOOL_BATCHES_COLLECTION || "metrics_spool_batches";
+const SPOOL_BATCH_MARKER_TTL_MS = 7 * 24 * 3600 * 1000;
 
 // Ya no necesitas las variables de entorno DDB_TABLE, DDB_ENDPOINT, etc.
 
 // --- Lógica de la aplicación migrada ---
 
+/**
+ * Claves UTC de los buckets de un instante: día "YYYYMMDD" y hora "YYYYMMDDHH".
+ * @param {Date} date
+ * @returns {{ day: string, hour: string }}
+ */
+export function bucketKeys(date) {
+  const iso = date.toISOString(); // "2025-10-22T13:45:00.000Z"
+  const day = iso.slice(0, 10).replaceAll("-", "");
+  return { day, hour: day + iso.slice(11, 13) };
+}
+
+/**
+ * Sufijo de ID de un shard: el shard 0 es el documento original.
+ * @param {number} shard
+ * @returns {string}
+ */
+export function shardSuffix(shard) {
+  return shard === 0 ? "" : `#s${shard}`;
+}
+
+// "slug#variant" -> { shards, expiresAt }
+const shardCounts = new Map();
+
+function clampShards(value) {
+  const shards = Math.floor(Number(value) || 1);
+  return Math.min(Math.max(shards, 1), METRICS_MAX_SHARDS);
+}
+
+function cacheShardCount(metricKey, shards) {
+  shardCounts.set(metricKey, { shards, expiresAt: Date.now() + SHARD_CACHE_TTL_MS });
+}
+
+/**
+ * Número de shards de un documento de métricas (caché en memoria con TTL).
+ * @param {string} metricKey "slug#variant"
+ * @returns {Promise<number>}
+ */
+export async function getShardCount(metricKey) {
+  const cached = shardCounts.get(metricKey);
+  if (cached && cached.expiresAt > Date.now()) return cached.shards;
+
+  let shards = METRICS_DEFAULT_SHARDS;
+  try {
+    const doc = await db.collection(METRICS_SHARDS_COLLECTION).doc(metricKey).get();
+    if (doc.exists) shards = doc.data().shards ?? METRICS_DEFAULT_SHARDS;
+  } catch (e) {
+    console.error(`[ms-redirect] Error al leer shards de ${metricKey}`, e);
+  }
+  shards = clampShards(shards);
+  cacheShardCount(metricKey, shards);
+  return shards;
+}
+
+/**
+ * Duplica los shards de un documento de métricas con contención (hasta METRICS_MAX_SHARDS).
+ * Si otra instancia ya lo promovió, solo se adopta su valor.
+ * @param {string} metricKey
+ * @param {number} current shards con los que se detectó la contención
+ */
+export async function promoteShards(metricKey, current) {
+  if (current >= METRICS_MAX_SHARDS) return;
+  const ref = db.collection(METRICS_SHARDS_COLLECTION).doc(metricKey);
+  try {
+    const promoted = await db.runTransaction(async (transaction) => {
+      const doc = await transaction.get(ref);
+      const stored = clampShards(doc.exists ? doc.data().shards : METRICS_DEFAULT_SHARDS);
+      if (stored > current) return stored;
+      const next = clampShards(current * 2);
+      transaction.set(
+        ref,
+        { shards: next, promotedAt: new Date().toISOString() },
+        { merge: true },
+      );
+      return next;
+    });
+    cacheShardCount(metricKey, promoted);
+    console.warn(
+      `[ms-redirect] Contención en ${metricKey}: ${current} -> ${promoted} shards`,
+    );
+  } catch (e) {
+    console.error(`[ms-redirect] Error al promover shards de ${metricKey}`, e);
+  }
+}
+
 /**
  * Obtiene un enlace por su slug desde Firestore.
  * @param {string} slug
- * @returns {Promise<{ destinationUrl: string } | null>}
+ * @returns {Promise<{ destinationUrl: string, linkId: string } | null>}
  */
 export async function getLinkBySlug(slug) {
   // 1. Obtenemos la referencia al documento usando el slug como ID
@@ -41,32 +148,70 @@ export async function getLinkBySlug(slug) {
   // Asumimos que los campos se llaman 'enabled' y 'destinationUrl'
   if (data.enabled === false) return null;
 
-  return { destinationUrl: data.destinationUrl };
+  return { destinationUrl: data.destinationUrl, linkId: data.linkId ?? doc.id };
+}
+
+/**
+ * Conteos de heavy hitters de un clic: { topReferrers: { host: 1 }, topUserAgents: { ua: 1 } }.
+ * @param {{ referrer?: string, userAgent?: string }} event
+ */
+function topkCounts({ referrer, userAgent }) {
+  return {
+    [TOPK_FIELDS.referrer]: { [referrerKey(referrer)]: 1 },
+    [TOPK_FIELDS.userAgent]: { [normalizeUserAgent(userAgent)]: 1 },
+  };
 }
 
 /**
  * Incrementa las métricas de clics de forma atómica en Firestore.
- * @param {{ slug: string, variant?: string, country?: string, device?: string }}
+ * Con visitor, actualiza además el registro HyperLogLog del visitante en el
+ * documento de la variante y en sus buckets (conteo de únicos, ver hll.js).
+ * Los resúmenes de referrers y user agents (topk.js) van en el documento de la variante.
+ * No escribe el documento del link: su totalClicks lo mantienen los caminos agregados
+ * (applyClickBatch, la ingesta de ms-admin y su reconciliación de rollups).
+ * @param {{ slug: string, variant?: string, country?: string, device?: string, visitor?: string, referrer?: string, userAgent?: string }}
  */
 export async function incrementMetrics({
   slug,
   variant = "default",
   country = "UN",
   device = "unknown",
+  visitor,
+  referrer,
+  userAgent,
 }) {
   const c = (country || "UN").toUpperCase();
   const d = device || "unknown";
 
-  // Usamos un ID de documento compuesto para las métricas (p.ej. "mi-slug#default")
-  const metricDocId = `${slug}#${variant}`;
+  // Usamos un ID de documento compuesto para las métricas (p.ej. "mi-slug#default").
+  // Cada clic elige un shard al azar y escribe solo documentos de ese shard
+  // (métrica, rollup y buckets), así los clics de un link viral no compiten entre sí.
+  const metricKey = `${slug}#${variant}`;
+  const shards = await getShardCount(metricKey);
+  const suffix = shardSuffix(Math.floor(Math.random() * shards));
+  const metricDocId = `${metricKey}${suffix}`;
   const docRef = db.collection(METRICS_COLLECTION).doc(metricDocId);
+  const rollupRef = db.collection(METRICS_ROLLUP_COLLECTION).doc(`${slug}${suffix}`);
+  // IDs slug#h#YYYYMMDDHH#variant y slug#d#YYYYMMDD#variant: ms-admin lee un rango por ID
+  const { day, hour } = bucketKeys(new Date());
+  const bucketsCol = db.collection(METRICS_BUCKETS_COLLECTION);
+  const bucketRefs = [
+    bucketsCol.doc(`${slug}#h#${hour}#${variant}${suffix}`),
+    bucketsCol.doc(`${slug}#d#${day}#${variant}${suffix}`),
+  ];
+  const register = visitor ? hllRegister(visitor) : null;
+  let attempts = 0;
 
   // Usamos una transacción para asegurar la atomicidad (lectura-modificación-escritura)
   // Esto replica el comportamiento de UpdateCommand de DynamoDB
   try {
     await db.runTransaction(async (transaction) => {
-      // 1. Leer el documento dentro de la transacción
-      const doc = await transaction.get(docRef);
+      attempts += 1;
+      // 1. Leer el documento dentro de la transacción (y los buckets si hay que
+      //    actualizar su registro HyperLogLog: Firestore no tiene un "máximo" atómico aquí)
+      const [doc, ...bucketDocs] = register
+        ? await transaction.getAll(docRef, ...bucketRefs)
+        : [await transaction.get(docRef)];
 
       let currentData;
 
@@ -97,12 +242,206 @@ export async function incrementMetrics({
           [d]: (currentData.byDevice?.[d] || 0) + 1,
         },
       };
+      for (const [field, counts] of Object.entries(topkCounts({ referrer, userAgent }))) {
+        newData[field] = spaceSavingAdd({ ...currentData[field] }, counts);
+      }
+      if (register) {
+        newData[HLL_FIELD] = mergeHll(
+          { ...currentData[HLL_FIELD] },
+          { [register.index]: register.rank },
+        );
+      }
 
       // 4. Escribimos los datos actualizados en la transacción
       transaction.set(docRef, newData);
+
+      // 5. En la misma transacción, el rollup del slug (merge + incrementos atómicos:
+      //    no hace falta leerlo y lo comparten todas las variantes)
+      transaction.set(
+        rollupRef,
+        {
+          clicks: FieldValue.increment(1),
+          byVariant: { [variant]: FieldValue.increment(1) },
+          byCountry: { [c]: FieldValue.increment(1) },
+          byDevice: { [d]: FieldValue.increment(1) },
+        },
+        { merge: true },
+      );
+
+      // 6. Los buckets de la hora y el día actuales, igual que el rollup
+      bucketRefs.forEach((bucketRef, i) => {
+        const update = {
+          clicks: FieldValue.increment(1),
+          byCountry: { [c]: FieldValue.increment(1) },
+          byDevice: { [d]: FieldValue.increment(1) },
+        };
+        if (register) {
+          const current = bucketDocs[i].get(`${HLL_FIELD}.${register.index}`) || 0;
+          update[HLL_FIELD] = { [register.index]: Math.max(current, register.rank) };
+        }
+        transaction.set(bucketRef, update, { merge: true });
+      });
     });
+    // Un reintento significa que otro clic escribió el mismo shard a la vez
+    if (attempts > 1) await promoteShards(metricKey, shards);
   } catch (e) {
     console.error(`[ms-redirect] Error al incrementar métricas: ${metricDocId}`, e);
+    // ABORTED (10): se agotaron los reintentos por contención
+    if (e?.code === 10 || e?.code === "aborted") await promoteShards(metricKey, shards);
     // Maneja el error como prefieras (p.ej. reintentar o simplemente loguear)
   }
-}
\ No newline at end of file
+}
+function addCounts(dst, src) {
+  for (const [key, value] of Object.entries(src)) {
+    if (typeof value === "object") {
+      dst[key] = dst[key] || {};
+      addCounts(dst[key], value);
+    } else {
+      dst[key] = (dst[key] || 0) + value;
+    }
+  }
+}
+
+function toIncrements(counts) {
+  return Object.fromEntries(
+    Object.entries(counts).map(([key, value]) => [
+      key,
+      typeof value === "object" ? toIncrements(value) : FieldValue.increment(value),
+    ]),
+  );
+}
+
+/**
+ * Aplica un lote de clics del spool con una escritura Increment por documento
+ * distinto (métrica, rollup y buckets). La marca del lote se crea en la misma
+ * transacción con el offset donde terminó el lote: si ya existe, el lote se
+ * aplicó antes, no se vuelve a contar y se devuelve ese offset guardado.
+ * Los registros HyperLogLog de los visitantes se combinan con lo leído en la
+ * transacción (solo los documentos de variante y buckets que los necesitan).
+ * Los clics de eventos con linkId se suman al totalClicks de los links que existen.
+ * @param {string} batchId ID determinista del lote (ver ClickSpool)
+ * @param {{ slug: string, linkId?: string, variant?: string, country?: string, device?: string, visitor?: string, ts?: number }[]} events
+ * @param {number} end offset del segmento donde termina el lote
+ * @returns {Promise<number>} offset hasta el que el lote quedó aplicado
+ */
+export async function applyClickBatch(batchId, events, end) {
+  // "colección/docId" -> conteos (y registros HyperLogLog / heavy hitters del lote)
+  const counts = new Map();
+  const add = (collection, docId, delta, register, topk) => {
+    const key = `${collection}/${docId}`;
+    if (!counts.has(key)) {
+      counts.set(key, { collection, docId, data: {}, hll: null, topk: null });
+    }
+    const entry = counts.get(key);
+    addCounts(entry.data, delta);
+    if (register) {
+      entry.hll = mergeHll(entry.hll || {}, { [register.index]: register.rank });
+    }
+    if (topk) {
+      entry.topk = entry.topk || {};
+      addCounts(entry.topk, topk);
+    }
+  };
+
+  // Un shard por slug#variant para todo el lote (ver incrementMetrics)
+  const suffixes = new Map();
+  // linkId -> clics del lote (totalClicks)
+  const totals = new Map();
+  for (const event of events) {
+    if (event.linkId) totals.set(event.linkId, (totals.get(event.linkId) || 0) + 1);
+    const variant = event.variant || "default";
+    const metricKey = `${event.slug}#${variant}`;
+    if (!suffixes.has(metricKey)) {
+      const shards = await getShardCount(metricKey);
+      suffixes.set(metricKey, shardSuffix(Math.floor(Math.random() * shards)));
+    }
+    const suffix = suffixes.get(metricKey);
+    const c = (event.country || "UN").toUpperCase();
+    const d = event.device || "unknown";
+    const { day, hour } = bucketKeys(new Date(event.ts ?? Date.now()));
+    const delta = { clicks: 1, byCountry: { [c]: 1 }, byDevice: { [d]: 1 } };
+    const register = event.visitor ? hllRegister(event.visitor) : null;
+
+    add(METRICS_COLLECTION, `${metricKey}${suffix}`, delta, register, topkCounts(event));
+    add(METRICS_ROLLUP_COLLECTION, `${event.slug}${suffix}`, {
+      ...delta,
+      byVariant: { [variant]: 1 },
+    });
+    add(
+      METRICS_BUCKETS_COLLECTION,
+      `${event.slug}#h#${hour}#${variant}${suffix}`,
+      delta,
+      register,
+    );
+    add(
+      METRICS_BUCKETS_COLLECTION,
+      `${event.slug}#d#${day}#${variant}${suffix}`,
+      delta,
+      register,
+    );
+  }
+  // Documentos cuyo estado hay que leer: HyperLogLog (máximo) y Space-Saving (desalojo)
+  const toRead = [...counts.values()].filter((entry) => entry.hll || entry.topk);
+
+  const linkRefs = [...totals.keys()].map((linkId) =>
+    db.collection(LINKS_COLLECTION).doc(linkId),
+  );
+  const markerRef = db
+    .collection(METRICS_SPOOL_BATCHES_COLLECTION)
+    .doc(batchId.replaceAll("/", "_"));
+  return db.runTransaction(async (transaction) => {
+    const marker = await transaction.get(markerRef);
+    if (marker.exists) return marker.get("end") ?? end;
+    const linkDocs = linkRefs.length > 0 ? await transaction.getAll(...linkRefs) : [];
+    if (toRead.length > 0) {
+      const docs = await transaction.getAll(
+        ...toRead.map(({ collection, docId }) => db.collection(collection).doc(docId)),
+      );
+      toRead.forEach((entry, i) => {
+        if (entry.hll) {
+          // Solo los registros que suben respecto de lo guardado
+          const stored = docs[i].get(HLL_FIELD) || {};
+          entry.hll = Object.fromEntries(
+            Object.entries(entry.hll).filter(([index, rank]) => rank > (stored[index] || 0)),
+          );
+        }
+        if (entry.topk) {
+          // set con merge combina mapas: los valores desalojados se borran explícitamente
+          entry.topk = Object.fromEntries(
+            Object.entries(entry.topk).map(([field, tallies]) => {
+              const stored = docs[i].get(field) || {};
+              const summary = spaceSavingAdd({ ...stored }, tallies);
+              for (const value of Object.keys(stored)) {
+                if (!Object.hasOwn(summary, value)) summary[value] = FieldValue.delete();
+              }
+              return [field, summary];
+            }),
+          );
+        }
+      });
+    }
+    for (const { collection, docId, data, hll, topk } of counts.values()) {
+      const update = toIncrements(data);
+      if (hll && Object.keys(hll).length > 0) update[HLL_FIELD] = hll;
+      Object.assign(update, topk);
+      transaction.set(db.collection(collection).doc(docId), update, {
+        merge: true,
+      });
+    }
+    linkDocs.forEach((doc, i) => {
+      // update no crea documentos: se omiten los links borrados mientras tanto
+      if (doc.exists) {
+        transaction.update(linkRefs[i], {
+          totalClicks: FieldValue.increment(totals.get(doc.id)),
+        });
+      }
+    });
+    transaction.create(markerRef, {
+      events: events.length,
+      end,
+      appliedAt: FieldValue.serverTimestamp(),
+      expireAt: new Date(Date.now() + SPOOL_BATCH_MARKER_TTL_MS),
+    });
+    return end;
+  });
+}
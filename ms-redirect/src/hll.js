@@ -0,0 +1,37 @@
+import { createHash } from "node:crypto";
+
+// --- HyperLogLog para visitantes únicos ---
+//
+// Mismo esquema que ms-admin (app/services/hll.py): el campo "hll" de cada
+// documento de contadores es un mapa { índice de registro: rango } con a lo sumo
+// HLL_REGISTERS entradas; dos sketches se unen con el máximo por registro.
+
+export const HLL_FIELD = "hll";
+const HLL_PRECISION = 10;
+export const HLL_REGISTERS = 1 << HLL_PRECISION;
+const RANK_BITS = 64n - BigInt(HLL_PRECISION);
+
+/**
+ * Registro que actualiza un visitante (primeros 64 bits del SHA-1 del ID).
+ * @param {string} visitorId
+ * @returns {{ index: string, rank: number }}
+ */
+export function hllRegister(visitorId) {
+  const hash = createHash("sha1").update(visitorId, "utf8").digest().readBigUInt64BE(0);
+  const index = hash >> RANK_BITS;
+  const rest = hash & ((1n << RANK_BITS) - 1n);
+  const bits = rest === 0n ? 0 : rest.toString(2).length;
+  return { index: String(index), rank: Number(RANK_BITS) - bits + 1 };
+}
+
+/**
+ * Une en dst los registros de src (máximo por registro).
+ * @param {Record<string, number>} dst
+ * @param {Record<string, number> | undefined} src
+ */
+export function mergeHll(dst, src) {
+  for (const [index, rank] of Object.entries(src || {})) {
+    if (rank > (dst[index] || 0)) dst[index] = rank;
+  }
+  return dst;
+}
@@ -1,3 +1,5 @@
+import { createHash } from "node:crypto";
+
 export function extractContextFromCFHeaders(req) {
   const h = req.headers;
 
@@ -16,3 +18,17 @@ export function extractContextFromCFHeaders(req) {
 
   return { country, device };
 }
+
+/**
+ * Identificador opaco del visitante para el conteo de únicos: hash de IP y
+ * user-agent. La IP no se guarda en ninguna parte (tampoco en el spool); del
+ * user-agent solo se guarda su versión normalizada (recortada, ver topk.js) para
+ * topUserAgents.
+ * @returns {string | undefined}
+ */
+export function visitorIdFromRequest(req) {
+  const ip = req.ip;
+  if (!ip) return undefined;
+  const userAgent = req.headers["user-agent"] || "";
+  return createHash("sha256").update(`${ip}|${userAgent}`).digest("base64url").slice(0, 22);
+}
@@ -1,7 +1,8 @@
 import express from "express";
 
 import { getLinkBySlug, incrementMetrics } from "./dynamo.js";
-import { extractContextFromCFHeaders } from "./metrics.js";
+import { extractContextFromCFHeaders, visitorIdFromRequest } from "./metrics.js";
+import { normalizeReferrer, normalizeUserAgent } from "./topk.js";
 
 const router = express.Router();
 
@@ -24,10 +25,23 @@ async function handleRedirect(req, res, variantFromPath) {
     // Intencional: si fallan los headers de CloudFront/Cloudflare, usamos defaults
   }
 
-  // ✅ Solo un llamado, con logs incluidos (opcional)
-  incrementMetrics({ slug, variant, country, device })
-    .then((r) => console.log("[metrics] ok", r?.$metadata))
-    .catch((e) => console.error("[metrics] error", e));
+  const visitor = visitorIdFromRequest(req);
+  // Se normalizan aquí para que ni el spool ni Firestore guarden la URL completa del
+  // referrer (solo su host) ni un user-agent sin recortar
+  const referrer = normalizeReferrer(req.get("referer"));
+  const userAgent = normalizeUserAgent(req.get("user-agent"));
+
+  // Con spool (CLICK_SPOOL_DIR) el clic va primero a disco y el drainer lo aplica;
+  // la redirección nunca espera a Firestore ni pierde el clic si está caído.
+  const clickSpool = req.app.locals.clickSpool;
+  if (clickSpool) {
+    clickSpool.append({ slug, linkId: link.linkId, variant, country, device, visitor, referrer, userAgent });
+  } else {
+    // ✅ Solo un llamado, con logs incluidos (opcional)
+    incrementMetrics({ slug, variant, country, device, visitor, referrer, userAgent })
+      .then((r) => console.log("[metrics] ok", r?.$metadata))
+      .catch((e) => console.error("[metrics] error", e));
+  }
 
   return res.redirect(302, link.destinationUrl);
 }
@@ -2,8 +2,32 @@ import "dotenv/config";
 import { createApp } from "./app.js";
 
 const PORT = process.env.PORT || 8080;
-const app = createApp();
 
-app.listen(PORT, () => {
+// Spool local de clics (opcional): ver src/spool.js
+let clickSpool;
+if (process.env.CLICK_SPOOL_DIR) {
+  const { ClickSpool } = await import("./spool.js");
+  const { applyClickBatch } = await import("./dynamo.js");
+  clickSpool = new ClickSpool({
+    dir: process.env.CLICK_SPOOL_DIR,
+    apply: applyClickBatch,
+    segmentMaxBytes: Number(process.env.CLICK_SPOOL_SEGMENT_BYTES || 8 * 1024 * 1024),
+    fsyncIntervalMs: Number(process.env.CLICK_SPOOL_FSYNC_MS || 200),
+    drainIntervalMs: Number(process.env.CLICK_SPOOL_DRAIN_MS || 1000),
+  });
+  await clickSpool.open();
+}
+
+const app = createApp({ clickSpool });
+
+const server = app.listen(PORT, () => {
   console.log(`[ms-redirect] Listening on :${PORT}`);
 });
+
+// Cloud Run envía SIGTERM antes de detener la instancia: sincroniza y drena el spool
+process.on("SIGTERM", () => {
+  server.close(async () => {
+    await clickSpool?.close();
+    process.exit(0);
+  });
+});
@@ -0,0 +1,274 @@
+import { promises as fs } from "node:fs";
+import path from "node:path";
+import { randomUUID } from "node:crypto";
+
+// --- Spool de clics: log local append-only en segmentos ---
+//
+// Cada clic se agrega como una línea JSON al segmento activo
+// (segment-000000000001.ndjson, ...). Las escrituras a disco se agrupan y se
+// hace un solo fsync por intervalo; al superar el tamaño máximo se abre un
+// segmento nuevo. Un drainer asíncrono lee desde el checkpoint, aplica los clics
+// en lotes y avanza el checkpoint; los segmentos ya drenados se borran.
+//
+// Cada lote tiene un ID determinista (instancia:segmento:inicio) y apply()
+// recibe también el offset donde termina. Si apply() ya aplicó ese batchId
+// (caída entre "aplicar" y "guardar checkpoint") devuelve el fin guardado y el
+// checkpoint avanza hasta ahí sin volver a aplicar: al releer, el lote puede
+// traer más líneas que la primera vez y esas se aplican en el lote siguiente
+// (ver applyClickBatch). El drenador solo lee bytes ya sincronizados a disco.
+
+const SEGMENT_PREFIX = "segment-";
+const SEGMENT_SUFFIX = ".ndjson";
+const CHECKPOINT_FILE = "checkpoint.json";
+const INSTANCE_FILE = "instance-id";
+// Bytes leídos por vez al drenar (cada línea es un clic de ~100 bytes)
+const READ_CHUNK_BYTES = 256 * 1024;
+const NEWLINE = 0x0a;
+
+export function segmentName(seq) {
+  return `${SEGMENT_PREFIX}${String(seq).padStart(12, "0")}${SEGMENT_SUFFIX}`;
+}
+
+function segmentSeq(fileName) {
+  if (!fileName.startsWith(SEGMENT_PREFIX) || !fileName.endsWith(SEGMENT_SUFFIX)) {
+    return null;
+  }
+  const seq = Number(fileName.slice(SEGMENT_PREFIX.length, -SEGMENT_SUFFIX.length));
+  return Number.isInteger(seq) ? seq : null;
+}
+
+async function writeFileAtomic(file, data) {
+  const tmp = `${file}.tmp`;
+  const handle = await fs.open(tmp, "w");
+  try {
+    await handle.writeFile(data);
+    await handle.sync();
+  } finally {
+    await handle.close();
+  }
+  await fs.rename(tmp, file);
+}
+
+export class ClickSpool {
+  /**
+   * @param {{
+   *   dir: string,
+   *   apply: (batchId: string, events: object[], end: number) => Promise<number | void>,
+   *   segmentMaxBytes?: number,
+   *   fsyncIntervalMs?: number,
+   *   drainIntervalMs?: number,
+   *   drainBatchSize?: number,
+   * }} options
+   */
+  constructor({
+    dir,
+    apply,
+    segmentMaxBytes = 8 * 1024 * 1024,
+    fsyncIntervalMs = 200,
+    drainIntervalMs = 1000,
+    drainBatchSize = 100,
+  }) {
+    this.dir = dir;
+    this.apply = apply;
+    this.segmentMaxBytes = segmentMaxBytes;
+    this.fsyncIntervalMs = fsyncIntervalMs;
+    this.drainIntervalMs = drainIntervalMs;
+    this.drainBatchSize = drainBatchSize;
+
+    this.pending = [];
+    this.activeSeq = 0;
+    this.activeHandle = null;
+    this.activeBytes = 0;
+    this.checkpoint = { segment: 1, offset: 0 };
+    this.timers = [];
+    // Las escrituras y el drenado se serializan cada uno en su cadena de promesas
+    this.writeChain = Promise.resolve();
+    this.drainChain = Promise.resolve();
+    this.stats = { appended: 0, synced: 0, drained: 0, failedDrains: 0, failedFlushes: 0 };
+  }
+
+  async open() {
+    await fs.mkdir(this.dir, { recursive: true });
+    this.instanceId = await this.#loadInstanceId();
+
+    const seqs = (await fs.readdir(this.dir))
+      .map(segmentSeq)
+      .filter((seq) => seq !== null)
+      .sort((a, b) => a - b);
+    try {
+      this.checkpoint = JSON.parse(
+        await fs.readFile(path.join(this.dir, CHECKPOINT_FILE), "utf8"),
+      );
+    } catch {
+      this.checkpoint = { segment: seqs[0] ?? 1, offset: 0 };
+    }
+
+    // Siempre un segmento nuevo: el último pudo quedar con una línea a medias
+    await this.#openSegment((seqs.at(-1) ?? 0) + 1);
+
+    this.timers = [
+      setInterval(() => this.flush().catch(() => {}), this.fsyncIntervalMs),
+      setInterval(() => this.drain().catch(() => {}), this.drainIntervalMs),
+    ];
+    for (const timer of this.timers) timer.unref?.();
+    console.log(
+      `[spool] Abierto en ${this.dir} (segmento ${this.activeSeq}, checkpoint ${this.checkpoint.segment}:${this.checkpoint.offset})`,
+    );
+  }
+
+  /**
+   * Agrega un clic al spool. No toca la base de datos ni espera al disco:
+   * queda en memoria hasta el siguiente fsync agrupado.
+   * @param {{ slug: string, linkId?: string, variant?: string, country?: string, device?: string, visitor?: string, referrer?: string, userAgent?: string, ts?: number }} event
+   */
+  append(event) {
+    this.pending.push(`${JSON.stringify({ ts: Date.now(), ...event })}\n`);
+    this.stats.appended += 1;
+  }
+
+  /**
+   * Escribe y sincroniza (fsync) las líneas pendientes; rota el segmento si se llenó.
+   * Si la escritura falla (p. ej. ENOSPC) las líneas vuelven a pendientes y se
+   * reintenta en el próximo ciclo.
+   */
+  flush() {
+    this.writeChain = this.writeChain.then(() =>
+      this.#flushPending().catch((e) => {
+        this.stats.failedFlushes += 1;
+        console.error("[spool] Error al escribir en disco, se reintentará", e);
+      }),
+    );
+    return this.writeChain;
+  }
+
+  /** Aplica todo lo drenable desde el checkpoint. Si apply() falla, se reintenta en el próximo ciclo. */
+  drain() {
+    this.drainChain = this.drainChain.then(() =>
+      this.#drainAvailable().catch((e) => {
+        this.stats.failedDrains += 1;
+        console.error("[spool] Error al drenar, se reintentará", e);
+      }),
+    );
+    return this.drainChain;
+  }
+
+  /** Detiene los timers, sincroniza lo pendiente y hace un último drenado. */
+  async close() {
+    for (const timer of this.timers) clearInterval(timer);
+    this.timers = [];
+    await this.flush();
+    await this.drain();
+    await this.activeHandle?.close();
+    this.activeHandle = null;
+  }
+
+  async #loadInstanceId() {
+    const file = path.join(this.dir, INSTANCE_FILE);
+    try {
+      return (await fs.readFile(file, "utf8")).trim();
+    } catch {
+      const id = randomUUID();
+      await writeFileAtomic(file, id);
+      return id;
+    }
+  }
+
+  async #openSegment(seq) {
+    await this.activeHandle?.close();
+    this.activeSeq = seq;
+    this.activeHandle = await fs.open(path.join(this.dir, segmentName(seq)), "a");
+    this.activeBytes = 0;
+  }
+
+  async #flushPending() {
+    if (this.pending.length === 0) return;
+    const lines = this.pending;
+    this.pending = [];
+    const data = lines.join("");
+    try {
+      await this.activeHandle.write(data);
+      await this.activeHandle.sync();
+    } catch (e) {
+      // Descarta una escritura parcial para no duplicar ni cortar líneas al reintentar
+      await this.activeHandle.truncate(this.activeBytes).catch(() => {});
+      this.pending = lines.concat(this.pending);
+      throw e;
+    }
+    this.activeBytes += Buffer.byteLength(data);
+    this.stats.synced += lines.length;
+    if (this.activeBytes >= this.segmentMaxBytes) {
+      await this.#openSegment(this.activeSeq + 1);
+    }
+  }
+
+  async #saveCheckpoint(checkpoint) {
+    await writeFileAtomic(path.join(this.dir, CHECKPOINT_FILE), JSON.stringify(checkpoint));
+    this.checkpoint = checkpoint;
+  }
+
+  async #readFrom(seq, offset, length) {
+    let handle;
+    try {
+      handle = await fs.open(path.join(this.dir, segmentName(seq)), "r");
+    } catch (e) {
+      if (e.code === "ENOENT") return null;
+      throw e;
+    }
+    try {
+      const buffer = Buffer.alloc(length);
+      const { bytesRead } = await handle.read(buffer, 0, length, offset);
+      return buffer.subarray(0, bytesRead);
+    } finally {
+      await handle.close();
+    }
+  }
+
+  async #finishSegment(seq) {
+    await this.#saveCheckpoint({ segment: seq + 1, offset: 0 });
+    await fs.rm(path.join(this.dir, segmentName(seq)), { force: true });
+  }
+
+  async #drainAvailable() {
+    while (this.checkpoint.segment <= this.activeSeq) {
+      const { segment, offset } = this.checkpoint;
+      const closed = segment < this.activeSeq;
+      // En el segmento activo solo se lee hasta lo ya sincronizado
+      const length = closed ? READ_CHUNK_BYTES : Math.min(READ_CHUNK_BYTES, this.activeBytes - offset);
+      const chunk = length > 0 ? await this.#readFrom(segment, offset, length) : null;
+      // Solo líneas completas: la última puede estar escribiéndose
+      const complete = chunk ? chunk.lastIndexOf(NEWLINE) + 1 : 0;
+
+      if (complete === 0) {
+        if (!closed) return;
+        if (chunk?.length) {
+          console.warn(`[spool] Línea incompleta descartada al final de ${segmentName(segment)}`);
+        }
+        await this.#finishSegment(segment);
+        continue;
+      }
+
+      const events = [];
+      let pos = 0;
+      while (pos < complete && events.length < this.drainBatchSize) {
+        const end = chunk.indexOf(NEWLINE, pos);
+        const line = chunk.subarray(pos, end).toString("utf8");
+        pos = end + 1;
+        try {
+          events.push(JSON.parse(line));
+        } catch {
+          console.warn(`[spool] Línea inválida descartada en ${segmentName(segment)}`);
+        }
+      }
+
+      const batchId = `${this.instanceId}:${segment}:${offset}`;
+      let end = offset + pos;
+      if (events.length > 0) {
+        const appliedEnd = await this.apply(batchId, events, end);
+        // Lote ya aplicado antes de una caída: se avanza hasta donde terminó entonces
+        if (Number.isInteger(appliedEnd) && appliedEnd > offset) end = appliedEnd;
+      }
+      this.stats.drained += events.length;
+      await this.#saveCheckpoint({ segment, offset: end });
+    }
+  }
+}
@@ -0,0 +1,57 @@
+// --- Heavy hitters (Space-Saving) de referrers y user agents ---
+//
+// Mismo esquema que ms-admin (app/services/topk.py): cada documento slug#variant
+// guarda por dimensión un mapa { valor: conteo } con a lo sumo METRICS_TOPK_CAPACITY
+// entradas. Un valor nuevo con el resumen lleno reemplaza al de menor conteo.
+
+export const TOPK_FIELDS = { referrer: "topReferrers", userAgent: "topUserAgents" };
+export const TOPK_CAPACITY = Number(process.env.METRICS_TOPK_CAPACITY || 50);
+const DIRECT_REFERRER = "(direct)";
+const MAX_VALUE_LENGTH = 200;
+
+/** Host del referrer en minúsculas (sin "www."); "(direct)" si no hay o no es una URL. */
+export function normalizeReferrer(referrer) {
+  let host = "";
+  try {
+    host = referrer ? new URL(referrer.trim()).hostname : "";
+  } catch {
+    host = "";
+  }
+  return host.replace(/^www\./, "").slice(0, MAX_VALUE_LENGTH) || DIRECT_REFERRER;
+}
+
+export function normalizeUserAgent(userAgent) {
+  return (userAgent || "").trim().slice(0, MAX_VALUE_LENGTH) || "unknown";
+}
+
+/**
+ * Clave de referrer de un clic: routes.js ya lo normaliza (host o "(direct)"), pero
+ * las líneas del spool escritas antes de eso traen la URL completa.
+ */
+export function referrerKey(referrer) {
+  if (referrer && !referrer.includes("://")) return referrer.slice(0, MAX_VALUE_LENGTH);
+  return normalizeReferrer(referrer);
+}
+
+/**
+ * Suma conteos { valor: n } a un resumen Space-Saving (en sitio) sin superar capacity.
+ * @param {Record<string, number>} summary
+ * @param {Record<string, number>} counts
+ */
+export function spaceSavingAdd(summary, counts, capacity = TOPK_CAPACITY) {
+  for (const [value, n] of Object.entries(counts)) {
+    if (Object.hasOwn(summary, value)) {
+      summary[value] += n;
+    } else if (Object.keys(summary).length < capacity) {
+      summary[value] = n;
+    } else {
+      let evicted = null;
+      for (const [candidate, count] of Object.entries(summary)) {
+        if (evicted === null || count < summary[evicted]) evicted = candidate;
+      }
+      summary[value] = summary[evicted] + n;
+      delete summary[evicted];
+    }
+  }
+  return summary;
+}
@@ -48,6 +48,7 @@ describe("Rutas ms-redirect (AAA)", () => {
     // Arrange
     getLinkBySlug.mockResolvedValueOnce({
       destinationUrl: "https://example.com",
+      linkId: "lk_01",
     });
 
     // Act
@@ -67,6 +68,27 @@ describe("Rutas ms-redirect (AAA)", () => {
     });
   });
 
+  it("GET /:slug con spool => guarda referrer y user-agent normalizados", async () => {
+    // Arrange
+    getLinkBySlug.mockResolvedValueOnce({ destinationUrl: "https://example.com" });
+    const append = vi.fn();
+    const appWithSpool = createApp({ clickSpool: { append } });
+
+    // Act
+    const res = await request(appWithSpool)
+      .get("/promo")
+      .set("referer", "https://www.Google.com/search?q=secreto")
+      .set("user-agent", `  ${"x".repeat(300)}  `);
+
+    // Assert
+    expect(res.status).toBe(302);
+    const event = append.mock.calls[0][0];
+    expect(event.referrer).toBe("google.com");
+    expect(event.userAgent).toBe("x".repeat(200));
+    expect(JSON.stringify(event)).not.toContain("secreto");
+    expect(incrementMetrics).not.toHaveBeenCalled();
+  });
+
   it("GET /:slug/:variant => 302 y usa el variant del path", async () => {
     // Arrange
     getLinkBySlug.mockResolvedValueOnce({ destinationUrl: "https://e.com" });
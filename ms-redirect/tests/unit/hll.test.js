@@ -0,0 +1,29 @@
+import { describe, it, expect } from "vitest";
+import { HLL_REGISTERS, hllRegister, mergeHll } from "../../src/hll.js";
+
+describe("hllRegister / mergeHll", () => {
+  it("usa el mismo registro que ms-admin (app/services/hll.py)", () => {
+    // Act
+    const register = hllRegister("visitante-1");
+
+    // Assert: valor calculado con hll_register("visitante-1") en Python
+    expect(register).toEqual({ index: "471", rank: 3 });
+  });
+
+  it("mantiene a lo sumo HLL_REGISTERS registros y une con máximo", () => {
+    // Arrange
+    const registers = {};
+
+    // Act
+    for (let i = 0; i < 20000; i += 1) {
+      const { index, rank } = hllRegister(`v${i}`);
+      mergeHll(registers, { [index]: rank });
+    }
+    const merged = mergeHll({ ...registers }, { 0: 99 });
+
+    // Assert
+    expect(Object.keys(registers).length).toBeLessThanOrEqual(HLL_REGISTERS);
+    expect(merged[0]).toBe(99);
+    expect(mergeHll({ 5: 4 }, { 5: 2 })).toEqual({ 5: 4 });
+  });
+});
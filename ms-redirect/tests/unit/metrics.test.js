@@ -1,5 +1,5 @@
 import { describe, it, expect } from "vitest";
-import { extractContextFromCFHeaders } from "../../src/metrics.js";
+import { extractContextFromCFHeaders, visitorIdFromRequest } from "../../src/metrics.js";
 
 describe("extractContextFromCFHeaders (AAA)", () => {
   it("detecta mobile y país CO (normaliza mayúsculas)", () => {
@@ -42,3 +42,19 @@ describe("extractContextFromCFHeaders (AAA)", () => {
     expect(ctx).toEqual({ country: "UN", device: "unknown" });
   });
 });
+
+describe("visitorIdFromRequest", () => {
+  it("devuelve un hash estable de IP y user-agent, sin exponerlos", () => {
+    // Arrange
+    const req = { ip: "203.0.113.7", headers: { "user-agent": "Mozilla/5.0" } };
+
+    // Act
+    const id = visitorIdFromRequest(req);
+
+    // Assert
+    expect(id).toBe(visitorIdFromRequest({ ...req }));
+    expect(id).not.toContain("203.0.113.7");
+    expect(visitorIdFromRequest({ ...req, headers: {} })).not.toBe(id);
+    expect(visitorIdFromRequest({ headers: {} })).toBeUndefined();
+  });
+});
@@ -0,0 +1,149 @@
+import { describe, it, expect, beforeEach, afterEach } from "vitest";
+import { mkdtemp, readdir, rm, writeFile } from "node:fs/promises";
+import { tmpdir } from "node:os";
+import path from "node:path";
+
+import { ClickSpool, segmentName } from "../../src/spool.js";
+
+describe("ClickSpool", () => {
+  let dir;
+  let applied;
+  const apply = async (batchId, events) => {
+    applied.push({ batchId, events });
+  };
+
+  beforeEach(async () => {
+    dir = await mkdtemp(path.join(tmpdir(), "spool-"));
+    applied = [];
+  });
+
+  afterEach(async () => {
+    await rm(dir, { recursive: true, force: true });
+  });
+
+  it("aplica los clics en lotes y avanza el checkpoint", async () => {
+    // Arrange
+    const spool = new ClickSpool({ dir, apply, drainBatchSize: 2 });
+    await spool.open();
+
+    // Act
+    spool.append({ slug: "promo", variant: "ig" });
+    spool.append({ slug: "promo" });
+    spool.append({ slug: "otro" });
+    await spool.flush();
+    await spool.drain();
+    await spool.close();
+
+    // Assert
+    expect(applied.map((b) => b.events.length)).toEqual([2, 1]);
+    expect(applied[0].events[0]).toMatchObject({ slug: "promo", variant: "ig" });
+    expect(spool.stats.drained).toBe(3);
+  });
+
+  it("reanuda desde el checkpoint con los mismos batchId tras un fallo", async () => {
+    // Arrange: el primer apply falla (Firestore caído)
+    let failing = true;
+    const flaky = async (batchId, events) => {
+      if (failing) throw new Error("UNAVAILABLE");
+      applied.push({ batchId, events });
+    };
+    const spool = new ClickSpool({ dir, apply: flaky });
+    await spool.open();
+    spool.append({ slug: "promo" });
+    await spool.flush();
+
+    // Act
+    await spool.drain();
+    const afterFailure = spool.stats.failedDrains;
+    failing = false;
+    await spool.drain();
+    await spool.close();
+
+    // Assert
+    expect(afterFailure).toBe(1);
+    expect(applied).toHaveLength(1);
+    expect(applied[0].batchId).toMatch(/^[0-9a-f-]+:1:0$/);
+  });
+
+  it("no vuelve a aplicar un lote ya aplicado aunque al releerlo traiga más líneas", async () => {
+    // Arrange: apply idempotente por batchId que guarda el fin, como applyClickBatch
+    const markers = new Map();
+    const idempotent = async (batchId, events, end) => {
+      if (markers.has(batchId)) return markers.get(batchId);
+      markers.set(batchId, end);
+      applied.push({ batchId, events });
+      return end;
+    };
+    const first = new ClickSpool({ dir, apply: idempotent });
+    await first.open();
+    for (const timer of first.timers) clearInterval(timer);
+    first.append({ slug: "a" });
+    await first.flush();
+    await first.drain();
+    // Caída entre aplicar y guardar el checkpoint: se vuelve al checkpoint inicial
+    await writeFile(path.join(dir, "checkpoint.json"), JSON.stringify({ segment: 1, offset: 0 }));
+    first.append({ slug: "b" });
+    await first.flush();
+    await first.activeHandle.close();
+
+    // Act: la nueva instancia relee el segmento 1 con "a" y "b"
+    const second = new ClickSpool({ dir, apply: idempotent });
+    await second.open();
+    await second.close();
+
+    // Assert
+    const slugs = applied.flatMap((b) => b.events.map((e) => e.slug));
+    expect(slugs).toEqual(["a", "b"]);
+  });
+
+  it("devuelve las líneas a pendientes si falla la escritura y se recupera", async () => {
+    // Arrange
+    const spool = new ClickSpool({ dir, apply });
+    await spool.open();
+    const handle = spool.activeHandle;
+    const write = handle.write.bind(handle);
+    let failing = true;
+    handle.write = async (data) => {
+      if (failing) throw Object.assign(new Error("ENOSPC"), { code: "ENOSPC" });
+      return write(data);
+    };
+    spool.append({ slug: "promo" });
+
+    // Act
+    await spool.flush();
+    const pendingAfterFailure = spool.pending.length;
+    failing = false;
+    spool.append({ slug: "otro" });
+    await spool.flush();
+    await spool.close();
+
+    // Assert
+    expect(spool.stats.failedFlushes).toBe(1);
+    expect(pendingAfterFailure).toBe(1);
+    const slugs = applied.flatMap((b) => b.events.map((e) => e.slug));
+    expect(slugs).toEqual(["promo", "otro"]);
+  });
+
+  it("rota segmentos, borra los drenados y sobrevive a una línea incompleta", async () => {
+    // Arrange: segmento previo de una caída con una línea a medias
+    await writeFile(
+      path.join(dir, segmentName(1)),
+      '{"slug":"viejo"}\n{"slug":"cort',
+    );
+    const spool = new ClickSpool({ dir, apply, segmentMaxBytes: 50 });
+    await spool.open();
+
+    // Act
+    for (let i = 0; i < 5; i += 1) {
+      spool.append({ slug: `s-${i}` });
+      await spool.flush();
+    }
+    await spool.close();
+
+    // Assert
+    const slugs = applied.flatMap((b) => b.events.map((e) => e.slug));
+    expect(slugs).toEqual(["viejo", "s-0", "s-1", "s-2", "s-3", "s-4"]);
+    const segments = (await readdir(dir)).filter((f) => f.startsWith("segment-"));
+    expect(segments).toHaveLength(1); // solo el activo
+  });
+});
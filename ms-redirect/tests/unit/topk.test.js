@@ -0,0 +1,37 @@
+import { describe, it, expect } from "vitest";
+import { normalizeReferrer, normalizeUserAgent, referrerKey, spaceSavingAdd } from "../../src/topk.js";
+
+describe("topk (Space-Saving)", () => {
+  it("normaliza referrers y user agents igual que ms-admin", () => {
+    expect(normalizeReferrer("https://www.Example.com/path?q=1")).toBe("example.com");
+    expect(normalizeReferrer(undefined)).toBe("(direct)");
+    expect(normalizeReferrer("no es una url")).toBe("(direct)");
+    expect(normalizeUserAgent("  ")).toBe("unknown");
+  });
+
+  it("referrerKey acepta referrers ya normalizados y URLs de líneas antiguas del spool", () => {
+    expect(referrerKey("example.com")).toBe("example.com");
+    expect(referrerKey("(direct)")).toBe("(direct)");
+    expect(referrerKey("https://www.example.com/a?b=1")).toBe("example.com");
+    expect(referrerKey(undefined)).toBe("(direct)");
+  });
+
+  it("no supera la capacidad y conserva el valor frecuente", () => {
+    // Arrange
+    const summary = {};
+
+    // Act
+    for (let i = 0; i < 1000; i += 1) {
+      spaceSavingAdd(summary, { [`raro-${i}`]: 1 }, 10);
+      if (i % 4 === 0) spaceSavingAdd(summary, { frecuente: 1 }, 10);
+    }
+
+    // Assert
+    expect(Object.keys(summary)).toHaveLength(10);
+    expect(summary.frecuente).toBeGreaterThanOrEqual(250);
+  });
+
+  it("trata claves como 'constructor' como valores normales", () => {
+    expect(spaceSavingAdd({}, { constructor: 2 }, 10)).toEqual({ constructor: 2 });
+  });
+});